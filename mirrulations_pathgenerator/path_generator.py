@@ -1,3 +1,156 @@
+import functools
+import gzip
+import json
+import logging
+import os
+import tarfile
+from collections import namedtuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# One routed item from PathGenerator.get_paths_batch
+PathRecord = namedtuple('PathRecord', ['item_id', 'json_path', 'attachment_paths'])
+
+UNKNOWN_PATH = "unknown/unknown.json"
+# Folder under text-{docketId} for each JSON type
+JSON_FOLDERS = {"documents": "documents", "comments": "comments"}
+# Characters read at a time when streaming attachments out of a file
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def loads(raw):
+    '''
+    Parses one JSON document from bytes or str, with orjson when it is
+    installed and the json module otherwise.
+    '''
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def iter_json_documents(path):
+    '''
+    Yields the raw bytes of every JSON document found at path:
+    - a directory: every .json file under it, in sorted order
+    - a JSONL dump (.jsonl or .jsonl.gz): one document per non-empty line
+    - a tar archive (.tar, .tar.gz, .tgz): every .json member, read as a
+      stream without extracting anything
+    - anything else is read as a single JSON file
+    '''
+    path = os.fspath(path)
+    if os.path.isdir(path):
+        for folder, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.json'):
+                    with open(os.path.join(folder, name), 'rb') as f:
+                        yield f.read()
+    elif path.endswith(('.jsonl', '.jsonl.gz')):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield line
+    elif path.endswith(('.tar', '.tar.gz', '.tgz')):
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.endswith('.json'):
+                    yield archive.extractfile(member).read()
+    else:
+        with open(path, 'rb') as f:
+            yield f.read()
+
+
+class _JsonStream:
+    '''
+    Decodes a JSON file one value at a time. Only the value being decoded
+    is held in memory, so the members of a large object or the elements of
+    a large array can be visited without building the whole structure.
+    '''
+
+    def __init__(self, f, chunk_size=STREAM_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size):
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def peek(self):
+        '''Skips whitespace and returns the next character, or '' at the end of the file.'''
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill(self.chunk_size)
+
+    def expect(self, chars):
+        '''Consumes the next character, which must be one of chars, and returns it.'''
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expecting one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        '''Decodes the value at the current position.'''
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            # Read at least as much again as is buffered, so long values are not re-decoded over and over
+            self._fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def members(self):
+        '''Yields each key of the object at the current position; the caller consumes each value.'''
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise json.JSONDecodeError("Expecting property name", self.buffer, self.pos)
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self):
+        '''Yields the elements of the array at the current position, decoding one at a time.'''
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+
 class PathGenerator:
     """
     A Class which classifies any type of file into the correct directory
@@ -34,8 +187,45 @@ class PathGenerator:
         Gets the path for a json with the 'documents' type
     get_comment_json_path(json = dict):
         Gets the path for a json with the 'comments' type
+    item_path(item_type = str, agency_i_d = str, docket_i_d = str, ...):
+        Builds an item's path from its parts; the layout every router uses
+    iter_attachment_paths(json = dict):
+        Lazily yields the paths of a comment's attachments
+    iter_attachment_paths_from_file(path = str):
+        Yields the paths of a comment's attachments while streaming its file
+    get_paths_batch(documents = iterable):
+        Routes a stream of raw, parsed or on-disk JSON documents, yielding a
+        PathRecord for each
+    cache_stats():
+        Returns the hit and miss counters of the optional LRU caches
     """
 
+    def __init__(self, cache_size=None):
+        '''
+        cache_size turns on two LRU caches of that many entries each: item
+        ids to their parsed docket ids, and (agency, docket) pairs to the
+        docket's text- and binary- path prefixes. Dockets with many
+        documents and comments then skip the string work after their first
+        item. None or 0 leaves caching off.
+        '''
+        self.cache_size = cache_size
+        if cache_size:
+            self.parse_docket_id = functools.lru_cache(maxsize=cache_size)(self._split_docket_id)
+            self._docket_prefixes = functools.lru_cache(maxsize=cache_size)(self._build_docket_prefixes)
+
+    def cache_stats(self):
+        '''
+        Returns {"docket_ids": {...}, "prefixes": {...}} with each cache's
+        hits, misses and current size, or None when caching is off.
+        '''
+        if not self.cache_size:
+            return None
+        stats = {}
+        for name, cached in (("docket_ids", self.parse_docket_id), ("prefixes", self._docket_prefixes)):
+            info = cached.cache_info()
+            stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+        return stats
+
     def get_json_path(self, json):
         if json['data']["type"] == "comments":
             return self.get_comment_json_path(json)
@@ -67,6 +257,10 @@ class PathGenerator:
         return json_subset
 
     def parse_docket_id(self, item_i_d):
+        return self._split_docket_id(item_i_d)
+
+    @staticmethod
+    def _split_docket_id(item_i_d):
         if item_i_d is None:
             return "unknown"
 
@@ -107,64 +301,183 @@ class PathGenerator:
 
         return agency_id, docket_id, item_i_d
 
+    def _docket_prefixes(self, agency_i_d, docket_i_d):
+        return self._build_docket_prefixes(agency_i_d, docket_i_d)
+
+    @staticmethod
+    def _build_docket_prefixes(agency_i_d, docket_i_d):
+        '''
+        Returns the docket's text and binary folders, without /raw-data:
+        (/{agencyId}/{docketId}/text-{docketId}/, /.../binary-{docketId}/)
+        '''
+        docket_folder = f'/{agency_i_d}/{docket_i_d}/'
+        return docket_folder + f'text-{docket_i_d}/', \
+            docket_folder + f'binary-{docket_i_d}/'
+
     def get_docket_json_path(self, json):
         agency_i_d, docket_i_d, _ = self.get_attributes(json,
                                                         is_docket=True)
-        return f'/{agency_i_d}/{docket_i_d}/text-{docket_i_d}/docket/' + \
-               f'{docket_i_d}.json'
+        text_prefix, _ = self._docket_prefixes(agency_i_d, docket_i_d)
+        return f'{text_prefix}docket/{docket_i_d}.json'
 
     def get_document_json_path(self, json):
         agency_i_d, docket_i_d, item_i_d = self.get_attributes(json)
-
-        return f'/{agency_i_d}/{docket_i_d}/text-{docket_i_d}/documents' + \
-               f'/{item_i_d}.json'
+        text_prefix, _ = self._docket_prefixes(agency_i_d, docket_i_d)
+        return f'{text_prefix}documents/{item_i_d}.json'
 
     def get_document_htm_path(self, json):
         agency_id, docket_id, item_id = self.get_attributes(json)
-
-        return f'/raw-data/{agency_id}/{docket_id}/text-{docket_id}/' + \
-               f'documents/{item_id}_content.htm'
+        return self.item_path('document_htm', agency_id, docket_id, item_id)
 
     def get_comment_json_path(self, json):
         agency_i_d, docket_i_d, item_i_d = self.get_attributes(json)
+        text_prefix, _ = self._docket_prefixes(agency_i_d, docket_i_d)
+        return f'{text_prefix}comments/{item_i_d}.json'
 
-        return f'/{agency_i_d}/{docket_i_d}/text-{docket_i_d}/comments/' + \
-               f'{item_i_d}.json'
+    def item_path(self, item_type, agency_i_d, docket_i_d, item_i_d=None, file_name=''):
+        '''
+        Returns the path of an item from its parts. item_type is a data.type
+        ('dockets', 'documents', 'comments'), 'document_htm' for a
+        document's content or 'comment_attachment' for one of a comment's
+        attachment files. scripts/router.py routes items through this
+        method rather than keeping its own copy of the layout.
+        '''
+        text_prefix, binary_prefix = self._docket_prefixes(agency_i_d, docket_i_d)
+        if item_type == 'dockets':
+            return f'/raw-data{text_prefix}docket/{docket_i_d}.json'
+        if item_type in JSON_FOLDERS:
+            return f'/raw-data{text_prefix}{JSON_FOLDERS[item_type]}/{item_i_d}.json'
+        if item_type == 'document_htm':
+            return f'/raw-data{text_prefix}documents/{item_i_d}_content.htm'
+        if item_type == 'comment_attachment':
+            return f'/raw-data{binary_prefix}comments_attachments/{item_i_d}_{file_name}'
+        return "/unknown/unknown.json"
 
     def _has_file_formats(self, attributes, attachment):
         if attributes.get("fileFormats"):
             return True
-        print("fileFormats did not exist for attachment ID: " +
-              f"{attachment.get('id')}")
+        logger.debug("fileFormats did not exist for attachment ID: %s",
+                     attachment.get('id'))
         return False
 
-    def _parse_attachment_path(self, json, file_format, attachments):
+    def _attachment_prefix(self, json):
+        '''
+        Returns the path every attachment of a comment starts with; the
+        attachment's file name is appended to it.
+        '''
         agency_i_d, docket_i_d, item_i_d = self.get_attributes(json)
-        if "fileUrl" in file_format:
-            attachment_name = item_i_d + "_" + \
-                file_format["fileUrl"].split("/")[-1]
-            attachments.append(f'/raw-data/{agency_i_d}/{docket_i_d}/' +
-                               f'binary-{docket_i_d}/comments_' +
-                               f'attachments/{attachment_name}')
-        return attachments
+        return self.item_path('comment_attachment', agency_i_d, docket_i_d, item_i_d)
+
+    def _attachment_file_names(self, attachment):
+        '''
+        Yields the file name of each of an attachment's file formats.
+        '''
+        attributes = attachment.get("attributes") or {}
+        if self._has_file_formats(attributes, attachment):
+            for file_format in attributes["fileFormats"]:
+                if "fileUrl" in file_format:
+                    yield file_format["fileUrl"].split("/")[-1]
+
+    def iter_attachment_paths(self, json):
+        '''
+        Lazily yields the attachment paths of a loaded json. The comment's
+        attributes are read once, however many attachments it has.
+        '''
+        prefix = self._attachment_prefix(json)
+        for attachment in json["included"]:
+            for file_name in self._attachment_file_names(attachment):
+                yield prefix + file_name
 
     def get_attachment_json_paths(self, json):
         '''
         Given a json, this function will return all attachment paths for
         n number attachment links
         '''
+        return list(self.iter_attachment_paths(json))
 
-        # contains list of paths for attachments
-        attachments = []
-        for attachment in json["included"]:
-            attributes = attachment["attributes"]
-            if self._has_file_formats(attributes, attachment):
-                for file_format in attributes["fileFormats"]:
-                    attachments = self._parse_attachment_path(json,
-                                                              file_format,
-                                                              attachments)
-
-        return attachments
+    def iter_attachment_paths_from_file(self, path, chunk_size=STREAM_CHUNK_SIZE):
+        '''
+        Yields the attachment paths of a comment JSON file while reading it.
+        The 'included' array is decoded one attachment at a time and the
+        other top-level values are skipped, so a comment with hundreds of
+        attachments is never loaded whole. If 'included' comes before
+        'data', only the attachments' file names are kept until the
+        comment's attributes are known.
+        '''
+        with open(path, 'r', encoding='utf-8') as f:
+            stream = _JsonStream(f, chunk_size)
+            prefix = None
+            waiting = []
+            for key in stream.members():
+                if key == 'data':
+                    prefix = self._attachment_prefix({'data': stream.value()})
+                    for file_name in waiting:
+                        yield prefix + file_name
+                    waiting = []
+                elif key == 'included':
+                    for attachment in stream.elements():
+                        for file_name in self._attachment_file_names(attachment):
+                            if prefix is None:
+                                waiting.append(file_name)
+                            else:
+                                yield prefix + file_name
+                else:
+                    stream.value()
+        if prefix is None:
+            prefix = self._attachment_prefix({})
+            for file_name in waiting:
+                yield prefix + file_name
+
+    def get_paths_batch(self, documents):
+        '''
+        Routes many JSON documents in one pass. Each entry of documents is
+        raw JSON (bytes), an already parsed dict, or a path (str or
+        os.PathLike) to a directory, JSONL dump, tar archive or JSON file
+        (see iter_json_documents).
+
+        Yields one PathRecord(item_id, json_path, attachment_paths) per
+        document, with the paths get_path and get_attachment_json_paths
+        would give it. Only data.type, data.id, agencyId, docketId and the
+        attachment URLs are read, each once per document.
+        '''
+        for document in documents:
+            if isinstance(document, (str, os.PathLike)):
+                for raw in iter_json_documents(document):
+                    yield self._route_document(loads(raw))
+            elif isinstance(document, dict):
+                yield self._route_document(document)
+            else:
+                yield self._route_document(loads(document))
+
+    def _route_document(self, json_data):
+        data = json_data.get('data') if isinstance(json_data, dict) else None
+        if not isinstance(data, dict) or not data:
+            return PathRecord(None, UNKNOWN_PATH, ())
+        item_i_d = data.get('id')
+        attributes = data.get('attributes') or {}
+        agency_i_d = attributes.get('agencyId')
+        if agency_i_d is None:
+            agency_i_d = 'unknown'
+        docket_i_d = attributes.get('docketId')
+        if docket_i_d is None:
+            docket_i_d = self.parse_docket_id(item_i_d)
+
+        item = 'unknown' if item_i_d is None else item_i_d
+        item_type = data.get('type')
+        if item_type == 'dockets':
+            json_path = self.item_path(item_type, agency_i_d, item)
+        elif item_type in JSON_FOLDERS:
+            json_path = self.item_path(item_type, agency_i_d, docket_i_d, item)
+        else:
+            json_path = '/raw-data/unknown/unknown.json'
+
+        attachment_paths = ()
+        included = json_data.get('included')
+        if included:
+            prefix = self.item_path('comment_attachment', agency_i_d, docket_i_d, item)
+            attachment_paths = tuple(prefix + file_name for attachment in included
+                                     for file_name in self._attachment_file_names(attachment))
+        return PathRecord(item_i_d, json_path, attachment_paths)
 
     @staticmethod
     def make_attachment_save_path(path):
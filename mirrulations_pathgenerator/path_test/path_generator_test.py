@@ -1,7 +1,11 @@
 import pytest
 import boto3
+import gzip
+import io
 import os
 import json
+import random
+import tarfile
 from moto import mock_aws
 import sys
 
@@ -184,4 +188,107 @@ def test_missing_agency_id(s3_mock):
     agency_id, docket_id, item_id = path_generator.get_attributes(json_data, is_docket=True)
     assert agency_id == "unknown"
     assert docket_id == "USTR-2015-0010"
-    assert item_id is None
\ No newline at end of file
+    assert item_id is None
+
+
+def random_items(count, seed=7):
+    """Dockets, documents and comments with optional missing fields and attachments."""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        docket_id = f"{rng.choice(['EPA', 'FDA', 'USTR'])}-{rng.choice(['', 'R08-OAR-', 'D-'])}2025-{i % 50:04d}"
+        item_type = rng.choice(["dockets", "documents", "comments"])
+        attributes = {"agencyId": docket_id.split("-")[0]}
+        if rng.random() < 0.7:
+            attributes["docketId"] = docket_id
+        if rng.random() < 0.1:
+            del attributes["agencyId"]
+        item_id = docket_id if item_type == "dockets" else f"{docket_id}-{i:04d}"
+        item = {"data": {"id": item_id, "type": item_type, "attributes": attributes}}
+        if item_type == "comments" and rng.random() < 0.5:
+            item["included"] = [{"id": f"{item_id}-a{n}", "attributes": {"fileFormats": [
+                {"fileUrl": f"https://downloads.regulations.gov/{item_id}/attachment_{n}.{ext}"}
+                for ext in ("pdf", "docx")[:rng.randint(1, 2)]]}} for n in range(rng.randint(1, 3))]
+        items.append(item)
+    return items
+
+def test_get_paths_batch_matches_per_item_methods(tmp_path):
+    """Test that every batch source gives the paths of get_path and get_attachment_json_paths."""
+    path_generator = PathGenerator()
+    items = random_items(300)
+    expected = [(item["data"]["id"], path_generator.get_path(item),
+                 tuple(path_generator.get_attachment_json_paths(item)) if "included" in item else ())
+                for item in items]
+
+    assert [tuple(record) for record in path_generator.get_paths_batch(items)] == expected
+    raw = [json.dumps(item).encode() for item in items]
+    assert [tuple(record) for record in path_generator.get_paths_batch(raw)] == expected
+
+    folder = tmp_path / "items"
+    folder.mkdir()
+    for n, data in enumerate(raw):
+        (folder / f"{n:05d}.json").write_bytes(data)
+    with gzip.open(tmp_path / "items.jsonl.gz", "wb") as f:
+        f.write(b"\n".join(raw) + b"\n")
+    with tarfile.open(tmp_path / "items.tar.gz", "w:gz") as archive:
+        for n, data in enumerate(raw):
+            info = tarfile.TarInfo(f"dump/{n:05d}.json")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    for source in (folder, str(tmp_path / "items.jsonl.gz"), str(tmp_path / "items.tar.gz")):
+        assert [tuple(record) for record in path_generator.get_paths_batch([source])] == expected
+
+    assert list(path_generator.get_paths_batch([b"{}", b'{"data": []}'])) == [(None, "unknown/unknown.json", ())] * 2
+
+def test_iter_attachment_paths_from_file_streams_included(tmp_path):
+    """Test that attachment paths streamed from a file match get_attachment_json_paths, whatever the key order."""
+    path_generator = PathGenerator()
+    comments = [item for item in random_items(200) if "included" in item]
+    big = {"data": {"id": "EPA-R08-OAR-2025-0625-0001", "type": "comments",
+                    "attributes": {"agencyId": "EPA", "docketId": "EPA-R08-OAR-2025-0625", "comment": "x" * 5000}},
+           "included": [{"id": f"a{n}", "attributes": {"fileFormats": [
+               {"fileUrl": f"https://downloads.regulations.gov/x/attachment_{n}.pdf", "size": 12345}]}}
+               for n in range(500)] + [{"id": "no-formats", "attributes": {}}]}
+    for n, item in enumerate(comments + [big]):
+        expected = path_generator.get_attachment_json_paths(item)
+        included_first = {"included": item["included"], "meta": [1, 2.5, None], **item}
+        for order, document in (("data-first", item), ("included-first", included_first)):
+            path = tmp_path / f"{n}-{order}.json"
+            path.write_text(json.dumps(document, indent=1))
+            streamed = path_generator.iter_attachment_paths_from_file(str(path), chunk_size=97)
+            assert list(streamed) == expected
+
+    path = tmp_path / "lazy.json"
+    path.write_text(json.dumps(big))
+    paths = path_generator.iter_attachment_paths_from_file(str(path), chunk_size=64)
+    assert next(paths).endswith("/comments_attachments/EPA-R08-OAR-2025-0625-0001_attachment_0.pdf")
+
+    path.write_text('{"data": {"id": "A-1-2"}, "included": [{"attributes": ')
+    with pytest.raises(json.JSONDecodeError):
+        list(path_generator.iter_attachment_paths_from_file(str(path)))
+
+def test_cached_path_generator_matches_uncached():
+    """Test that the optional LRU caches give the same paths and count their hits and misses."""
+    uncached = PathGenerator()
+    cached = PathGenerator(cache_size=64)
+    assert uncached.cache_stats() is None
+    # A few hot dockets, whose items arrive back to back as they do from a scrape
+    items = random_items(200) + [
+        {"data": {"id": f"{docket}-{n:04d}", "type": item_type,
+                  "attributes": {"agencyId": docket.split("-")[0]}}}
+        for docket in ("EPA-R08-OAR-2025-0625", "FDA-2017-D-2335", "USTR-2015-0010")
+        for n in range(300) for item_type in ("documents", "comments")]
+    expected = [(uncached.get_path(item), uncached.get_document_htm_path(item),
+                 uncached.get_attachment_json_paths(item) if "included" in item else [])
+                for item in items]
+    assert [(cached.get_path(item), cached.get_document_htm_path(item),
+             cached.get_attachment_json_paths(item) if "included" in item else [])
+            for item in items] == expected
+    assert list(cached.get_paths_batch(items)) == list(uncached.get_paths_batch(items))
+
+    stats = cached.cache_stats()
+    assert stats["prefixes"]["hits"] > 10 * stats["prefixes"]["misses"]
+    assert stats["prefixes"]["size"] <= 64
+    assert stats["docket_ids"]["misses"] > 0 and stats["docket_ids"]["size"] <= 64
+    assert cached.parse_docket_id("EPA-R08-OAR-2025-0625-0001") == "EPA-R08-OAR-2025-0625"
+    assert cached.parse_docket_id(None) == "unknown"
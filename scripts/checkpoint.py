@@ -0,0 +1,196 @@
+"""
+Durable checkpoint journal for new_move.py.
+
+The journal is a small SQLite database holding:
+- the source keys that were copied but not deleted yet,
+- the source keys whose copy failed, with their planned destination and
+  size when known, to be retried on resume,
+- for each listing range, the key up to which every object has been handled,
+- running totals of objects and bytes moved.
+
+Moved objects are deleted from the source, so the journal never needs a row
+per finished key: a restart only has to finish the pending deletes and pick
+each listing range back up from its cursor.
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Seconds between commits; anything recorded since the last commit is lost on a crash
+COMMIT_INTERVAL = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS copied (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failed (
+    key TEXT PRIMARY KEY,
+    dest TEXT,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS cursors (
+    prefix TEXT NOT NULL,
+    range_start TEXT NOT NULL,
+    done_through TEXT NOT NULL,
+    PRIMARY KEY (prefix, range_start)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class MoveCheckpoint:
+    """
+    Records the progress of a move so an interrupted run can resume.
+
+    A listing range is identified by its prefix and its lower split point
+    (range_start, '' for the start of the prefix). A cursor (range_start,
+    done_through) means every key after range_start up to and including
+    done_through was either copied or recorded as failed. Writes are
+    buffered and committed at most every commit_interval seconds.
+    """
+
+    def __init__(self, path, commit_interval=COMMIT_INTERVAL):
+        self.path = path
+        self.commit_interval = commit_interval
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        # Journals written before failed copies kept their destination and size
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(failed)")}
+        for column, kind in (("dest", "TEXT"), ("size", "INTEGER")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE failed ADD COLUMN {column} {kind}")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._last_commit = time.monotonic()
+
+    def reset(self):
+        """Forgets everything recorded by previous runs."""
+        with self._lock:
+            self._conn.execute("DELETE FROM copied")
+            self._conn.execute("DELETE FROM failed")
+            self._conn.execute("DELETE FROM cursors")
+            self._conn.execute("DELETE FROM stats")
+            self._conn.commit()
+
+    def record_copied(self, key, size=0):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO copied (key, size) VALUES (?, ?)", (key, size or 0))
+            self._conn.execute("DELETE FROM failed WHERE key = ?", (key,))
+            self._add_stat("objects_copied", 1)
+            self._add_stat("bytes_copied", size or 0)
+        self.maybe_commit()
+
+    def record_deleted(self, keys):
+        with self._lock:
+            self._conn.executemany("DELETE FROM copied WHERE key = ?", ((key,) for key in keys))
+            self._add_stat("objects_moved", len(keys))
+        self.maybe_commit()
+
+    def record_failed(self, key, dest=None, size=None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO failed (key, dest, size) VALUES (?, ?, ?)", (key, dest, size))
+        self.maybe_commit()
+
+    def failed_keys(self):
+        """Returns the keys whose copy failed and should be retried."""
+        return [key for key, _, _ in self.failed_objects()]
+
+    def failed_objects(self):
+        """Returns (key, dest, size) for every failed copy; dest and size are None when they were not known."""
+        with self._lock:
+            return self._conn.execute("SELECT key, dest, size FROM failed ORDER BY key").fetchall()
+
+    def pending_deletes(self):
+        """Returns the keys that were copied but whose source was not deleted yet."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT key FROM copied ORDER BY key")]
+
+    def advance_cursor(self, prefix, range_start, done_through):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cursors (prefix, range_start, done_through) VALUES (?, ?, ?)",
+                (prefix, range_start or "", done_through),
+            )
+        self.maybe_commit()
+
+    def resume_point(self, prefix, start_after, end=None):
+        """
+        Returns the StartAfter to use when listing the range of prefix between
+        start_after and end, skipping whatever an earlier run already handled.
+        Ranges may be split differently from run to run, so any cursor that
+        began at or before start_after and reached past it can be used.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(done_through) FROM cursors WHERE prefix = ? AND range_start <= ? AND done_through > ?",
+                (prefix, start_after or "", start_after or ""),
+            ).fetchone()
+        if row[0] is None:
+            return start_after
+        if end is not None and row[0] > end:
+            return end
+        return row[0]
+
+    def progress(self):
+        """Returns the running totals as a dict."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM stats"))
+
+    def maybe_commit(self):
+        if time.monotonic() - self._last_commit >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+    def _add_stat(self, name, amount):
+        self._conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+
+class RangeTracker:
+    """
+    Follows the objects of each listing range in listing order and reports
+    how far every range is contiguously done. A range's cursor only moves
+    past a key once that key and every key listed before it are done. Keys
+    whose copy failed count as done once they are recorded as failed in the
+    checkpoint, so a single bad key does not pin the rest of its range.
+    """
+
+    def __init__(self):
+        self._ranges = {}
+        self._lock = threading.Lock()
+
+    def listed(self, range_id, key):
+        """Registers a listed key and returns the entry to pass to done()."""
+        entry = [key, False]
+        with self._lock:
+            self._ranges.setdefault(range_id, deque()).append(entry)
+        return entry
+
+    def done(self, range_id, entry):
+        """Marks an entry done and returns the range's new cursor, or None if it did not move."""
+        with self._lock:
+            entry[1] = True
+            entries = self._ranges[range_id]
+            cursor = None
+            while entries and entries[0][1]:
+                cursor = entries.popleft()[0]
+            return cursor
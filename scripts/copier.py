@@ -0,0 +1,128 @@
+"""
+Size-aware server-side copies for the S3 mover.
+
+Objects below the multipart threshold are copied with a single CopyObject.
+Larger ones (CopyObject stops at 5 GB) are copied with UploadPartCopy, the
+parts running on one part pool shared by every move, so a run never holds
+more part threads than `part_workers` however many large objects it meets.
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+MiB = 1024 * 1024
+# S3's limits for multipart uploads
+MIN_PART_SIZE = 5 * MiB
+MAX_PART_SIZE = 5 * 1024 * MiB
+MAX_PARTS = 10000
+# The largest object a single CopyObject can copy
+MAX_COPY_SIZE = 5 * 1024 * MiB
+
+MULTIPART_THRESHOLD = 256 * MiB
+PART_SIZE = 64 * MiB
+PART_WORKERS = 32
+
+# Operations reported in move plans
+COPY = "copy"
+MULTIPART_COPY = "multipart_copy"
+
+# Headers CopyObject carries over by itself that CreateMultipartUpload has to be given
+_COPIED_HEADERS = ("CacheControl", "ContentDisposition", "ContentEncoding", "ContentLanguage",
+                   "ContentType", "Expires", "Metadata")
+
+
+def part_ranges(size, part_size):
+    """Returns the (first byte, last byte) of every part, growing the part size if it would need more than MAX_PARTS."""
+    part_size = max(part_size, MIN_PART_SIZE, math.ceil(size / MAX_PARTS / MiB) * MiB)
+    if part_size > MAX_PART_SIZE:
+        raise ValueError(f"Object of {size} bytes is too large for a multipart copy")
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+class CopyEngine:
+    """
+    Copies objects inside S3. request(method, **kwargs) performs each S3 call,
+    so multipart copies stay under the same rate and concurrency limits as
+    every other request. initializer runs in each part thread as it starts.
+    """
+
+    def __init__(self, request, threshold=MULTIPART_THRESHOLD, part_size=PART_SIZE, part_workers=PART_WORKERS,
+                 initializer=None):
+        self.request = request
+        self.threshold = threshold
+        self.part_size = part_size
+        self.part_workers = part_workers
+        self._parts = ThreadPoolExecutor(max_workers=part_workers, thread_name_prefix="part-copy",
+                                         initializer=initializer)
+
+    def operation(self, size):
+        """Returns the operation copy() will use for an object of the given size."""
+        return MULTIPART_COPY if size is not None and size >= self.threshold else COPY
+
+    def copy(self, bucket_name, source_key, dest_key, size=None):
+        """
+        Copies source_key to dest_key, looking up the size only when the
+        caller does not know it. Returns the object's size.
+        """
+        head = None
+        if size is None:
+            head = self.request("head_object", Bucket=bucket_name, Key=source_key)
+            size = head["ContentLength"]
+        if size < self.threshold:
+            self.request("copy_object", Bucket=bucket_name, CopySource={"Bucket": bucket_name, "Key": source_key},
+                         Key=dest_key)
+        else:
+            self.copy_multipart(bucket_name, source_key, dest_key, head)
+        return size
+
+    def copy_multipart(self, bucket_name, source_key, dest_key, head=None):
+        """
+        Copies an object part by part on the shared part pool. Each copy keeps
+        at most part_workers parts queued, so large objects moved at the same
+        time take turns on the pool. The upload is aborted if any part fails.
+        """
+        if head is None:
+            head = self.request("head_object", Bucket=bucket_name, Key=source_key)
+        ranges = part_ranges(head["ContentLength"], self.part_size)
+        upload_id = self.request(
+            "create_multipart_upload", Bucket=bucket_name, Key=dest_key,
+            **{name: head[name] for name in _COPIED_HEADERS if name in head},
+        )["UploadId"]
+
+        parts = {}
+        pending = set()
+        try:
+            for part_number, (first, last) in enumerate(ranges, start=1):
+                if len(pending) >= self.part_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(done, parts)
+                pending.add(self._parts.submit(self._copy_part, bucket_name, source_key, dest_key, upload_id,
+                                               part_number, first, last, head["ETag"]))
+            done, _ = wait(pending)
+            self._collect(done, parts)
+            self.request("complete_multipart_upload", Bucket=bucket_name, Key=dest_key, UploadId=upload_id,
+                         MultipartUpload={"Parts": [{"ETag": parts[n], "PartNumber": n} for n in sorted(parts)]})
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            try:
+                self.request("abort_multipart_upload", Bucket=bucket_name, Key=dest_key, UploadId=upload_id)
+            except Exception:
+                pass  # the upload expires under the bucket's lifecycle rules; the part error matters more
+            raise
+
+    def _collect(self, done, parts):
+        for future in done:
+            part_number, etag = future.result()
+            parts[part_number] = etag
+
+    def _copy_part(self, bucket_name, source_key, dest_key, upload_id, part_number, first, last, etag):
+        response = self.request(
+            "upload_part_copy", Bucket=bucket_name, Key=dest_key, UploadId=upload_id, PartNumber=part_number,
+            CopySource={"Bucket": bucket_name, "Key": source_key}, CopySourceRange=f"bytes={first}-{last}",
+            CopySourceIfMatch=etag,
+        )
+        return part_number, response["CopyPartResult"]["ETag"]
+
+    def shutdown(self):
+        self._parts.shutdown(wait=True)
@@ -1,52 +1,292 @@
+"""
+Estimates how long new_move.py has left from its log file.
+
+The log is scanned in parallel chunks over mmap, looking only at progress
+lines: the periodic "📊" summaries, which carry running totals of objects
+and bytes copied, or the older per-object "✔ Moved:" lines. Progress is
+kept per minute, so memory stays flat however many objects the log covers.
+The rate is an exponentially weighted moving average, so the estimate
+follows the mover's current speed rather than its average since the start.
+--follow tails a live log and prints a fresh estimate every few seconds.
+"""
+
+import argparse
+import math
+import mmap
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 LOG_FILE = "script_output.log"
 TOTAL_FILES = 25239435
-MOVED_PATTERN = re.compile(r"✔ Moved:")
-
-def parse_moved_timestamps(log_file):
-    timestamps = []
-
-    with open(log_file, "r") as f:
-        for line in f:
-            if MOVED_PATTERN.search(line):
-                # Extract timestamp from the beginning of the line
-                timestamp_str = line.split(" - ")[0]
-                try:
-                    timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S,%f")
-                    timestamps.append(timestamp)
-                except ValueError:
-                    continue  # Skip malformed timestamps
-
-    return timestamps
-
-def estimate_remaining_time(timestamps):
-    if len(timestamps) < 2:
-        return None, None, len(timestamps)
-
-    first = timestamps[0]
-    last = timestamps[-1]
-    duration = (last - first).total_seconds()
-    moves_done = len(timestamps)
-    avg_time_per_move = duration / moves_done
-    moves_remaining = TOTAL_FILES - moves_done
-    est_time_remaining_sec = avg_time_per_move * moves_remaining
-
-    return timedelta(seconds=est_time_remaining_sec), timedelta(seconds=duration), moves_done
-
-def main():
-    timestamps = parse_moved_timestamps(LOG_FILE)
-    est_remaining, total_elapsed, moved = estimate_remaining_time(timestamps)
-
-    if est_remaining is None:
+# About 2.2 TB in the bucket (see docs/aws_runtime.md)
+TOTAL_BYTES = 2_200_000_000_000
+
+MOVED_MARKER = "✔ Moved:".encode("utf-8")
+SUMMARY_MARKER = "📊".encode("utf-8")
+SUMMARY_FIELD = re.compile(rb"\b(objects_copied|bytes_copied)=([\d,]+)")
+# Log lines start with "%Y-%m-%d %H:%M:%S,%f"; progress is bucketed by the minute
+MINUTE_WIDTH = len("2025-01-01 00:00")
+# Lines cut off or garbled mid-timestamp (a partly written tail, another writer) are skipped
+MINUTE = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d")
+
+# Logs larger than this are split into chunks scanned by separate processes
+CHUNK_SIZE = 64 * 1024 * 1024
+# The rate average forgets half of its history every this many minutes
+RATE_HALF_LIFE = 30.0
+FOLLOW_INTERVAL = 10.0
+
+
+class Progress:
+    """
+    Progress found in (part of) a log: per-object Moved lines counted per
+    minute, and the last running totals seen in each minute's summary lines.
+    Progress from consecutive chunks is combined with merge().
+    """
+
+    def __init__(self):
+        self.moved = {}
+        self.summaries = {}
+
+    def add_moved(self, minute, count=1):
+        self.moved[minute] = self.moved.get(minute, 0) + count
+
+    def add_summary(self, minute, objects, size):
+        previous = self.summaries.get(minute)
+        if previous is None or objects >= previous[0]:
+            self.summaries[minute] = (objects, size)
+
+    def merge(self, other):
+        for minute, count in other.moved.items():
+            self.add_moved(minute, count)
+        for minute, (objects, size) in other.summaries.items():
+            self.add_summary(minute, objects, size)
+        return self
+
+    def series(self):
+        """
+        Returns [(minute, objects done, bytes done or None)] in time order,
+        from the summaries when the log has any and from the Moved lines
+        otherwise.
+        """
+        if self.summaries:
+            # Each run of the mover counts from zero; later runs continue from the earlier runs' totals
+            points = []
+            offset_objects = offset_bytes = 0
+            last_objects = last_bytes = 0
+            for minute, (objects, size) in sorted(self.summaries.items()):
+                when = _parse_minute(minute)
+                if when is None:
+                    continue
+                if objects < last_objects:
+                    offset_objects += last_objects
+                    offset_bytes += last_bytes or 0
+                last_objects, last_bytes = objects, size
+                points.append((when, offset_objects + objects,
+                               None if size is None else offset_bytes + size))
+            return points
+        total = 0
+        points = []
+        for minute, count in sorted(self.moved.items()):
+            when = _parse_minute(minute)
+            if when is None:
+                continue
+            total += count
+            points.append((when, total, None))
+        return points
+
+
+def _parse_minute(minute):
+    """Returns the minute as a datetime, or None if it is not a real date and time."""
+    try:
+        return datetime.strptime(minute.decode("ascii"), "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+
+def _line_bounds(buffer, index, end_limit):
+    start = buffer.rfind(b"\n", 0, index) + 1
+    end = buffer.find(b"\n", index, end_limit)
+    return start, end_limit if end == -1 else end
+
+
+def scan_buffer(buffer, start, end, progress=None):
+    """
+    Adds the progress lines whose marker starts in buffer[start:end] to
+    progress. Every marker belongs to the one chunk it starts in, so chunks
+    can be cut anywhere without aligning them to line breaks.
+    """
+    progress = progress or Progress()
+    size = len(buffer)
+
+    moved_end = min(end + len(MOVED_MARKER) - 1, size)
+    index = buffer.find(MOVED_MARKER, start, moved_end)
+    while index != -1:
+        line_start, _ = _line_bounds(buffer, index, size)
+        minute = bytes(buffer[line_start:line_start + MINUTE_WIDTH])
+        if MINUTE.fullmatch(minute):
+            progress.add_moved(minute)
+        index = buffer.find(MOVED_MARKER, index + len(MOVED_MARKER), moved_end)
+
+    summary_end = min(end + len(SUMMARY_MARKER) - 1, size)
+    index = buffer.find(SUMMARY_MARKER, start, summary_end)
+    while index != -1:
+        line_start, line_end = _line_bounds(buffer, index, size)
+        minute = bytes(buffer[line_start:line_start + MINUTE_WIDTH])
+        fields = {name: int(value.replace(b",", b"")) for name, value in
+                  SUMMARY_FIELD.findall(buffer[index:line_end])}
+        if MINUTE.fullmatch(minute) and b"objects_copied" in fields:
+            progress.add_summary(minute, fields[b"objects_copied"], fields.get(b"bytes_copied"))
+        index = buffer.find(SUMMARY_MARKER, index + len(SUMMARY_MARKER), summary_end)
+
+    return progress
+
+
+def _scan_chunk(path, start, end):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return scan_buffer(buffer, start, end)
+
+
+def scan_log(path, workers=None, chunk_size=CHUNK_SIZE):
+    """Scans a whole log, in parallel processes when it is larger than one chunk."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return Progress()
+    if size <= chunk_size:
+        return _scan_chunk(path, 0, size)
+
+    bounds = list(range(0, size, chunk_size)) + [size]
+    progress = Progress()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_scan_chunk, [path] * (len(bounds) - 1), bounds[:-1], bounds[1:])
+        for chunk in chunks:
+            progress.merge(chunk)
+    return progress
+
+
+class RateEstimator:
+    """
+    Exponentially weighted moving average of a running total's rate. Each
+    new point's rate is weighted by how much time it covers, so irregular
+    or missing samples (minutes with no progress) are handled naturally.
+    """
+
+    def __init__(self, half_life=timedelta(minutes=RATE_HALF_LIFE)):
+        self.tau = half_life.total_seconds() / math.log(2)
+        self.rate = None
+        self._last = None
+
+    def update(self, when, total):
+        if self._last is not None:
+            elapsed = (when - self._last[0]).total_seconds()
+            if elapsed <= 0:
+                return
+            rate = (total - self._last[1]) / elapsed
+            if self.rate is None:
+                self.rate = rate
+            else:
+                self.rate += (1 - math.exp(-elapsed / self.tau)) * (rate - self.rate)
+        self._last = (when, total)
+
+
+def estimate(progress, total_files=TOTAL_FILES, total_bytes=TOTAL_BYTES, half_life=timedelta(minutes=RATE_HALF_LIFE)):
+    """Returns the files and bytes done, the time elapsed, the smoothed rates and the time left by each, or None."""
+    points = progress.series()
+    if len(points) < 2:
+        return None
+
+    files_rate = RateEstimator(half_life)
+    bytes_rate = RateEstimator(half_life)
+    for when, objects, size in points:
+        files_rate.update(when, objects)
+        if size is not None:
+            bytes_rate.update(when, size)
+
+    _, moved, moved_bytes = points[-1]
+    result = {
+        "moved": moved,
+        "bytes": moved_bytes,
+        "elapsed": points[-1][0] - points[0][0],
+        "files_per_second": files_rate.rate,
+        "bytes_per_second": bytes_rate.rate,
+        "remaining_by_files": _time_left(total_files - moved, files_rate.rate),
+        "remaining_by_bytes": None,
+    }
+    if moved_bytes is not None:
+        result["remaining_by_bytes"] = _time_left(total_bytes - moved_bytes, bytes_rate.rate)
+    return result
+
+
+def _time_left(remaining, rate):
+    if not rate or rate <= 0:
+        return None
+    return timedelta(seconds=max(remaining, 0) / rate)
+
+
+def _format_timedelta(value):
+    return "unknown" if value is None else str(value).split('.')[0]
+
+
+def report(result, total_files=TOTAL_FILES, total_bytes=TOTAL_BYTES):
+    if result is None:
         print("❗ Not enough data to estimate time remaining.")
-    else:
-        remaining = TOTAL_FILES - moved
-        print(f"📦 Total files moved: {moved:,}")
-        print(f"🕐 Files remaining: {remaining:,} out of {TOTAL_FILES:,}")
-        print(f"⏱️  Total elapsed time: {str(total_elapsed).split('.')[0]}")
-        print(f"⏳ Estimated time remaining: {str(est_remaining).split('.')[0]}")
+        return
+    moved = result["moved"]
+    print(f"📦 Total files moved: {moved:,}")
+    print(f"🕐 Files remaining: {max(total_files - moved, 0):,} out of {total_files:,}")
+    if result["bytes"] is not None:
+        print(f"💾 Bytes moved: {result['bytes']:,} out of {total_bytes:,}")
+    print(f"⏱️  Total elapsed time: {_format_timedelta(result['elapsed'])}")
+    print(f"🚚 Current rate: {result['files_per_second'] or 0:,.1f} files/s")
+    print(f"⏳ Estimated time remaining: {_format_timedelta(result['remaining_by_files'])}")
+    if result["remaining_by_bytes"] is not None:
+        print(f"⏳ Estimated time remaining by bytes: {_format_timedelta(result['remaining_by_bytes'])}")
+
+
+def follow(path, total_files=TOTAL_FILES, total_bytes=TOTAL_BYTES, interval=FOLLOW_INTERVAL, workers=None):
+    """Scans the log once, then reads only what is appended, printing an estimate every interval."""
+    progress = scan_log(path, workers)
+    position = os.path.getsize(path)
+    while True:
+        report(estimate(progress, total_files, total_bytes), total_files, total_bytes)
+        time.sleep(interval)
+        size = os.path.getsize(path)
+        if size < position:
+            # The log was truncated or replaced; start over
+            progress, position = Progress(), 0
+        with open(path, "rb") as f:
+            f.seek(position)
+            data = f.read(size - position)
+        # Leave a trailing partial line for the next round
+        complete = data.rfind(b"\n") + 1
+        scan_buffer(data, 0, complete, progress)
+        position += complete
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate the time left for new_move.py from its log.")
+    parser.add_argument("--log", default=LOG_FILE, help="new_move.py log file")
+    parser.add_argument("--total-files", type=int, default=TOTAL_FILES, help="objects to move in total")
+    parser.add_argument("--total-bytes", type=int, default=TOTAL_BYTES, help="bytes to move in total")
+    parser.add_argument("--workers", type=int, help="processes scanning the log (default: one per CPU)")
+    parser.add_argument("--follow", action="store_true", help="keep reading the log as it grows")
+    parser.add_argument("--interval", type=float, default=FOLLOW_INTERVAL, help="seconds between estimates with --follow")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.follow:
+        try:
+            follow(args.log, args.total_files, args.total_bytes, args.interval, args.workers)
+        except KeyboardInterrupt:
+            pass
+        return
+    progress = scan_log(args.log, args.workers)
+    report(estimate(progress, args.total_files, args.total_bytes), args.total_files, args.total_bytes)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,173 @@
+"""
+Reads S3 Inventory reports so new_move.py can take its keys from a report
+instead of listing the bucket.
+
+An inventory can be given as:
+- the report's manifest.json, on local disk or as s3://bucket/path/manifest.json,
+- a single CSV.gz or Parquet data file, local or on S3,
+- a local directory of CSV.gz or Parquet data files.
+
+Entries are yielded as dicts with the same 'Key', 'Size' and 'ETag' fields
+that list_objects_v2 returns, so they can go straight into the move pipeline.
+Reports that include all versions only yield each key's current version;
+noncurrent versions and delete markers are skipped.
+Parquet support needs pyarrow.
+"""
+
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+from urllib.parse import unquote_plus
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Field order used by CSV reports when there is no manifest to read it from
+DEFAULT_CSV_SCHEMA = "Bucket, Key, Size, LastModifiedDate, ETag"
+
+# Parquet reports use snake_case column names
+PARQUET_COLUMNS = {"Key": "key", "Size": "size", "ETag": "e_tag"}
+# Columns of reports that include all object versions; only current, non-deleted rows are moved
+VERSION_COLUMNS = {"IsLatest": "is_latest", "IsDeleteMarker": "is_delete_marker"}
+
+
+def _split_s3_url(url):
+    bucket, _, key = url[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def _open_binary(s3_client, location):
+    """Opens a local path or s3:// URL for reading bytes."""
+    if location.startswith("s3://"):
+        bucket, key = _split_s3_url(location)
+        return s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    return open(location, "rb")
+
+
+def read_manifest(s3_client, manifest_location):
+    """Returns the parsed manifest and the locations of its data files."""
+    with _open_binary(s3_client, manifest_location) as f:
+        manifest = json.load(f)
+
+    data_files = []
+    for entry in manifest["files"]:
+        if manifest_location.startswith("s3://"):
+            # Data file keys are relative to the bucket the report was delivered to
+            bucket = manifest["destinationBucket"].split(":::")[-1]
+            data_files.append(f"s3://{bucket}/{entry['key']}")
+        else:
+            data_files.append(_find_local_data_file(os.path.dirname(manifest_location), entry["key"]))
+    return manifest, data_files
+
+
+def _find_local_data_file(base_dir, key):
+    """Finds a data file of a downloaded report, whether its bucket layout was kept or flattened."""
+    candidates = [
+        os.path.join(base_dir, key),
+        os.path.join(base_dir, "data", os.path.basename(key)),
+        os.path.join(base_dir, os.path.basename(key)),
+    ]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(f"Inventory data file {key} not found under {base_dir}")
+
+
+def _iter_csv(s3_client, location, schema):
+    fields = [field.strip() for field in schema.split(",")]
+    key_index = fields.index("Key")
+    size_index = fields.index("Size") if "Size" in fields else None
+    etag_index = fields.index("ETag") if "ETag" in fields else None
+    latest_index = fields.index("IsLatest") if "IsLatest" in fields else None
+    marker_index = fields.index("IsDeleteMarker") if "IsDeleteMarker" in fields else None
+
+    with _open_binary(s3_client, location) as raw, gzip.GzipFile(fileobj=raw) as unzipped:
+        for row in csv.reader(io.TextIOWrapper(unzipped, encoding="utf-8", newline="")):
+            if latest_index is not None and row[latest_index].lower() != "true":
+                continue
+            if marker_index is not None and row[marker_index].lower() == "true":
+                continue
+            obj = {"Key": unquote_plus(row[key_index])}
+            if size_index is not None and row[size_index]:
+                obj["Size"] = int(row[size_index])
+            if etag_index is not None and row[etag_index]:
+                obj["ETag"] = row[etag_index]
+            yield obj
+
+
+def _iter_parquet(s3_client, location):
+    if pq is None:
+        raise ImportError("Reading Parquet inventory reports requires pyarrow (pip install pyarrow)")
+
+    if location.startswith("s3://"):
+        # Parquet needs a seekable file, so S3 data files are downloaded first
+        bucket, key = _split_s3_url(location)
+        with tempfile.NamedTemporaryFile(suffix=".parquet") as local:
+            s3_client.download_fileobj(bucket, key, local)
+            local.flush()
+            yield from _iter_parquet(s3_client, local.name)
+        return
+
+    parquet_file = pq.ParquetFile(location)
+    names = parquet_file.schema_arrow.names
+    columns = [c for c in (*PARQUET_COLUMNS.values(), *VERSION_COLUMNS.values()) if c in names]
+    for batch in parquet_file.iter_batches(columns=columns):
+        rows = batch.to_pydict()
+        keys = rows["key"]
+        sizes = rows.get("size")
+        etags = rows.get("e_tag")
+        latest = rows.get("is_latest")
+        markers = rows.get("is_delete_marker")
+        for i, key in enumerate(keys):
+            if latest is not None and not latest[i]:
+                continue
+            if markers is not None and markers[i]:
+                continue
+            obj = {"Key": key}
+            if sizes is not None and sizes[i] is not None:
+                obj["Size"] = sizes[i]
+            if etags is not None and etags[i] is not None:
+                obj["ETag"] = etags[i]
+            yield obj
+
+
+def _is_parquet(location):
+    return location.endswith(".parquet")
+
+
+def iter_inventory(s3_client, location, schema=DEFAULT_CSV_SCHEMA):
+    """
+    Yields every object in the inventory at location, one data file at a
+    time, without holding more than one batch of entries in memory.
+    """
+    if location.endswith(".json"):
+        manifest, data_files = read_manifest(s3_client, location)
+        file_format = manifest.get("fileFormat", "CSV").upper()
+        schema = manifest.get("fileSchema", schema)
+    elif not location.startswith("s3://") and os.path.isdir(location):
+        data_files = sorted(
+            os.path.join(location, name) for name in os.listdir(location)
+            if name.endswith((".csv.gz", ".parquet"))
+        )
+        file_format = "PARQUET" if data_files and _is_parquet(data_files[0]) else "CSV"
+    else:
+        data_files = [location]
+        file_format = "PARQUET" if _is_parquet(location) else "CSV"
+
+    if file_format not in ("CSV", "PARQUET"):
+        raise ValueError(f"Unsupported inventory format {file_format}; use CSV or Parquet")
+
+    for data_file in data_files:
+        logger.info(f"📄 Reading inventory file {data_file}")
+        if file_format == "PARQUET":
+            yield from _iter_parquet(s3_client, data_file)
+        else:
+            yield from _iter_csv(s3_client, data_file, schema)
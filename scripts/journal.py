@@ -0,0 +1,179 @@
+"""
+Per-object audit journal for the S3 mover.
+
+Workers hand records to MoveJournal.record, which only appends to an
+in-memory queue; a single writer thread serializes them as compact JSON
+lines, rotates to a new segment once the current one reaches max_bytes and
+gzips finished segments on a separate thread. Workers never wait on disk.
+If the writer fails (a full disk, a segment it cannot open), it stops and
+every later record() or close() raises JournalError with the cause.
+
+Each line is one object event:
+    {"t": 1714000000.123, "src": "...", "dst": "...", "size": 123, "status": "copied", "ms": 41.7}
+status is "copied", "failed" or "deleted"; dst, size and ms are left out
+when they do not apply. read_journal reads segments back, compressed or not.
+"""
+
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+# Records written per batch before the writer checks for rotation
+WRITE_BATCH = 1000
+
+COPIED = "copied"
+FAILED = "failed"
+DELETED = "deleted"
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class JournalError(RuntimeError):
+    """The journal's writer thread failed; records from then on are not written."""
+
+
+class MoveJournal:
+    """Asynchronous, size-rotated JSONL journal written under `directory`."""
+
+    def __init__(self, directory, max_bytes=SEGMENT_BYTES, compress=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.records = 0
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.SimpleQueue()
+        self._stopped = object()
+        self._segment = 0
+        self._file = None
+        self._compressors = []
+        # The exception that stopped the writer thread, if any
+        self.error = None
+        self._prefix = _unique_prefix(directory)
+        self._writer = threading.Thread(target=self._run, name="move-journal", daemon=True)
+        self._writer.start()
+
+    def record(self, source, status, dest=None, size=None, latency=None):
+        """Queues one event; never blocks. Raises JournalError once the writer has failed."""
+        self._check()
+        self._queue.put((time.time(), source, status, dest, size, latency))
+
+    def close(self):
+        """
+        Writes everything queued so far, then closes and compresses the last
+        segment. Raises JournalError if the writer failed along the way.
+        """
+        self._queue.put(self._stopped)
+        self._writer.join()
+        for thread in self._compressors:
+            thread.join()
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            raise JournalError(f"Journal writer for {self.directory} failed: {self.error}") from self.error
+
+    def _open_segment(self):
+        self._segment += 1
+        path = os.path.join(self.directory, f"{self._prefix}-{self._segment:05d}.jsonl")
+        # "x" fails rather than truncating another run's segment
+        self._file = open(path, "x", encoding="utf-8")
+
+    def _finish_segment(self):
+        path = self._file.name
+        self._file.close()
+        self._file = None
+        if self.compress:
+            thread = threading.Thread(target=_gzip_file, args=(path,), name="journal-gzip")
+            thread.start()
+            self._compressors.append(thread)
+
+    def _run(self):
+        try:
+            self._write()
+        except Exception as e:
+            self.error = e
+            if self._file is not None:
+                try:
+                    self._file.close()
+                except OSError:
+                    pass
+
+    def _write(self):
+        self._open_segment()
+        while True:
+            item = self._queue.get()
+            lines = []
+            stop = False
+            while True:
+                if item is self._stopped:
+                    stop = True
+                    break
+                lines.append(_format(*item))
+                if len(lines) >= WRITE_BATCH:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if lines:
+                self._file.write("".join(lines))
+                self.records += len(lines)
+                if self._file.tell() >= self.max_bytes:
+                    self._finish_segment()
+                    self._open_segment()
+            if stop:
+                self._file.flush()
+                self._finish_segment()
+                return
+
+
+def _unique_prefix(directory):
+    """
+    Names this run's segments by start time and pid, with a counter for
+    journals started in the same second by the same process, so a quick
+    restart never reuses an earlier run's segment names.
+    """
+    base = time.strftime("journal-%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+    prefix = base
+    n = 1
+    while glob.glob(os.path.join(directory, glob.escape(prefix) + "-*")):
+        n += 1
+        prefix = f"{base}.{n}"
+    return prefix
+
+
+def _format(timestamp, source, status, dest, size, latency):
+    record = {"t": round(timestamp, 3), "src": source}
+    if dest is not None:
+        record["dst"] = dest
+    if size is not None:
+        record["size"] = size
+    record["status"] = status
+    if latency is not None:
+        record["ms"] = round(latency * 1000, 1)
+    return _encode(record) + "\n"
+
+
+def _gzip_file(path):
+    with open(path, "rb") as src, gzip.open(path + ".gz", "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.remove(path)
+
+
+def read_journal(path):
+    """Yields the records of a journal directory (every segment, in order) or of one segment file."""
+    if os.path.isdir(path):
+        paths = sorted(glob.glob(os.path.join(path, "journal-*.jsonl*")))
+    else:
+        paths = [path]
+    for segment in paths:
+        opener = gzip.open if segment.endswith(".gz") else open
+        with opener(segment, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
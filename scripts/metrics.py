@@ -0,0 +1,192 @@
+"""
+In-process metrics for the S3 mover.
+
+Workers bump counters and record per-stage latencies in fixed-bucket
+histograms instead of logging every object. MetricsReporter turns them into
+one summary line per interval and, optionally, a Prometheus text file for
+node_exporter's textfile collector. Per-object lines become opt-in and are
+sampled (see Metrics.sampled).
+"""
+
+import bisect
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, roughly doubling from 1 ms to 2 minutes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+REPORT_INTERVAL = 30.0
+
+
+class Histogram:
+    """Counts observations per bucket; the last bucket catches everything above the largest bound."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def copy(self):
+        other = Histogram(self.bounds)
+        other.counts = list(self.counts)
+        other.count = self.count
+        other.sum = self.sum
+        return other
+
+    def quantile(self, q):
+        """Returns the upper bound of the bucket holding the q-th quantile (inf above the last bound)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """
+    Thread-safe counters and per-stage latency histograms. sample_rate is
+    the fraction of objects for which sampled() allows a per-object log line.
+    """
+
+    def __init__(self, sample_rate=0.0):
+        self.sample_rate = sample_rate
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.monotonic() - start)
+
+    def sampled(self):
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def snapshot(self):
+        """Returns copies of the counters and histograms taken under one lock."""
+        with self._lock:
+            return dict(self.counters), {stage: h.copy() for stage, h in self.histograms.items()}
+
+    def summary(self, previous=None, interval=None):
+        """
+        Formats one line with the totals, the rates since `previous` (an
+        earlier snapshot taken `interval` seconds ago) and each stage's
+        p50/p99 latency.
+        """
+        counters, histograms = self.snapshot()
+        parts = [f"{name}={value:,}" for name, value in sorted(counters.items())]
+        if previous is not None and interval:
+            before = previous[0]
+            for name in ("objects_copied", "bytes_copied"):
+                if name in counters:
+                    rate = (counters[name] - before.get(name, 0)) / interval
+                    parts.append(f"{name}/s={rate:,.1f}")
+        for stage, histogram in sorted(histograms.items()):
+            parts.append(f"{stage}_p50={_format_seconds(histogram.quantile(0.5))} "
+                         f"{stage}_p99={_format_seconds(histogram.quantile(0.99))}")
+        return " ".join(parts)
+
+    def prometheus_text(self, namespace="s3_move"):
+        """Renders the counters and histograms in the Prometheus text exposition format."""
+        counters, histograms = self.snapshot()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE {namespace}_{name}_total counter")
+            lines.append(f"{namespace}_{name}_total {value}")
+        if histograms:
+            metric = f"{namespace}_stage_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        lines.append(f"# TYPE {namespace}_start_time_seconds gauge")
+        lines.append(f"{namespace}_start_time_seconds {self.started}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path, namespace="s3_move"):
+        """Writes the Prometheus text file atomically so the collector never reads half a file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text(namespace))
+        os.replace(tmp_path, path)
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    if seconds == float("inf"):
+        return f">{LATENCY_BUCKETS[-1]:g}s"
+    return f"{seconds * 1000:g}ms" if seconds < 1 else f"{seconds:g}s"
+
+
+class MetricsReporter:
+    """
+    Logs a summary line every `interval` seconds on a background thread and
+    refreshes the Prometheus text file, if one is given. stop() writes a
+    final report.
+    """
+
+    def __init__(self, metrics, logger, interval=REPORT_INTERVAL, textfile=None):
+        self.metrics = metrics
+        self.logger = logger
+        self.interval = interval
+        self.textfile = textfile
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-reporter", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        previous = self.metrics.snapshot()
+        while not self._stop.wait(self.interval):
+            self.report(previous, self.interval)
+            previous = self.metrics.snapshot()
+
+    def report(self, previous=None, interval=None):
+        self.logger.info(f"📊 {self.metrics.summary(previous, interval)}")
+        if self.textfile:
+            try:
+                self.metrics.write_textfile(self.textfile)
+            except OSError as e:
+                self.logger.error(f"❌ Error writing metrics to {self.textfile}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
@@ -0,0 +1,127 @@
+import pytest
+import boto3
+import os
+import sys
+from moto import mock_aws
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from checkpoint import MoveCheckpoint, RangeTracker
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    journal = MoveCheckpoint(str(tmp_path / "checkpoint.db"), commit_interval=0)
+    yield journal
+    journal.close()
+
+def test_range_tracker_only_advances_over_contiguous_keys():
+    """Test that a range cursor never skips a key that is still in flight."""
+    tracker = RangeTracker()
+    entries = [tracker.listed(("EPA/", None), key) for key in ["a", "b", "c"]]
+
+    assert tracker.done(("EPA/", None), entries[1]) is None, "❌ Cursor moved past an unfinished key."
+    assert tracker.done(("EPA/", None), entries[0]) == "b"
+    assert tracker.done(("EPA/", None), entries[2]) == "c"
+
+def test_resume_point_uses_cursors_from_differently_split_ranges(checkpoint):
+    """Test that cursors recorded for one split of a prefix are reused for another split."""
+    checkpoint.advance_cursor("EPA/", None, "EPA/EPA-2025-0004/file.json")
+    checkpoint.advance_cursor("EPA/", "EPA/EPA-2025-0006/", "EPA/EPA-2025-0007/file.json")
+
+    # Range starting at the beginning of the prefix resumes from the first cursor
+    assert checkpoint.resume_point("EPA/", None, "EPA/EPA-2025-0002/") == "EPA/EPA-2025-0002/"
+    assert checkpoint.resume_point("EPA/", "EPA/EPA-2025-0002/", None) == "EPA/EPA-2025-0004/file.json"
+    # A cursor that started after the range's lower bound says nothing about it
+    assert checkpoint.resume_point("EPA/", "EPA/EPA-2025-0005/", None) == "EPA/EPA-2025-0005/"
+    assert checkpoint.resume_point("EPA/", "EPA/EPA-2025-0006/", None) == "EPA/EPA-2025-0007/file.json"
+    # Other prefixes are unaffected
+    assert checkpoint.resume_point("FDA/", None, None) is None
+
+def test_resume_finishes_pending_deletes_and_failed_copies(s3_mock, checkpoint):
+    """Test that a resumed run deletes what was copied, retries failures and skips finished ranges."""
+    file_keys = [f"EPA/EPA-2025-0001/text-EPA-2025-0001/comments/EPA-2025-0001-000{i}.json" for i in range(5)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+
+    original_copy_object = new_move.s3.copy_object
+    def failing_copy(**kwargs):
+        if kwargs["CopySource"]["Key"] == file_keys[3]:
+            raise Exception("Simulated copy failure")
+        return original_copy_object(**kwargs)
+
+    # First run: one copy fails and every delete fails, as if the run died before deleting
+    with patch.object(new_move.s3, "copy_object", side_effect=failing_copy), \
+         patch.object(new_move.s3, "delete_objects", side_effect=Exception("Simulated crash")), \
+         patch.object(new_move, "DELETE_RETRY_DELAY", 0):
+        new_move.process_files("test-bucket", checkpoint=checkpoint)
+
+    assert checkpoint.failed_keys() == [file_keys[3]]
+    assert checkpoint.pending_deletes() == sorted(set(file_keys) - {file_keys[3]})
+
+    # Second run resumes: pending deletes go out, the failed copy is retried, nothing else is copied again
+    with patch.object(new_move.s3, "copy_object", wraps=new_move.s3.copy_object) as mock_copy:
+        new_move.process_files("test-bucket", checkpoint=checkpoint, resume=True)
+
+    assert mock_copy.call_count == 1, "❌ Resume copied keys that were already handled."
+    assert checkpoint.pending_deletes() == []
+    assert checkpoint.failed_keys() == []
+    assert checkpoint.progress()["objects_moved"] == 5
+    remaining = s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="EPA/")
+    assert "Contents" not in remaining, "❌ Source files were left behind after resume."
+    for file_key in file_keys:
+        response = s3_mock.list_objects_v2(Bucket="test-bucket", Prefix=new_move.determine_destination(file_key))
+        assert "Contents" in response, f"❌ File {file_key} was not moved."
+
+def test_resume_retries_failed_copies_to_their_planned_destination(s3_mock, checkpoint):
+    """Test that a failed copy from a plan is retried to the plan's destination with its planned size."""
+    file_keys = [f"EPA/EPA-2025-0001/file_{i}.txt" for i in range(3)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+    plan = lambda: [{"Key": key, "Dest": f"planned/file_{i}.txt", "Size": 12} for i, key in enumerate(file_keys)]
+
+    original_copy_object = new_move.s3.copy_object
+    def failing_copy(**kwargs):
+        if kwargs["CopySource"]["Key"] == file_keys[1]:
+            raise Exception("Simulated copy failure")
+        return original_copy_object(**kwargs)
+
+    with patch.object(new_move.s3, "copy_object", side_effect=failing_copy):
+        new_move.process_files("test-bucket", checkpoint=checkpoint, source=plan(), source_id="plan")
+    assert checkpoint.failed_objects() == [(file_keys[1], "planned/file_1.txt", 12)]
+
+    with patch.object(new_move.s3, "head_object", wraps=new_move.s3.head_object) as mock_head:
+        new_move.process_files("test-bucket", checkpoint=checkpoint, resume=True, source=plan(), source_id="plan")
+
+    assert mock_head.call_count == 0, "❌ The planned size should spare a HeadObject."
+    assert checkpoint.failed_keys() == []
+    keys = [obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"]]
+    assert keys == ["planned/file_0.txt", "planned/file_1.txt", "planned/file_2.txt"]
+
+def test_resume_refuses_a_source_without_its_cursor(s3_mock, checkpoint):
+    """Test that resuming from a source that no longer holds the saved cursor fails instead of skipping everything."""
+    s3_mock.put_object(Bucket="test-bucket", Key="EPA/EPA-2025-0001/file.txt", Body="test content")
+    checkpoint.advance_cursor("plan", None, "EPA/EPA-2025-0001/gone.txt")
+
+    with pytest.raises(ValueError, match="gone.txt"):
+        new_move.process_files("test-bucket", checkpoint=checkpoint, resume=True,
+                               source=[{"Key": "EPA/EPA-2025-0001/file.txt"}], source_id="plan")
+    assert "Contents" in s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="EPA/")
@@ -0,0 +1,124 @@
+import pytest
+import boto3
+import os
+import sys
+import threading
+from moto import mock_aws
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from copier import MAX_PARTS, MiB, CopyEngine, part_ranges
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+@pytest.fixture(scope="function")
+def small_parts():
+    """Multipart copies from 8 MiB in 5 MiB parts, so tests stay small."""
+    new_move.configure_copier(threshold=8 * MiB, part_size=5 * MiB, part_workers=2)
+    yield new_move.copier
+    new_move.configure_copier()
+
+def recording(calls):
+    """Wraps s3_request, recording the method of every call."""
+    lock = threading.Lock()
+    def request(method, **kwargs):
+        with lock:
+            calls.append(method)
+        return new_move.s3_request(method, **kwargs)
+    return request
+
+def test_part_ranges_cover_object_within_part_limit():
+    """Test that parts cover every byte once and grow when the object needs more than 10,000 parts."""
+    assert part_ranges(12 * MiB, 5 * MiB) == [(0, 5 * MiB - 1), (5 * MiB, 10 * MiB - 1), (10 * MiB, 12 * MiB - 1)]
+
+    size = 200 * 1024 * MiB
+    ranges = part_ranges(size, 5 * MiB)
+    assert len(ranges) <= MAX_PARTS
+    assert ranges[0][0] == 0 and ranges[-1][1] == size - 1
+    assert all(a[1] + 1 == b[0] for a, b in zip(ranges, ranges[1:]))
+
+def test_large_object_is_copied_in_parts(s3_mock, small_parts):
+    """Test that an object above the threshold is copied with UploadPartCopy and keeps its content and type."""
+    body = os.urandom(12 * MiB)
+    s3_mock.put_object(Bucket="test-bucket", Key="source/large.pdf", Body=body, ContentType="application/pdf")
+
+    calls = []
+    small_parts.request = recording(calls)
+    assert new_move.copy_object("test-bucket", "source/large.pdf", "destination/large.pdf", len(body))
+
+    assert calls.count("upload_part_copy") == 3
+    assert "copy_object" not in calls
+    copied = s3_mock.get_object(Bucket="test-bucket", Key="destination/large.pdf")
+    assert copied["Body"].read() == body
+    assert copied["ContentType"] == "application/pdf"
+
+def test_small_object_uses_single_copy_and_unknown_size_is_looked_up(s3_mock, small_parts):
+    """Test that small objects take one CopyObject and that a missing size costs one HeadObject."""
+    s3_mock.put_object(Bucket="test-bucket", Key="source/small.json", Body="{}")
+
+    calls = []
+    small_parts.request = recording(calls)
+    assert new_move.copy_object("test-bucket", "source/small.json", "destination/small.json", 2)
+    assert calls == ["copy_object"]
+
+    calls.clear()
+    assert new_move.copy_object("test-bucket", "source/small.json", "destination/again.json")
+    assert calls == ["head_object", "copy_object"]
+
+def test_failed_part_aborts_upload(s3_mock, small_parts):
+    """Test that a failing part aborts the multipart upload and reports the copy as failed."""
+    s3_mock.put_object(Bucket="test-bucket", Key="source/large.pdf", Body=os.urandom(12 * MiB))
+
+    with patch.object(new_move.s3, "upload_part_copy", side_effect=Exception("Access Denied")):
+        assert not new_move.copy_object("test-bucket", "source/large.pdf", "destination/large.pdf", 12 * MiB)
+
+    assert "Uploads" not in s3_mock.list_multipart_uploads(Bucket="test-bucket")
+    assert "Contents" not in s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="destination/")
+
+def test_part_pool_is_shared_across_copies(s3_mock):
+    """Test that concurrent large copies never run more parts at once than the shared pool allows."""
+    for i in range(3):
+        s3_mock.put_object(Bucket="test-bucket", Key=f"source/large_{i}.pdf", Body=os.urandom(12 * MiB))
+
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+    def request(method, **kwargs):
+        if method != "upload_part_copy":
+            return new_move.s3_request(method, **kwargs)
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        try:
+            return new_move.s3_request(method, **kwargs)
+        finally:
+            with lock:
+                running["now"] -= 1
+
+    engine = CopyEngine(request, threshold=8 * MiB, part_size=5 * MiB, part_workers=2)
+    threads = [threading.Thread(target=engine.copy, args=("test-bucket", f"source/large_{i}.pdf",
+                                                          f"destination/large_{i}.pdf", 12 * MiB)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.shutdown()
+
+    assert running["peak"] <= 2
+    assert len(s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="destination/")["Contents"]) == 3
@@ -0,0 +1,78 @@
+import os
+import sys
+from datetime import timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.estimated_time as estimated_time
+
+def moved_line(minute, second, i):
+    return f"2025-04-01 10:{minute:02d}:{second:02d},000 - new_move - INFO - ✔ Moved: EPA/file_{i}.json -> raw-data/EPA/file_{i}.json\n"
+
+def summary_line(minute, objects, size):
+    return (f"2025-04-01 10:{minute:02d}:00,000 - new_move - INFO - 📊 bytes_copied={size:,} "
+            f"objects_copied={objects:,} requests={objects * 2:,} copy_p50=25ms copy_p99=250ms\n")
+
+def test_chunked_scan_matches_single_pass(tmp_path):
+    """Test that scanning in small parallel chunks finds the same progress as one pass."""
+    path = tmp_path / "script_output.log"
+    with open(path, "w") as f:
+        for i in range(3000):
+            f.write(moved_line(i // 100, i % 60, i))
+            if i % 7 == 0:
+                f.write("2025-04-01 10:00:00,000 - new_move - ERROR - ❌ Error moving something\n")
+
+    single = estimated_time.scan_log(str(path))
+    chunked = estimated_time.scan_log(str(path), workers=2, chunk_size=4096)
+
+    assert chunked.moved == single.moved
+    assert sum(single.moved.values()) == 3000
+    assert len(single.moved) == 30
+
+def test_estimate_uses_recent_rate_and_bytes(tmp_path):
+    """Test that the EWMA follows the current rate and the summary lines give a byte estimate."""
+    path = tmp_path / "script_output.log"
+    objects = 0
+    with open(path, "w") as f:
+        for minute in range(60):
+            # Slow for the first half hour, then 10x faster
+            objects += 600 if minute < 30 else 6000
+            f.write(summary_line(minute, objects, objects * 1000))
+
+    result = estimated_time.estimate(estimated_time.scan_log(str(path)), total_files=10_000_000,
+                                     total_bytes=10_000_000_000, half_life=timedelta(minutes=5))
+
+    assert result["moved"] == objects
+    assert result["bytes"] == objects * 1000
+    assert 95 < result["files_per_second"] <= 100, "❌ Rate should follow the last minutes, not the whole run."
+    assert result["remaining_by_bytes"] is not None
+
+def test_summary_totals_continue_across_runs(tmp_path):
+    """Test that a resumed run's totals, which restart from zero, are added to the earlier run's."""
+    path = tmp_path / "script_output.log"
+    with open(path, "w") as f:
+        f.write(summary_line(0, 100, 1000))
+        f.write(summary_line(1, 200, 2000))
+        f.write(summary_line(2, 50, 500))
+
+    points = estimated_time.scan_log(str(path)).series()
+
+    assert [objects for _, objects, _ in points] == [100, 200, 250]
+    assert points[-1][2] == 2500
+
+def test_malformed_timestamps_are_skipped(tmp_path):
+    """Test that progress lines with cut-off or impossible timestamps are skipped instead of aborting the scan."""
+    path = tmp_path / "script_output.log"
+    with open(path, "w") as f:
+        for i in range(10):
+            f.write(moved_line(i, 0, i))
+        f.write("2025-04-01 1 - new_move - INFO - ✔ Moved: EPA/cut.json -> raw-data/EPA/cut.json\n")
+        f.write("2025-04-01 1x:05:00,000 - new_move - INFO - ✔ Moved: EPA/bad.json -> raw-data/EPA/bad.json\n")
+        f.write("2025-13-45 10:05:00,000 - new_move - INFO - ✔ Moved: EPA/month.json -> raw-data/EPA/month.json\n")
+        f.write("2025-04-01 10:1" + summary_line(12, 5, 100)[len("2025-04-01 10:12"):])
+
+    progress = estimated_time.scan_log(str(path))
+    series = progress.series()
+    assert len(series) == 10 and series[-1][1] == 10
+    assert estimated_time.scan_log(str(path), workers=2, chunk_size=64).series() == series
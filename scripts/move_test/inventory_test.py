@@ -0,0 +1,126 @@
+import pytest
+import boto3
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from moto import mock_aws
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from inventory import iter_inventory
+
+SOURCE_KEYS = [
+    "EPA/EPA-2025-0001/text-EPA-2025-0001/comments/EPA-2025-0001-0001.json",
+    "EPA/EPA-2025-0001/binary-EPA-2025-0001/comments_attachments/EPA-2025-0001-0001_attachment 1.pdf",
+    "raw-data/FDA/FDA-2025-N-0001/text-FDA-2025-N-0001/dockets/FDA-2025-N-0001.json",
+]
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        s3.create_bucket(Bucket="inventory-bucket")
+        yield s3
+
+def make_csv_gz(keys):
+    """Builds a CSV.gz data file the way S3 Inventory writes it, with URL-encoded keys."""
+    text = io.StringIO()
+    writer = csv.writer(text, quoting=csv.QUOTE_ALL)
+    for key in keys:
+        writer.writerow(["test-bucket", key.replace(" ", "+"), "12", "2025-04-01T00:00:00.000Z", "abc123"])
+    return gzip.compress(text.getvalue().encode("utf-8"))
+
+def make_manifest(data_key):
+    return {
+        "sourceBucket": "test-bucket",
+        "destinationBucket": "arn:aws:s3:::inventory-bucket",
+        "fileFormat": "CSV",
+        "fileSchema": "Bucket, Key, Size, LastModifiedDate, ETag",
+        "files": [{"key": data_key, "size": 0, "MD5checksum": ""}],
+    }
+
+def test_iter_inventory_reads_local_manifest(tmp_path):
+    """Test that a downloaded report is read through its manifest with keys decoded."""
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "part-0.csv.gz").write_bytes(make_csv_gz(SOURCE_KEYS))
+    (tmp_path / "manifest.json").write_text(json.dumps(make_manifest("test-bucket/inventory/data/part-0.csv.gz")))
+
+    objects = list(iter_inventory(None, str(tmp_path / "manifest.json")))
+
+    assert [obj["Key"] for obj in objects] == SOURCE_KEYS
+    assert all(obj["Size"] == 12 and obj["ETag"] == "abc123" for obj in objects)
+
+def test_process_files_moves_keys_from_s3_inventory(s3_mock):
+    """Test that the mover takes its keys from an inventory stored in S3 without listing the bucket."""
+    for key in SOURCE_KEYS:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="test content")
+    s3_mock.put_object(Bucket="inventory-bucket", Key="inventory/data/part-0.csv.gz", Body=make_csv_gz(SOURCE_KEYS))
+    s3_mock.put_object(Bucket="inventory-bucket", Key="inventory/manifest.json",
+                       Body=json.dumps(make_manifest("inventory/data/part-0.csv.gz")))
+
+    manifest = "s3://inventory-bucket/inventory/manifest.json"
+    source = iter_inventory(new_move.s3, manifest)
+    new_move.process_files("test-bucket", source=source, source_id=manifest)
+
+    remaining = [obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"]]
+    assert sorted(remaining) == sorted([new_move.determine_destination(key) for key in SOURCE_KEYS[:2]] + [SOURCE_KEYS[2]])
+
+def test_iter_inventory_reads_parquet(tmp_path):
+    """Test that Parquet reports are streamed with the same fields as CSV ones."""
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table({"bucket": ["test-bucket"] * 3, "key": SOURCE_KEYS, "size": [1, 2, 3], "e_tag": ["a", "b", "c"]})
+    pq.write_table(table, str(tmp_path / "part-0.parquet"))
+
+    objects = list(iter_inventory(None, str(tmp_path)))
+
+    assert objects[1] == {"Key": SOURCE_KEYS[1], "Size": 2, "ETag": "b"}
+
+def test_iter_inventory_skips_noncurrent_versions_and_delete_markers(tmp_path):
+    """Test that versioned reports only yield each key's current, non-deleted version."""
+    rows = [
+        (SOURCE_KEYS[0], "v2", "true", "false", "12"),
+        (SOURCE_KEYS[0], "v1", "false", "false", "10"),
+        (SOURCE_KEYS[1], "v3", "true", "true", ""),
+        (SOURCE_KEYS[1], "v2", "false", "false", "7"),
+        (SOURCE_KEYS[2], "v1", "true", "false", "3"),
+    ]
+    text = io.StringIO()
+    writer = csv.writer(text, quoting=csv.QUOTE_ALL)
+    for key, version, latest, marker, size in rows:
+        writer.writerow(["test-bucket", key.replace(" ", "+"), version, latest, marker, size])
+    (tmp_path / "part-0.csv.gz").write_bytes(gzip.compress(text.getvalue().encode("utf-8")))
+
+    objects = list(iter_inventory(None, str(tmp_path), "Bucket, Key, VersionId, IsLatest, IsDeleteMarker, Size"))
+
+    assert objects == [{"Key": SOURCE_KEYS[0], "Size": 12}, {"Key": SOURCE_KEYS[2], "Size": 3}]
+
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table({
+        "bucket": ["test-bucket"] * len(rows),
+        "key": [row[0] for row in rows],
+        "version_id": [row[1] for row in rows],
+        "is_latest": [row[2] == "true" for row in rows],
+        "is_delete_marker": [row[3] == "true" for row in rows],
+        "size": [int(row[4]) if row[4] else None for row in rows],
+    })
+    (tmp_path / "part-0.csv.gz").unlink()
+    pq.write_table(table, str(tmp_path / "part-0.parquet"))
+
+    assert list(iter_inventory(None, str(tmp_path))) == objects
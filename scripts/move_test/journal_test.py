@@ -0,0 +1,96 @@
+import pytest
+import boto3
+import gzip
+import os
+import sys
+from moto import mock_aws
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from journal import JournalError, MoveJournal, read_journal
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+def test_journal_rotates_and_compresses_segments(tmp_path):
+    """Test that segments rotate by size, are gzip'd once finished and read back in order."""
+    journal = MoveJournal(str(tmp_path), max_bytes=2048)
+    for i in range(200):
+        journal.record(f"EPA/EPA-2025-0001/file_{i}.json", "copied", f"raw-data/EPA/EPA-2025-0001/file_{i}.json", 12, 0.01)
+    journal.close()
+
+    segments = sorted(os.listdir(tmp_path))
+    assert len(segments) > 1
+    assert all(name.endswith(".jsonl.gz") for name in segments)
+    with gzip.open(tmp_path / segments[0], "rt") as f:
+        assert f.readline().startswith('{"t":')
+
+    records = list(read_journal(str(tmp_path)))
+    assert [record["src"] for record in records] == [f"EPA/EPA-2025-0001/file_{i}.json" for i in range(200)]
+    assert records[0]["size"] == 12 and records[0]["status"] == "copied" and records[0]["ms"] == 10.0
+
+def test_journals_started_in_the_same_second_keep_their_records(tmp_path):
+    """Test that a second journal in the same directory never truncates the segments of the first."""
+    for run in ("first", "second"):
+        journal = MoveJournal(str(tmp_path), compress=False)
+        journal.record(f"{run}.json", "copied")
+        journal.close()
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert sorted(record["src"] for record in read_journal(str(tmp_path))) == ["first.json", "second.json"]
+
+def test_journal_reports_a_failed_writer(tmp_path):
+    """Test that a writer thread that cannot open its next segment makes record() and close() raise."""
+    original_open_segment = MoveJournal._open_segment
+    def open_once(journal):
+        if journal._segment:
+            raise OSError("No space left on device")
+        original_open_segment(journal)
+
+    with patch.object(MoveJournal, "_open_segment", autospec=True, side_effect=open_once):
+        journal = MoveJournal(str(tmp_path), max_bytes=1, compress=False)
+        journal.record("first.json", "copied")
+        journal._writer.join(5)
+
+    assert isinstance(journal.error, OSError)
+    with pytest.raises(JournalError, match="No space left"):
+        journal.record("second.json", "copied")
+    with pytest.raises(JournalError):
+        journal.close()
+    assert [record["src"] for record in read_journal(str(tmp_path))] == ["first.json"]
+
+def test_process_files_writes_journal(s3_mock, tmp_path):
+    """Test that every copy and every batched delete of a run lands in the journal."""
+    keys = [f"EPA/EPA-2025-0001/file_{i}.json" for i in range(5)]
+    for key in keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="test content")
+
+    new_move.journal = MoveJournal(str(tmp_path))
+    try:
+        new_move.process_files("test-bucket")
+    finally:
+        new_move.journal.close()
+        new_move.journal = None
+
+    records = list(read_journal(str(tmp_path)))
+    copied = {record["src"]: record for record in records if record["status"] == "copied"}
+    deleted = {record["src"] for record in records if record["status"] == "deleted"}
+    assert set(copied) == set(keys) and deleted == set(keys)
+    assert copied[keys[0]]["dst"] == new_move.determine_destination(keys[0])
+    assert copied[keys[0]]["size"] == len("test content")
@@ -0,0 +1,75 @@
+import pytest
+import boto3
+import os
+import sys
+from moto import mock_aws
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from metrics import Histogram, Metrics
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+@pytest.fixture(scope="function")
+def fresh_metrics():
+    original = new_move.metrics
+    new_move.metrics = Metrics()
+    yield new_move.metrics
+    new_move.metrics = original
+
+def test_histogram_quantiles():
+    histogram = Histogram(bounds=(0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.5] * 9 + [3.0]:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.99) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+def test_prometheus_textfile(tmp_path):
+    """Test that the text file holds counters and cumulative histogram buckets."""
+    metrics = Metrics()
+    metrics.inc("objects_copied", 3)
+    metrics.observe("copy", 0.02)
+    metrics.observe("copy", 0.2)
+    path = tmp_path / "s3_move.prom"
+
+    metrics.write_textfile(str(path))
+
+    text = path.read_text()
+    assert "s3_move_objects_copied_total 3" in text
+    assert 's3_move_stage_seconds_bucket{stage="copy",le="0.025"} 1' in text
+    assert 's3_move_stage_seconds_bucket{stage="copy",le="+Inf"} 2' in text
+    assert 's3_move_stage_seconds_count{stage="copy"} 2' in text
+
+def test_process_files_counts_stages_without_per_object_logs(s3_mock, fresh_metrics, caplog):
+    """Test that moves are counted and timed per stage and per-object lines are off by default."""
+    for i in range(5):
+        s3_mock.put_object(Bucket="test-bucket", Key=f"EPA/EPA-2025-0001/file_{i}.json", Body="test content")
+
+    new_move.process_files("test-bucket")
+
+    counters, histograms = fresh_metrics.snapshot()
+    assert counters["objects_listed"] == 5
+    assert counters["objects_copied"] == 5
+    assert counters["objects_deleted"] == 5
+    assert counters["bytes_copied"] == 5 * len("test content")
+    assert {"list", "classify", "copy", "delete"} <= set(histograms)
+    assert "✔ Moved" not in caplog.text
+    assert "objects_copied=5" in fresh_metrics.summary()
@@ -0,0 +1,36 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.mover_benchmark as mover_benchmark
+
+def test_grid_on_mock_stand_in(tmp_path):
+    """Test that every cell moves the whole seeded bucket and reports requests and latencies per operation."""
+    output = tmp_path / "mover.json"
+    mover_benchmark.main(["--stand-in", "mock", "--objects", "300", "--workers", "2,8",
+                          "--batch-sizes", "50,1000", "--output", str(output)])
+    results = json.loads(output.read_text())
+    assert results["meta"]["stand_in"] == "mock"
+    assert [(cell["workers"], cell["delete_batch_size"]) for cell in results["cells"]] == [
+        (2, 50), (2, 1000), (8, 50), (8, 1000)]
+    for cell in results["cells"]:
+        assert cell["objects_moved"] == cell["objects_deleted"] == cell["objects"] == results["meta"]["objects"]
+        assert cell["failed"] == {"copy_failed": 0, "delete_failed": 0}
+        operations = cell["operations"]
+        assert operations["CopyObject"]["requests"] == cell["objects"]
+        batches = -(-cell["objects"] // cell["delete_batch_size"])
+        assert operations["DeleteObjects"]["requests"] >= batches
+        assert cell["requests"] == sum(operation["requests"] for operation in operations.values())
+        assert 0 < operations["CopyObject"]["p50_ms"] <= operations["CopyObject"]["p99_ms"]
+        assert "copy" in cell["stages"]
+    assert results["best"] in results["cells"]
+
+def test_batch_sizes_are_validated():
+    """Test that delete batch sizes outside 1..1000 are rejected."""
+    with pytest.raises(SystemExit):
+        mover_benchmark.parse_args(["--batch-sizes", "2000"])
@@ -7,6 +7,7 @@ import sys
 from moto import mock_aws
 from unittest.mock import patch
 import concurrent.futures
+import threading
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
@@ -116,9 +117,9 @@ def test_process_files_concurrency(s3_mock):
     assert duration < 100, "❌ Process took too long, possible concurrency issue."
 
 def test_process_files_batching_behavior(s3_mock):
-    """Test that process_files uses batching and does not overload the executor."""
+    """Test that process_files submits every file exactly once through its in-flight window."""
 
-    # Upload 1050 files (expecting at least 3 batches if batch size = 500)
+    # Upload 1050 files (more than ten times the default in-flight window)
     total_files = 1050
     source_files = [f"source/file_{i}.txt" for i in range(total_files)]
     for file_key in source_files:
@@ -126,7 +127,7 @@ def test_process_files_batching_behavior(s3_mock):
 
     call_counter = {"count": 0}
 
-    def mock_process_file(bucket, key):
+    def mock_process_file(bucket, key, dest_key=None, size=None):
         call_counter["count"] += 1
 
     with patch("scripts.new_move.process_file", side_effect=mock_process_file):
@@ -145,14 +146,14 @@ def test_process_files_with_errors(s3_mock):
     for file_key in file_keys:
         s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
 
-    # Mock the move_object function to fail for some files
-    original_move_object = new_move.move_object
-    def mock_move_object(bucket_name, source_key, dest_key):
+    # Mock the copy_object function to fail for some files
+    original_copy_object = new_move.copy_object
+    def mock_copy_object(bucket_name, source_key, dest_key, size=None):
         if source_key == "source/file_5.txt":
             raise Exception("Simulated move failure")
-        original_move_object(bucket_name, source_key, dest_key)
+        return original_copy_object(bucket_name, source_key, dest_key, size)
 
-    with patch.object(new_move, "move_object", side_effect=mock_move_object):
+    with patch.object(new_move, "copy_object", side_effect=mock_copy_object):
         process_files("test-bucket")
 
     # ✅ Ensure all files except the failed one are moved
@@ -164,8 +165,254 @@ def test_process_files_with_errors(s3_mock):
         else:
             assert "Contents" in response, f"❌ File {dest_key} was not moved."
 
+    # ✅ Only the failed file should remain at its source
+    remaining = s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="source/")
+    assert [obj["Key"] for obj in remaining["Contents"]] == ["source/file_5.txt"]
+
     print("✅ Error handling test completed successfully.")
 
+def test_process_files_slow_copy_does_not_stall_window(s3_mock):
+    """Test that one slow copy does not hold up the rest of the in-flight window."""
+
+    file_keys = [f"source/file_{i}.txt" for i in range(10)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+
+    others_done = threading.Event()
+    processed = []
+    lock = threading.Lock()
+
+    def mock_process_file(bucket, key, dest_key=None, size=None):
+        if key == "source/file_0.txt":
+            # Only finishes once every other file went through the remaining slot
+            assert others_done.wait(timeout=10), "❌ Slow copy blocked the other tasks."
+        with lock:
+            processed.append(key)
+            if len(processed) == len(file_keys) - 1:
+                others_done.set()
+        return None
+
+    with patch("scripts.new_move.process_file", side_effect=mock_process_file):
+        process_files("test-bucket", max_workers=2, max_in_flight=2)
+
+    assert processed[-1] == "source/file_0.txt"
+    assert sorted(processed) == sorted(file_keys)
+    print("✅ Sliding window test completed successfully.")
+
+def test_process_files_large_objects_do_not_starve_small_ones(s3_mock):
+    """Test that large copies run in their own lane while small objects keep moving."""
+
+    large_keys = [f"source/large_{i}.pdf" for i in range(3)]
+    small_keys = [f"source/small_{i}.json" for i in range(20)]
+    for key in large_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="x" * 2048)
+    for key in small_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="{}")
+
+    small_done = threading.Event()
+    lock = threading.Lock()
+    processed = []
+    lanes = {}
+
+    def mock_process_file(bucket, key, dest_key=None, size=None):
+        with lock:
+            lanes[key] = threading.current_thread().name
+        if key in large_keys:
+            # Large copies only finish once every small object went through the small lane
+            assert small_done.wait(timeout=10), "❌ Large copies held up the small objects."
+        with lock:
+            processed.append(key)
+            if set(small_keys) <= set(processed):
+                small_done.set()
+        return None
+
+    with patch("scripts.new_move.process_file", side_effect=mock_process_file):
+        process_files("test-bucket", max_workers=2, max_in_flight=2, large_object_size=1024, large_workers=1)
+
+    assert sorted(processed) == sorted(large_keys + small_keys)
+    assert all(lanes[key].startswith("large-lane") for key in large_keys)
+    assert not any(lanes[key].startswith("large-lane") for key in small_keys)
+
+def test_large_workers_must_be_positive():
+    """Test that a large-object lane without workers is rejected instead of stalling the run."""
+    for value in ("0", "-1"):
+        with pytest.raises(SystemExit):
+            new_move.parse_args(["--large-workers", value])
+    assert new_move.parse_args(["--large-workers", "1"]).large_workers == 1
+
+def test_multipart_threshold_must_fit_a_single_copy():
+    """Test that --multipart-threshold is rejected at zero or below and above CopyObject's 5 GiB limit."""
+    for value in ("0", "-5", "5121"):
+        with pytest.raises(SystemExit):
+            new_move.parse_args(["--multipart-threshold", value])
+    assert new_move.parse_args(["--multipart-threshold", "5120"]).multipart_threshold == 5120
+
+def test_connection_pool_covers_every_requesting_thread(s3_mock):
+    """Test that the client's pool has a connection for each worker, lane, part, delete and lister thread."""
+    assert new_move.connection_pool_size(10, 2, 3, 4, 5) == 24
+    assert new_move.create_s3_client().meta.config.max_pool_connections == new_move.connection_pool_size()
+    original = new_move.s3
+    try:
+        new_move.main(["--bucket", "test-bucket", "--workers", "10", "--large-workers", "2", "--part-workers", "3"])
+        expected = 10 + 2 + 3 + new_move.DELETE_WORKERS + new_move.LIST_WORKERS
+        assert new_move.s3.meta.config.max_pool_connections == expected
+    finally:
+        new_move.s3 = original
+        new_move.configure_copier()
+        new_move.configure_limits()
+
+def test_keyspace_lister_fans_out_by_agency_and_range(s3_mock):
+    """Test that parallel listing covers every source key exactly once and skips the destination prefixes."""
+
+    source_keys = ["root-file.txt"]
+    for docket in range(7):
+        source_keys.append(f"EPA/EPA-2025-000{docket}/text-EPA-2025-000{docket}/comments/EPA-2025-000{docket}-0001.json")
+        source_keys.append(f"EPA/EPA-2025-000{docket}/binary-EPA-2025-000{docket}/comments_attachments/EPA-2025-000{docket}-0001_attachment_1.pdf")
+    source_keys.append("EPA/EPA-2025-0003-stray.txt")
+    source_keys.append("FDA/FDA-2025-N-0001/text-FDA-2025-N-0001/dockets/FDA-2025-N-0001.json")
+    destination_keys = ["raw-data/EPA/EPA-2024-0001/text-EPA-2024-0001/comments/EPA-2024-0001-0001.json",
+                        "derived-data/EPA/EPA-2024-0001/mirrulations/extracted_txt/x.txt"]
+    for key in source_keys + destination_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="test content")
+
+    start_after_calls = []
+    original_list = new_move.s3.list_objects_v2
+    def recording_list(**kwargs):
+        if "StartAfter" in kwargs:
+            start_after_calls.append(kwargs["StartAfter"])
+        return original_list(**kwargs)
+
+    with patch.object(new_move.s3, "list_objects_v2", side_effect=recording_list):
+        listed = [obj["Key"] for obj in new_move.KeyspaceLister("test-bucket", workers=4, dockets_per_range=2)]
+
+    assert sorted(listed) == sorted(source_keys), "❌ Listing missed or duplicated keys."
+    assert sorted(start_after_calls) == ["EPA/EPA-2025-0002/", "EPA/EPA-2025-0004/", "EPA/EPA-2025-0006/"], \
+        "❌ Large agency was not split into ranges."
+    print("✅ Keyspace listing test completed successfully.")
+
+def test_keyspace_lister_surfaces_listing_errors(s3_mock):
+    """Test that an error on a listing worker stops the lister instead of hanging it."""
+
+    s3_mock.put_object(Bucket="test-bucket", Key="EPA/EPA-2025-0001/file.txt", Body="test content")
+    original_list = new_move.s3.list_objects_v2
+    def failing_list(**kwargs):
+        if "Delimiter" not in kwargs:
+            raise RuntimeError("listing failed")
+        return original_list(**kwargs)
+
+    with patch.object(new_move.s3, "list_objects_v2", side_effect=failing_list):
+        with pytest.raises(RuntimeError, match="listing failed"):
+            list(new_move.KeyspaceLister("test-bucket"))
+    print("✅ Listing error test completed successfully.")
+
+def test_delete_batcher_uses_batched_requests(s3_mock):
+    """Test that copied sources are removed with DeleteObjects batches instead of one call per key."""
+
+    file_keys = [f"source/file_{i}.txt" for i in range(25)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+
+    deleter = new_move.DeleteBatcher("test-bucket", batch_size=10)
+    with patch.object(new_move.s3, "delete_objects", wraps=new_move.s3.delete_objects) as mock_delete_objects:
+        for file_key in file_keys:
+            deleter.add(file_key)
+        deleter.flush()
+
+    assert mock_delete_objects.call_count == 3, "❌ Expected 3 DeleteObjects calls for 25 keys in batches of 10."
+    assert deleter.deleted == 25
+    assert deleter.failed == []
+    assert "Contents" not in s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="source/")
+
+    print("✅ Batched delete test completed successfully.")
+
+def test_delete_batcher_sends_full_batches_in_the_background(s3_mock):
+    """Test that a slow DeleteObjects call does not hold up the thread adding keys."""
+
+    file_keys = [f"source/file_{i}.txt" for i in range(20)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+
+    release = threading.Event()
+    original_delete_objects = new_move.s3.delete_objects
+    def slow_delete_objects(**kwargs):
+        release.wait(5)
+        return original_delete_objects(**kwargs)
+
+    deleter = new_move.DeleteBatcher("test-bucket", batch_size=10)
+    with patch.object(new_move.s3, "delete_objects", side_effect=slow_delete_objects):
+        start = time.monotonic()
+        for file_key in file_keys:
+            deleter.add(file_key)
+        assert time.monotonic() - start < 1, "❌ add() waited for a DeleteObjects call."
+        assert deleter.deleted == 0
+        release.set()
+        deleter.close()
+
+    assert deleter.deleted == 20
+    assert "Contents" not in s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="source/")
+
+def test_delete_batcher_retries_partial_failures(s3_mock):
+    """Test that throttled keys in a DeleteObjects Errors list are retried on their own and others are not."""
+
+    file_keys = [f"source/file_{i}.txt" for i in range(5)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+
+    original_delete_objects = new_move.s3.delete_objects
+    calls = []
+    def flaky_delete_objects(**kwargs):
+        keys = [obj["Key"] for obj in kwargs["Delete"]["Objects"]]
+        calls.append(keys)
+        if len(calls) == 1:
+            # First attempt: pretend two keys were throttled
+            kwargs["Delete"]["Objects"] = [{"Key": key} for key in keys[2:]]
+            response = original_delete_objects(**kwargs)
+            response["Errors"] = [{"Key": key, "Code": "SlowDown", "Message": "Please reduce your request rate."} for key in keys[:2]]
+            return response
+        if "source/file_0.txt" in keys:
+            # AccessDenied will not change on a retry
+            kwargs["Delete"]["Objects"] = [{"Key": key} for key in keys if key != "source/file_0.txt"]
+            response = original_delete_objects(**kwargs) if kwargs["Delete"]["Objects"] else {}
+            response["Errors"] = [{"Key": "source/file_0.txt", "Code": "AccessDenied", "Message": "Access Denied"}]
+            return response
+        return original_delete_objects(**kwargs)
+
+    with patch.object(new_move.s3, "delete_objects", side_effect=flaky_delete_objects), \
+         patch.object(new_move, "DELETE_RETRY_DELAY", 0):
+        deleter = new_move.DeleteBatcher("test-bucket")
+        for file_key in file_keys:
+            deleter.add(file_key)
+        deleter.flush()
+
+    assert calls[1] == ["source/file_0.txt", "source/file_1.txt"], "❌ Only the failed keys should be retried."
+    assert len(calls) == 2, "❌ A key denied access should not be retried."
+    assert deleter.failed == ["source/file_0.txt"]
+    assert deleter.deleted == 4
+    remaining = s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="source/")
+    assert [obj["Key"] for obj in remaining["Contents"]] == ["source/file_0.txt"]
+
+    print("✅ Partial delete failure test completed successfully.")
+
+def test_delete_batcher_keeps_keys_it_cannot_record(s3_mock):
+    """Test that keys whose on_deleted callback raises still end up in failed and delete_failed."""
+
+    file_keys = [f"source/file_{i}.txt" for i in range(3)]
+    for file_key in file_keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=file_key, Body="test content")
+
+    def broken_checkpoint(keys):
+        raise RuntimeError("database is locked")
+
+    with patch.object(new_move, "metrics", new_move.Metrics()) as metrics:
+        deleter = new_move.DeleteBatcher("test-bucket", on_deleted=broken_checkpoint)
+        for file_key in file_keys:
+            deleter.add(file_key)
+        deleter.close()
+
+    assert sorted(deleter.failed) == file_keys
+    assert metrics.snapshot()[0]["delete_failed"] == 3
+    assert "Contents" not in s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="source/")
+
 def test_process_files_stress_with_large_volume(s3_mock):
     """Stress test process_files with a large number of objects to ensure stability and performance."""
 
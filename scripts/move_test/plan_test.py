@@ -0,0 +1,127 @@
+import pytest
+import boto3
+import gzip
+import json
+import os
+import sys
+from moto import mock_aws
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from planner import PLAN_FIELDS, iter_plan, plan_moves, plan_totals, shard_paths, summary_path
+
+SOURCE_KEYS = [
+    "EPA/EPA-2025-0001/text-EPA-2025-0001/comments/EPA-2025-0001-0001.json",
+    "EPA/EPA-2025-0001/binary-EPA-2025-0001/comments_extracted_text/pdfminer/EPA-2025-0001-0001_attachment_1.txt",
+    "EPA/EPA-2025-0001/comments_extracted_text/pdfminer/EPA-2025-0001-0001_attachment_1.txt",
+    "FDA/FDA-2025-N-0001/text-FDA-2025-N-0001/dockets/FDA-2025-N-0001.json",
+    "stray-file.txt",
+]
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+def test_plan_moves_writes_rows_and_summary(tmp_path):
+    """Test that the plan holds every routed object and the summary counts them."""
+    plan_path = str(tmp_path / "plan.tsv.gz")
+    objects = [{"Key": key, "Size": 10} for key in SOURCE_KEYS]
+    objects.append({"Key": "raw-data/EPA/EPA-2025-0001/done.json", "Size": 10})
+
+    summary = plan_moves(objects, new_move.router, plan_path, skip_prefixes=("raw-data/", "derived-data/"))
+
+    rows = list(iter_plan(plan_path))
+    assert [row["Key"] for row in rows] == SOURCE_KEYS
+    assert all(row["Dest"] == new_move.determine_destination(row["Key"]) for row in rows)
+    assert summary["objects"] == 5 and summary["bytes"] == 50 and summary["skipped"] == 1
+    assert summary["routes"] == {"raw": 2, "derived": 2, "unknown": 1}
+    assert summary["agencies"]["EPA"] == {"objects": 3, "bytes": 30}
+    assert summary["unknown_examples"] == ["stray-file.txt"]
+    # Extracted text keeps only the path below its folder, so both copies of the attachment land on one key
+    assert summary["collisions"] == 1
+    with open(summary_path(plan_path)) as f:
+        assert json.load(f)["dockets"] == {"EPA-2025-0001": 3, "FDA-2025-N-0001": 1}
+
+def test_plan_keeps_unknown_sizes_unknown(tmp_path):
+    """Test that a missing size is written as an empty field and read back as None, not as 0."""
+    plan_path = str(tmp_path / "plan.tsv.gz")
+    summary = plan_moves([{"Key": SOURCE_KEYS[0]}, {"Key": SOURCE_KEYS[3], "Size": 0}], new_move.router, plan_path)
+
+    assert [row["Size"] for row in iter_plan(plan_path)] == [None, 0]
+    assert summary["objects"] == 2 and summary["bytes"] == 0
+
+def test_plan_rows_leave_the_operation_to_the_executor(tmp_path):
+    """Test that rows carry no operation column, while the summary still counts operations, and old rows still read."""
+    plan_path = str(tmp_path / "plan.tsv.gz")
+    summary = plan_moves([{"Key": SOURCE_KEYS[0], "Size": 10}], new_move.router, plan_path,
+                         operation_for=lambda obj: "multipart_copy")
+
+    with gzip.open(plan_path, "rt") as f:
+        assert len(f.readline().rstrip("\n").split("\t")) == len(PLAN_FIELDS) == 3
+    assert summary["operations"] == {"multipart_copy": 1}
+
+    with gzip.open(plan_path, "wt") as f:
+        f.write(f"{SOURCE_KEYS[0]}\tdest.json\t10\tcopy\n")
+    assert list(iter_plan(plan_path)) == [{"Key": SOURCE_KEYS[0], "Dest": "dest.json", "Size": 10}]
+
+def test_plan_shards_keep_dockets_together(tmp_path):
+    """Test that sharded plans cover every object once and never split a docket."""
+    plan_path = str(tmp_path / "plan.tsv.gz")
+    objects = [{"Key": f"AG{i % 7}/AG{i % 7}-2025-{i % 13:04d}/file_{i}.json", "Size": 1} for i in range(300)]
+
+    plan_moves(objects, new_move.router, plan_path, shards=4)
+
+    shards = shard_paths(plan_path, 4)
+    assert shards[0].endswith("plan-00000-of-00004.tsv.gz")
+    dockets_by_shard = [{row["Key"].rsplit("/", 1)[0] for row in iter_plan(path)} for path in shards]
+    assert sum(len(list(iter_plan(path))) for path in shards) == 300
+    # Shards have no summary of their own; their totals are counted from the rows
+    assert sum(plan_totals(path)[0] for path in shards) == 300
+    assert plan_totals(shards[0]) == (len(list(iter_plan(shards[0]))),) * 2
+    assert plan_totals(plan_path) == (300, 300)
+    for i, dockets in enumerate(dockets_by_shard):
+        for other in dockets_by_shard[i + 1:]:
+            assert not dockets & other
+
+def test_process_files_executes_plan(s3_mock, tmp_path):
+    """Test that the mover runs straight from a plan, copying to the planned destinations."""
+    for key in SOURCE_KEYS[:2]:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="test content")
+    plan_path = str(tmp_path / "plan.tsv.gz")
+    new_move.main(["--bucket", "test-bucket", "--plan-out", plan_path])
+    assert len(s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"]) == 2, "❌ Planning changed the bucket."
+
+    new_move.main(["--bucket", "test-bucket", "--from-plan", plan_path])
+
+    remaining = sorted(obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"])
+    assert remaining == sorted(new_move.determine_destination(key) for key in SOURCE_KEYS[:2])
+
+def test_process_files_executes_plan_shards(s3_mock, tmp_path):
+    """Test that each shard of a plan runs on its own, with the shard's own totals for the ETA."""
+    for key in SOURCE_KEYS[:4]:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="test content")
+    plan_path = str(tmp_path / "plan.tsv.gz")
+    new_move.main(["--bucket", "test-bucket", "--plan-out", plan_path, "--plan-shards", "2"])
+
+    for shard in shard_paths(plan_path, 2):
+        new_move.main(["--bucket", "test-bucket", "--from-plan", shard])
+        rows = list(iter_plan(shard))
+        assert new_move.status.total_objects == len(rows)
+        assert new_move.status.total_bytes == len(rows) * len("test content")
+
+    remaining = sorted(obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"])
+    assert remaining == sorted({new_move.determine_destination(key) for key in SOURCE_KEYS[:4]})
@@ -0,0 +1,130 @@
+import random
+import re
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mirrulations_pathgenerator.path_generator import PathGenerator
+from router import DERIVED, RAW, UNKNOWN, PathRouter
+
+RAW_DATA_PREFIX = "raw-data/"
+DERIVED_DATA_PREFIX = "derived-data/"
+
+# The per-call implementations the router replaced, kept here to check it returns the same paths
+def legacy_determine_destination(file_key):
+    match = re.match(r"([^/]+)/([^/]+)/(.+)", file_key)
+    if not match:
+        return RAW_DATA_PREFIX + file_key
+    agency, docket_id, remaining_path = match.groups()
+    extracted_text_match = re.search(r"([^/]*)extracted_text", remaining_path)
+    if extracted_text_match:
+        extracted_text_root = extracted_text_match.group(0)
+        extracted_text_path = remaining_path.split(extracted_text_root + "/", 1)[1]
+        return f"{DERIVED_DATA_PREFIX}{agency}/{docket_id}/mirrulations/extracted_txt/{extracted_text_root}/{extracted_text_path}"
+    return f"{RAW_DATA_PREFIX}{agency}/{docket_id}/{remaining_path}"
+
+def legacy_is_comment_attachment(file_name):
+    return re.match(r'.+_attachment_\d+\.[^.]+$', file_name) is not None
+
+def legacy_extract_agency_docket_folder(file_name, data_type):
+    file_name = re.sub(r'_attachment_\d+\.[^.]+$', '', file_name)
+    file_name = file_name.replace('.json', '').replace('_content.htm', '')
+    parts = file_name.split('-')
+    if len(parts) < 3:
+        return "UNKNOWN", "UNKNOWN"
+    agency = parts[0]
+    if data_type == 'docket':
+        docket_folder = '-'.join(parts)
+    else:
+        docket_folder = '-'.join(parts[:-1])
+    return agency, docket_folder
+
+def legacy_determine_raw_path(file_name, data_type, extension):
+    agency, docket_folder = legacy_extract_agency_docket_folder(file_name, data_type)
+    if legacy_is_comment_attachment(file_name):
+        return f"{RAW_DATA_PREFIX}{agency}/{docket_folder}/binary-{docket_folder}/comments_attachments/{file_name}"
+    elif 'attachment' in file_name:
+        return f"{RAW_DATA_PREFIX}{agency}/{docket_folder}/binary-{docket_folder}/documents_attachments/{file_name}"
+    if extension == 'htm' and file_name.endswith('_content.htm'):
+        folder = 'documents'
+    else:
+        folder = {'docket': 'dockets', 'document': 'documents', 'comment': 'comments'}.get(data_type, 'unknown')
+    return f"{RAW_DATA_PREFIX}{agency}/{docket_folder}/text-{docket_folder}/{folder}/{file_name}"
+
+def legacy_outcome(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as e:
+        return type(e)
+
+def random_keys(count, seed=334):
+    """Builds keys out of the pieces that matter to the routing rules, including malformed ones."""
+    rng = random.Random(seed)
+    pieces = ["EPA", "EPA-R08-OAR-2025-0625", "text-EPA-2025-0001", "binary-FDA-2025-N-4611", "comments",
+              "comments_extracted_text", "extracted_text", "x_extracted_text_v2", "pdfminer", "a.json",
+              "EPA-2025-0001-0002_attachment_1.pdf", "", "\n", "extracted_textextracted_text"]
+    return ["/".join(rng.choice(pieces) for _ in range(rng.randint(1, 6))) for _ in range(count)]
+
+def random_file_names(count, seed=25):
+    rng = random.Random(seed)
+    pieces = ["EPA", "2025", "R08", "0001", "0625", "N", "_attachment_1", "_attachment_12", ".pdf", ".json",
+              "_content.htm", ".htm", "attachment", ".", "\n", "-", "_"]
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+
+def test_route_key_matches_legacy_destinations():
+    router = PathRouter(RAW_DATA_PREFIX, DERIVED_DATA_PREFIX)
+    keys = random_keys(20000) + [
+        "EPA/EPA-2025-0001/text-EPA-2025-0001/comments/EPA-2025-0001-0002.json",
+        "EPA/EPA-2025-0001/text-EPA-2025-0001/comments_extracted_text/pdfminer/EPA-2025-0001-0002_extracted.txt",
+        "EPA/EPA-2025-0001/extracted_text_v2/a/b/extracted_text/c.txt",
+        "root-file.txt",
+        "a/b/",
+    ]
+    for key in keys:
+        expected = legacy_outcome(legacy_determine_destination, key)
+        assert legacy_outcome(router.route_key, key) == expected, f"❌ Routing differs for {key!r}"
+
+def test_classify_many_reports_route_classes():
+    router = PathRouter(RAW_DATA_PREFIX, DERIVED_DATA_PREFIX)
+    assert router.classify_many([
+        "EPA/EPA-2025-0001/text-EPA-2025-0001/comments/EPA-2025-0001-0002.json",
+        "EPA/EPA-2025-0001/text-EPA-2025-0001/comments_extracted_text/pdfminer/a.txt",
+        "placeholder.txt",
+    ]) == [
+        (RAW, "raw-data/EPA/EPA-2025-0001/text-EPA-2025-0001/comments/EPA-2025-0001-0002.json"),
+        (DERIVED, "derived-data/EPA/EPA-2025-0001/mirrulations/extracted_txt/comments_extracted_text/pdfminer/a.txt"),
+        (UNKNOWN, "raw-data/placeholder.txt"),
+    ]
+
+def test_route_file_matches_legacy_where_paths():
+    router = PathRouter(raw_prefix=RAW_DATA_PREFIX)
+    for file_name in random_file_names(20000) + ["VA-2025-VBA-0006-0011_attachment_1.pdf",
+                                                 "FWS-R4-ES-2024-0154-0001_content.htm"]:
+        extension = file_name.split('.')[-1].lower()
+        assert router.is_comment_attachment(file_name) == legacy_is_comment_attachment(file_name)
+        for data_type in ("docket", "document", "comment", "html", "text", "unknown"):
+            assert router.agency_docket(file_name, data_type) == legacy_extract_agency_docket_folder(file_name, data_type)
+            assert router.route_file(file_name, data_type, extension) == \
+                legacy_determine_raw_path(file_name, data_type, extension), f"❌ Routing differs for {file_name!r}"
+
+def test_route_item_matches_path_generator():
+    router = PathRouter()
+    generator = PathGenerator()
+    comment = {
+        "data": {"id": "FDA-2017-D-2335-1566", "type": "comments",
+                 "attributes": {"agencyId": "FDA", "docketId": "FDA-2017-D-2335"}},
+        "included": [{"id": "a", "attributes": {"fileFormats": [{"fileUrl": "https://downloads.regulations.gov/attachment_1.pdf"}]}}],
+    }
+    docket = {"data": {"id": "USTR-2015-0010", "type": "dockets", "attributes": {"agencyId": "USTR"}}}
+    document = {"data": {"id": "USTR-2015-0010-0015", "type": "documents",
+                         "attributes": {"agencyId": "USTR", "docketId": "USTR-2015-0010"}}}
+
+    assert router.route_item("comments", "FDA", "FDA-2017-D-2335", "FDA-2017-D-2335-1566") == generator.get_path(comment)
+    assert router.route_item("dockets", "USTR", "USTR-2015-0010") == generator.get_path(docket)
+    assert router.route_item("documents", "USTR", "USTR-2015-0010", "USTR-2015-0010-0015") == generator.get_path(document)
+    assert router.route_item("document_htm", "USTR", "USTR-2015-0010", "USTR-2015-0010-0015") == \
+        generator.get_document_htm_path(document)
+    assert [router.route_item("comment_attachment", "FDA", "FDA-2017-D-2335", "FDA-2017-D-2335-1566", "attachment_1.pdf")] == \
+        generator.get_attachment_json_paths(comment)
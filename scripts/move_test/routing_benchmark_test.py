@@ -0,0 +1,37 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.routing_benchmark as routing_benchmark
+
+def test_corpus_is_deterministic_and_realistic():
+    """Test that corpora repeat for a seed and include multi-segment dockets and attachments."""
+    corpus = routing_benchmark.Corpus(2000, seed=3, dockets=200)
+    keys = corpus.keys()
+    assert keys == routing_benchmark.Corpus(2000, seed=3, dockets=200).keys()
+    assert len(keys) == 2000
+    assert any("-OAR-" in key for key in keys) and any("_attachment_" in key for key in keys)
+    documents = routing_benchmark.Corpus(2000, seed=3, dockets=200).documents(attachments=1.0)
+    assert any("included" in document for document in documents)
+
+def test_run_and_compare(tmp_path):
+    """Test that results are written as JSON and that compare flags only slower benchmarks."""
+    output = tmp_path / "baseline.json"
+    assert routing_benchmark.main(["--count", "500", "--repeat", "1", "--output", str(output)]) == 0
+    baseline = json.loads(output.read_text())
+    assert baseline["meta"]["count"] == 500
+    assert set(baseline["results"]) == set(routing_benchmark._benchmarks())
+    for result in baseline["results"].values():
+        assert result["items"] > 0 and result["ns_per_item"] > 0
+
+    faster = json.loads(output.read_text())
+    slower = json.loads(output.read_text())
+    for name in baseline["results"]:
+        faster["results"][name]["ns_per_item"] /= 2
+        slower["results"][name]["ns_per_item"] *= 2
+    assert routing_benchmark.compare(slower, baseline, log=lambda line: None) == list(baseline["results"])
+    assert routing_benchmark.compare(faster, baseline, log=lambda line: None) == []
+    assert routing_benchmark.compare(baseline, baseline, log=lambda line: None) == []
@@ -0,0 +1,83 @@
+import pytest
+import boto3
+import json
+import os
+import sys
+import urllib.request
+from moto import mock_aws
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from metrics import Metrics
+from status import MoveStatus, StatusServer
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_snapshot_reports_rates_eta_and_agencies():
+    """Test that the status carries windowed rates, an ETA against the total and per-agency progress."""
+    clock = FakeClock()
+    metrics = Metrics()
+    status = MoveStatus(total_objects=1000, total_bytes=100_000, window=60, clock=clock)
+    status.snapshot(metrics)
+
+    for i in range(100):
+        metrics.inc("objects_copied")
+        metrics.inc("bytes_copied", 100)
+        status.object_done(f"{'EPA' if i % 2 else 'FDA'}/docket/file_{i}.json", 100)
+    metrics.inc("retries", 3)
+    status.set_lanes(small=5, large=1, large_waiting=0)
+    clock.now = 10
+    snapshot = status.snapshot(metrics)
+
+    assert snapshot["objects_per_second"] == 10
+    assert snapshot["bytes_per_second"] == 1000
+    assert snapshot["eta_seconds"] == 90
+    assert snapshot["eta_seconds_by_bytes"] == 90
+    assert snapshot["agencies"]["EPA"] == {"objects": 50, "bytes": 5000}
+    assert snapshot["in_flight"] == {"small": 5, "large": 1, "large_waiting": 0}
+    assert snapshot["retries"] == 3
+
+def test_status_server_serves_live_progress(s3_mock):
+    """Test that the endpoint reports the moves of the running process."""
+    for i in range(3):
+        s3_mock.put_object(Bucket="test-bucket", Key=f"EPA/EPA-2025-0001/file_{i}.json", Body="test content")
+    original_status = new_move.status
+    new_move.status = MoveStatus(total_objects=3)
+    server = StatusServer(0, new_move.current_status, new_move.metrics.prometheus_text).start()
+    try:
+        new_move.process_files("test-bucket")
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/status") as response:
+            snapshot = json.load(response)
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            text = response.read().decode("utf-8")
+    finally:
+        server.stop()
+        new_move.status = original_status
+
+    assert snapshot["agencies"]["EPA"]["objects"] == 3
+    assert snapshot["in_flight"]["small"] == 0
+    assert "s3_move_objects_copied_total" in text
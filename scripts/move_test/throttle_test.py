@@ -0,0 +1,181 @@
+import pytest
+import boto3
+import os
+import sys
+from types import SimpleNamespace
+from moto import mock_aws
+from unittest.mock import patch
+from botocore.exceptions import ClientError
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.new_move as new_move
+from throttle import AimdLimiter, TokenBucket, is_retryable_error, is_throttle_error
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        yield s3
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def slow_down_error(operation="CopyObject"):
+    return ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."},
+                        "ResponseMetadata": {"HTTPStatusCode": 503}}, operation)
+
+def test_token_bucket_caps_request_rate():
+    """Test that the token bucket allows a burst and then spaces requests at the configured rate."""
+    clock = FakeClock()
+    bucket = TokenBucket(10, burst=5, clock=clock, sleep=clock.sleep)
+
+    for _ in range(25):
+        bucket.acquire()
+
+    # 5 requests ride the burst, the other 20 need 2 seconds at 10 requests/s
+    assert clock.now == pytest.approx(2.0)
+
+def test_aimd_limiter_grows_when_healthy_and_halves_on_throttle():
+    """Test additive increase per window of successes and one multiplicative cut per congestion event."""
+    clock = FakeClock()
+    limiter = AimdLimiter(4, maximum=100, clock=clock)
+
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(latency=0.01)
+    assert int(limiter.limit) == 5, "❌ Limit should grow by about one slot per window of successes."
+
+    grown = limiter.limit
+    limiter.acquire()
+    limiter.release(throttled=True)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == pytest.approx(grown / 2), "❌ Throttles in the same cooldown should only cut once."
+
+    clock.now += 2
+    limiter.note_throttle()
+    assert limiter.limit == pytest.approx(grown / 4)
+    assert limiter.throttles == 3
+
+def test_aimd_limiter_shrinks_when_latency_is_high():
+    """Test that slow responses cut the limit once per cooldown, down to the minimum, without counting as throttles."""
+    clock = FakeClock()
+    limiter = AimdLimiter(16, maximum=100, latency_target=0.5, clock=clock)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(latency=2.0)
+    assert limiter.limit == 8, "❌ Slow responses in one cooldown should cut the limit once."
+
+    for _ in range(5):
+        clock.now += 2
+        limiter.acquire()
+        limiter.release(latency=2.0)
+    assert limiter.limit == 1
+    assert limiter.throttles == 0 and limiter.slow == 25
+
+    # Growth resumes once the smoothed latency is back under the target
+    for _ in range(40):
+        limiter.acquire()
+        limiter.release(latency=0.01)
+    assert limiter.limit > 1
+
+def test_s3_request_slow_responses_shrink_concurrency(s3_mock):
+    """Test that the default latency target cuts a lane's limit when its requests are slow."""
+    s3_mock.put_object(Bucket="test-bucket", Key="source/test-file.txt", Body="test content")
+    new_move.configure_limits(max_requests_per_second=0, initial_concurrency=16, max_concurrency=16)
+    clock = FakeClock()
+    original_head_object = new_move.s3.head_object
+    def slow_head(**kwargs):
+        clock.now += 10
+        return original_head_object(**kwargs)
+
+    try:
+        # The call appears to take 10 seconds, above LATENCY_TARGET
+        with patch.object(new_move, "time", SimpleNamespace(monotonic=clock, sleep=clock.sleep)), \
+             patch.object(new_move.s3, "head_object", side_effect=slow_head):
+            new_move.s3_request("head_object", Bucket="test-bucket", Key="source/test-file.txt")
+        assert new_move.concurrency.latency_target == new_move.LATENCY_TARGET
+        assert new_move.concurrency.limit == 8
+        assert new_move.large_concurrency.latency_target == new_move.LARGE_LATENCY_TARGET
+    finally:
+        new_move.configure_limits()
+
+def test_error_classification():
+    assert is_throttle_error(slow_down_error())
+    assert is_retryable_error(ClientError({"Error": {"Code": "InternalError"}}, "CopyObject"))
+    assert not is_retryable_error(ClientError({"Error": {"Code": "AccessDenied"}}, "CopyObject"))
+
+def test_s3_request_backs_off_on_slowdown(s3_mock):
+    """Test that throttled copies are retried and cut the shared concurrency limit."""
+    s3_mock.put_object(Bucket="test-bucket", Key="source/test-file.txt", Body="test content")
+    new_move.configure_limits(max_requests_per_second=0, initial_concurrency=16, max_concurrency=16)
+
+    original_copy_object = new_move.s3.copy_object
+    attempts = []
+    def throttled_copy(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) < 3:
+            raise slow_down_error()
+        return original_copy_object(**kwargs)
+
+    try:
+        with patch.object(new_move.s3, "copy_object", side_effect=throttled_copy), \
+             patch.object(new_move, "REQUEST_RETRY_DELAY", 0):
+            assert new_move.copy_object("test-bucket", "source/test-file.txt", "destination/test-file.txt")
+
+        assert len(attempts) == 3
+        assert new_move.concurrency.throttles == 2
+        assert new_move.concurrency.limit < 16, "❌ Throttling did not reduce concurrency."
+        assert "Contents" in s3_mock.list_objects_v2(Bucket="test-bucket", Prefix="destination/test-file.txt")
+    finally:
+        new_move.configure_limits()
+
+def test_throttled_listing_pages_are_retried(s3_mock):
+    """Test that ListObjectsV2 pages go through s3_request, so repeated SlowDowns do not abort the lister."""
+    keys = [f"EPA/EPA-2025-000{i}/file.txt" for i in range(3)]
+    for key in keys:
+        s3_mock.put_object(Bucket="test-bucket", Key=key, Body="test content")
+    new_move.configure_limits(max_requests_per_second=0, initial_concurrency=16, max_concurrency=16)
+
+    original_list = new_move.s3.list_objects_v2
+    throttled = []
+    def throttled_list(**kwargs):
+        if "Delimiter" not in kwargs and len(throttled) < 2:
+            throttled.append(kwargs)
+            raise slow_down_error("ListObjectsV2")
+        return original_list(**kwargs)
+
+    try:
+        with patch.object(new_move.s3, "list_objects_v2", side_effect=throttled_list), \
+             patch.object(new_move, "REQUEST_RETRY_DELAY", 0):
+            listed = [obj["Key"] for obj in new_move.KeyspaceLister("test-bucket", workers=1)]
+
+        assert sorted(listed) == keys
+        assert len(throttled) == 2
+        assert new_move.concurrency.throttles == 2
+    finally:
+        new_move.configure_limits()
+
+def test_clients_leave_retries_to_s3_request(aws_credentials):
+    """Test that the mover's client makes one attempt per call, while the inventory client keeps botocore's retries."""
+    assert new_move.create_s3_client().meta.config.retries["total_max_attempts"] == 1
+    assert new_move.inventory_client().meta.config.retries["total_max_attempts"] == new_move.REQUEST_MAX_ATTEMPTS
@@ -0,0 +1,280 @@
+"""
+End-to-end throughput benchmark for new_move.py on a local S3 stand-in.
+
+Seeds a bucket with --objects keys in the real
+<agency>/<docket>/text-<docket>/... and binary-<docket>/... layout (the
+same synthetic corpus as routing_benchmark.py), runs
+new_move.process_files on it, and records for every cell of a grid of
+worker counts and delete batch sizes:
+
+- objects moved per second and wall time
+- S3 requests by operation (ListObjectsV2, CopyObject, DeleteObjects, ...)
+- exact p50/p99 latency per operation, measured around every request
+- the mover's own per-stage p50/p99 (list, classify, copy, delete)
+
+Stand-ins:
+- server (default): moto's HTTP server in this process (needs moto[server])
+- mock: moto's in-process mock without HTTP; no network cost, so it
+  measures the mover's own overhead
+- --endpoint-url: any running S3-compatible server (MinIO, moto_server, ...)
+
+Each cell starts from a freshly seeded bucket. With an in-process stand-in
+the keys are written straight into moto's backend, which is ~50x faster
+than PUTs; an external endpoint is seeded with parallel PutObject calls.
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import new_move
+from routing_benchmark import Corpus
+
+BUCKET = "mover-benchmark"
+DEFAULT_OBJECTS = 100_000
+DEFAULT_WORKERS = (8, 32, 64)
+DEFAULT_BATCH_SIZES = (250, 1000)
+# Bytes in every seeded object
+OBJECT_SIZE = 1024
+# Threads seeding an external endpoint
+SEED_WORKERS = 32
+SERVER = "server"
+MOCK = "mock"
+# new_move globals that run_cell replaces
+_MOVER_STATE = ("s3", "metrics", "status", "request_rate", "concurrency", "large_concurrency")
+
+
+class RequestRecorder:
+    """
+    Counts S3 requests by operation and times each one, through botocore's
+    before-call/after-call events on the mover's client.
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        client.meta.events.register("before-call.s3", self._before)
+        client.meta.events.register("after-call.s3", self._after)
+
+    def _before(self, model, **kwargs):
+        self._local.start = time.perf_counter()
+
+    def _after(self, model, **kwargs):
+        elapsed = time.perf_counter() - self._local.start
+        with self._lock:
+            self.latencies.setdefault(model.name, []).append(elapsed)
+
+    def summary(self):
+        with self._lock:
+            latencies = {name: sorted(values) for name, values in self.latencies.items()}
+        return {name: {"requests": len(values),
+                       "p50_ms": round(_percentile(values, 0.50) * 1000, 3),
+                       "p99_ms": round(_percentile(values, 0.99) * 1000, 3)}
+                for name, values in sorted(latencies.items())}
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class StandIn:
+    """Starts (and stops) the S3 stand-in and seeds buckets on it."""
+
+    def __init__(self, kind=SERVER, endpoint_url=None):
+        self.kind = None if endpoint_url else kind
+        self.endpoint_url = endpoint_url
+        self._server = None
+        self._mock = None
+
+    def __enter__(self):
+        if self.endpoint_url is None:
+            for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                                ("AWS_DEFAULT_REGION", "us-east-1")):
+                os.environ.setdefault(name, value)
+        if self.kind == SERVER:
+            try:
+                from moto.server import ThreadedMotoServer
+            except ImportError as e:
+                raise SystemExit(f"❌ The moto server stand-in needs moto[server] ({e}); "
+                                 "install it, use --stand-in mock or pass --endpoint-url") from e
+            port = _free_port()
+            self._server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+            self._server.start()
+            self.endpoint_url = f"http://127.0.0.1:{port}"
+        elif self.kind == MOCK:
+            from moto import mock_aws
+            self._mock = mock_aws()
+            self._mock.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._server is not None:
+            self._server.stop()
+        if self._mock is not None:
+            self._mock.stop()
+
+    def client(self, max_connections=SEED_WORKERS):
+        return new_move.create_s3_client(max_connections, self.endpoint_url)
+
+    def seed(self, keys, body=b"x" * OBJECT_SIZE):
+        """Creates an empty bucket holding keys."""
+        client = self.client()
+        self.reset(client)
+        client.create_bucket(Bucket=BUCKET)
+        if self.kind is not None:
+            from moto.core import DEFAULT_ACCOUNT_ID
+            from moto.s3.models import s3_backends
+            backend = s3_backends[DEFAULT_ACCOUNT_ID]["global"]
+            for key in keys:
+                backend.put_object(BUCKET, key, body)
+            return
+        with ThreadPoolExecutor(SEED_WORKERS) as executor:
+            for _ in executor.map(lambda key: client.put_object(Bucket=BUCKET, Key=key, Body=body), keys):
+                pass
+
+    def reset(self, client):
+        """Removes the benchmark bucket left by an earlier cell or run."""
+        if self.kind is not None:
+            from moto.s3.models import s3_backends
+            s3_backends.reset()
+            return
+        try:
+            for page in client.get_paginator("list_objects_v2").paginate(Bucket=BUCKET):
+                keys = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+                if keys:
+                    client.delete_objects(Bucket=BUCKET, Delete={"Objects": keys, "Quiet": True})
+            client.delete_bucket(Bucket=BUCKET)
+        except client.exceptions.NoSuchBucket:
+            pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_cell(stand_in, keys, workers, batch_size):
+    """Seeds the bucket, moves it with new_move.process_files and returns the cell's results."""
+    stand_in.seed(keys)
+
+    new_move.metrics = new_move.Metrics()
+    new_move.status = new_move.MoveStatus(total_objects=len(keys))
+    new_move.s3 = stand_in.client(new_move.connection_pool_size(workers))
+    recorder = RequestRecorder()
+    recorder.attach(new_move.s3)
+    # No rate or latency limit: the stand-in, not S3's request quotas, is the ceiling being measured
+    new_move.configure_limits(0, workers, workers, latency_target=0)
+
+    start = time.perf_counter()
+    new_move.process_files(BUCKET, max_workers=workers, delete_batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+
+    counters, histograms = new_move.metrics.snapshot()
+    operations = recorder.summary()
+    moved = counters.get("objects_copied", 0)
+    return {
+        "workers": workers,
+        "delete_batch_size": batch_size,
+        "objects": len(keys),
+        "objects_moved": moved,
+        "objects_deleted": counters.get("objects_deleted", 0),
+        "seconds": round(elapsed, 3),
+        "objects_per_second": round(moved / elapsed, 1) if elapsed > 0 else None,
+        "failed": {name: counters.get(name, 0) for name in ("copy_failed", "delete_failed")},
+        "requests": sum(operation["requests"] for operation in operations.values()),
+        "operations": operations,
+        "stages": {stage: {"p50_ms": _bucket_ms(histogram.quantile(0.50)),
+                           "p99_ms": _bucket_ms(histogram.quantile(0.99))}
+                   for stage, histogram in sorted(histograms.items())},
+    }
+
+
+def _bucket_ms(seconds):
+    if seconds is None or seconds == float("inf"):
+        return None
+    return round(seconds * 1000, 3)
+
+
+def run_grid(objects=DEFAULT_OBJECTS, workers=DEFAULT_WORKERS, batch_sizes=DEFAULT_BATCH_SIZES,
+             stand_in=SERVER, endpoint_url=None, seed=0, log=print):
+    """Runs every (workers, batch size) cell on the same key set and returns the results dict."""
+    keys = sorted(set(Corpus(objects, seed).keys()))
+    cells = []
+    # run_cell swaps the mover's module-level client, metrics and limits; they are put back afterwards
+    saved = {name: getattr(new_move, name) for name in _MOVER_STATE}
+    try:
+        with StandIn(stand_in, endpoint_url) as s3_stand_in:
+            for worker_count in workers:
+                for batch_size in batch_sizes:
+                    cell = run_cell(s3_stand_in, keys, worker_count, batch_size)
+                    cells.append(cell)
+                    copy = cell["operations"].get("CopyObject", {})
+                    log(f"🚚 workers={worker_count:<4} batch={batch_size:<5} "
+                        f"{cell['objects_per_second'] or 0:>9,.1f} obj/s {cell['requests']:>8,} requests  "
+                        f"copy p50={copy.get('p50_ms', 0):.1f}ms p99={copy.get('p99_ms', 0):.1f}ms")
+    finally:
+        for name, value in saved.items():
+            setattr(new_move, name, value)
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stand_in": endpoint_url or stand_in,
+            "objects": len(keys),
+            "object_size": OBJECT_SIZE,
+            "seed": seed,
+        },
+        "cells": cells,
+        "best": max(cells, key=lambda cell: cell["objects_per_second"] or 0) if cells else None,
+    }
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",") if part]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark new_move.process_files on a local S3 stand-in.")
+    parser.add_argument("--objects", type=int, default=DEFAULT_OBJECTS, help="objects seeded for every cell")
+    parser.add_argument("--workers", type=_int_list, default=list(DEFAULT_WORKERS),
+                        help="comma-separated worker counts")
+    parser.add_argument("--batch-sizes", type=_int_list, default=list(DEFAULT_BATCH_SIZES),
+                        help="comma-separated DeleteObjects batch sizes (at most 1000)")
+    parser.add_argument("--stand-in", choices=(SERVER, MOCK), default=SERVER, help="local S3 stand-in to start")
+    parser.add_argument("--endpoint-url", help="use an already running S3-compatible server instead")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic key set")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+    if any(not 1 <= size <= new_move.DELETE_BATCH_SIZE for size in args.batch_sizes):
+        parser.error(f"--batch-sizes must be between 1 and {new_move.DELETE_BATCH_SIZE}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_grid(args.objects, args.workers, args.batch_sizes, args.stand_in, args.endpoint_url, args.seed)
+    best = results["best"]
+    if best:
+        print(f"🏁 Best: workers={best['workers']} batch={best['delete_batch_size']} "
+              f"at {best['objects_per_second']:,.1f} objects/s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
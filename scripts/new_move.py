@@ -1,10 +1,30 @@
+import argparse
+import atexit
 import boto3
-import re
+import os
+import sys
 import time
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import logging.handlers
+import threading
+import queue
+import random
+from botocore.config import Config
+from collections import deque
 from itertools import islice
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from checkpoint import MoveCheckpoint, RangeTracker
+from copier import MAX_COPY_SIZE, MULTIPART_THRESHOLD, PART_SIZE, PART_WORKERS, CopyEngine, MiB
+from inventory import DEFAULT_CSV_SCHEMA, iter_inventory
+from journal import COPIED, DELETED, FAILED, SEGMENT_BYTES, MoveJournal
+from metrics import REPORT_INTERVAL, Metrics, MetricsReporter
+from planner import iter_plan, plan_moves, plan_totals
+from router import PathRouter
+from status import STATUS_INTERVAL, MoveStatus, StatusFileWriter, StatusServer
+from throttle import THROTTLE_CODES, AimdLimiter, TokenBucket, is_retryable_code, is_retryable_error, is_throttle_error
 
 # Configure logging
 log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -21,20 +41,172 @@ console_output_handler = logging.StreamHandler()
 console_output_handler.setLevel(logging.INFO)
 console_output_handler.setFormatter(log_formatter)
 
+# Records are formatted and written by a listener thread, so workers never wait on the log files
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(
+    log_queue, file_output_handler, error_output_handler, console_output_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-logger.addHandler(file_output_handler)
-logger.addHandler(error_output_handler)
-logger.addHandler(console_output_handler)
-
-# Initialize S3 client
-s3 = boto3.client('s3')
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
 BUCKET_NAME = "s3testcs334s25"
 SOURCE_PREFIX = ""
 RAW_DATA_PREFIX = "raw-data/"
 DERIVED_DATA_PREFIX = "derived-data/"
 
+# Worker threads; the adaptive limiter decides how many of them send requests at once
+MAX_WORKERS = 64
+# Concurrent S3 requests at start-up, before the limiter adapts
+INITIAL_CONCURRENCY = 20
+# Requests per second across all threads (S3 allows ~3500 writes/s per prefix)
+MAX_REQUESTS_PER_SECOND = 3000
+# Smoothed request latency (seconds) above which a lane's concurrency limit is cut, as for a throttle
+LATENCY_TARGET = 5.0
+# The large-object lane's requests copy up to MULTIPART_THRESHOLD bytes (or a part) each
+LARGE_LATENCY_TARGET = 60.0
+# Throttled or transient failures are retried with jittered exponential backoff
+REQUEST_MAX_ATTEMPTS = 5
+REQUEST_RETRY_DELAY = 0.1
+REQUEST_MAX_RETRY_DELAY = 5.0
+# Copies queued or running at once; kept above MAX_WORKERS so workers never idle
+MAX_IN_FLIGHT = 256
+# Objects of at least this size are copied in the large-object lane
+LARGE_OBJECT_SIZE = 32 * MiB
+# Threads in the large-object lane, each running one large copy at a time
+LARGE_WORKERS = 8
+# Concurrent requests for the large-object lane (its copies and their parts), limited apart from small objects
+LARGE_CONCURRENCY = 16
+# Large objects listed but waiting for a free lane slot before listing pauses
+LARGE_BACKLOG = 10000
+# Listing pages (up to 1000 objects each) buffered ahead of the workers
+LISTING_PREFETCH_PAGES = 5
+# Objects from an inventory or other source buffered ahead of the workers
+LISTING_PREFETCH = 5000
+# Concurrent paginators used by KeyspaceLister
+LIST_WORKERS = 8
+# Agencies with more docket folders than this are listed as several key ranges
+DOCKETS_PER_RANGE = 200
+
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+DELETE_MAX_ATTEMPTS = 3
+DELETE_RETRY_DELAY = 0.5
+# Threads sending DeleteObjects batches, off the thread that refills the copy window
+DELETE_WORKERS = 4
+# Full batches waiting for a delete thread before add() waits for one to finish
+DELETE_BACKLOG = 16
+
+def connection_pool_size(workers=MAX_WORKERS, large_workers=LARGE_WORKERS, part_workers=PART_WORKERS,
+                         delete_workers=DELETE_WORKERS, list_workers=LIST_WORKERS):
+    """Returns how many connections the mover can use at once: one for every thread that sends S3 requests."""
+    return workers + large_workers + part_workers + delete_workers + list_workers
+
+def create_s3_client(max_connections=None, endpoint_url=None, max_attempts=1):
+    """
+    Creates an S3 client with a connection for every thread that sends
+    requests (connection_pool_size() unless max_connections is given), so
+    no request waits for a free connection. By default each
+    call is made exactly once: retries are left to s3_request so that every
+    throttle reaches the concurrency limiter instead of being absorbed inside
+    botocore. Clients for calls that do not go through s3_request (reading an
+    inventory report) pass max_attempts to keep botocore's own retries.
+    endpoint_url points it at an S3-compatible stand-in instead of AWS.
+    """
+    return boto3.client('s3', endpoint_url=endpoint_url,
+                        config=Config(max_pool_connections=max_connections or connection_pool_size(),
+                                      retries={'mode': 'standard', 'total_max_attempts': max_attempts}))
+
+# Initialize S3 client
+s3 = create_s3_client()
+
+router = PathRouter(RAW_DATA_PREFIX, DERIVED_DATA_PREFIX)
+
+# Counters and stage latencies, reported periodically instead of one log line per object
+metrics = Metrics()
+# Per-object audit trail (a MoveJournal), enabled with --journal
+journal = None
+# Live progress served by --status-port and written to --status-file
+status = MoveStatus()
+
+def current_status():
+    return status.snapshot(metrics)
+
+request_rate = TokenBucket(MAX_REQUESTS_PER_SECOND)
+concurrency = AimdLimiter(INITIAL_CONCURRENCY, maximum=MAX_WORKERS, latency_target=LATENCY_TARGET)
+large_concurrency = AimdLimiter(LARGE_CONCURRENCY, latency_target=LARGE_LATENCY_TARGET)
+
+# Marks the threads of the large-object lane, whose requests count against large_concurrency
+_lane = threading.local()
+
+def _enter_large_lane():
+    _lane.large = True
+
+def configure_limits(max_requests_per_second=MAX_REQUESTS_PER_SECOND, initial_concurrency=INITIAL_CONCURRENCY,
+                     max_concurrency=MAX_WORKERS, max_large_concurrency=LARGE_CONCURRENCY,
+                     latency_target=LATENCY_TARGET, large_latency_target=LARGE_LATENCY_TARGET):
+    """
+    Replaces the request-rate limit shared by every S3 call and each lane's
+    concurrency limit. A latency target of 0 (or None) leaves that lane
+    reacting to throttles only.
+    """
+    global request_rate, concurrency, large_concurrency
+    request_rate = TokenBucket(max_requests_per_second)
+    concurrency = AimdLimiter(initial_concurrency, maximum=max_concurrency, latency_target=latency_target or None)
+    large_concurrency = AimdLimiter(max_large_concurrency, latency_target=large_latency_target or None)
+
+def s3_request(method, **kwargs):
+    """
+    Calls an S3 client method under the shared request-rate limit and the
+    concurrency limit of the calling thread's lane. Each call's latency and
+    outcome feed that lane's AIMD limiter, and throttled or transient
+    failures are retried with jittered backoff.
+    """
+    limiter = large_concurrency if getattr(_lane, "large", False) else concurrency
+    for attempt in range(1, REQUEST_MAX_ATTEMPTS + 1):
+        request_rate.acquire()
+        limiter.acquire()
+        metrics.inc("requests")
+        start = time.monotonic()
+        try:
+            response = getattr(s3, method)(**kwargs)
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            limiter.release(throttled=throttled, error=not throttled)
+            if attempt == REQUEST_MAX_ATTEMPTS or not is_retryable_error(e):
+                raise
+            metrics.inc("retries")
+            if throttled:
+                metrics.inc("throttles")
+                logger.warning(f"⚠ Throttled on {method}, concurrency now {int(limiter.limit)}")
+            time.sleep(random.uniform(0, min(REQUEST_MAX_RETRY_DELAY, REQUEST_RETRY_DELAY * 2 ** attempt)))
+            continue
+        limiter.release(latency=time.monotonic() - start)
+        return response
+
+def list_pages(**kwargs):
+    """
+    Yields the pages of a ListObjectsV2 listing, each fetched through
+    s3_request so a throttled or failed page is retried like any other call.
+    """
+    while True:
+        page = s3_request('list_objects_v2', **kwargs)
+        yield page
+        if not page.get('IsTruncated'):
+            return
+        kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+# Single CopyObject below MULTIPART_THRESHOLD, parallel UploadPartCopy above it; parts belong to the large lane
+copier = CopyEngine(s3_request, initializer=_enter_large_lane)
+
+def configure_copier(threshold=MULTIPART_THRESHOLD, part_size=PART_SIZE, part_workers=PART_WORKERS):
+    """Replaces the copy engine, and with it the shared part pool."""
+    global copier
+    copier.shutdown()
+    copier = CopyEngine(s3_request, threshold, part_size, part_workers, initializer=_enter_large_lane)
+
 # Create a placeholder file in the specified folder
 def create_placeholder(bucket_name, key):
     """Creates a placeholder file in the specified folder."""
@@ -64,51 +236,201 @@ def create_derived_data_folder(bucket_name):
     except Exception as e:
         logger.error(f"❌ Error creating Derived_data folder: {e}")
 
-def move_object(bucket_name, source_key, dest_key):
-    """Moves an object from the source to the destination in S3."""
-    try:
-        s3.copy_object(Bucket=bucket_name, CopySource={"Bucket": bucket_name, "Key": source_key}, Key=dest_key)
-        logger.info(f"✔ Moved: {source_key} -> {dest_key}")
-        s3.delete_object(Bucket=bucket_name, Key=source_key)
-        logger.info(f"🗑 Deleted: {source_key}")
-    except s3.exceptions.NoSuchBucket:
+def _log_move_error(source_key, e):
+    """Logs a failed copy or delete with the same messages for every S3 error type."""
+    if isinstance(e, s3.exceptions.NoSuchBucket):
         logger.error(f"❌ Error moving {source_key}: The specified bucket does not exist")
-    except s3.exceptions.NoSuchKey:
+    elif isinstance(e, s3.exceptions.NoSuchKey):
         logger.error(f"❌ Error moving {source_key}: The specified key does not exist")
-    except s3.exceptions.ClientError as e:
+    elif isinstance(e, s3.exceptions.ClientError):
         if e.response['Error']['Code'] == 'AccessDenied':
             logger.error(f"❌ Error moving {source_key}: Access Denied")
         else:
             logger.error(f"❌ ClientError moving {source_key}: {e}")
-    except Exception as e:
+    else:
         logger.error(f"❌ Unexpected error moving {source_key}: {e}")
 
-def determine_destination(file_key):
-    """Determines the destination path based on the file's structure."""
-    match = re.match(r"([^/]+)/([^/]+)/(.+)", file_key)
-    if not match:
-        return RAW_DATA_PREFIX + file_key  # Default to Raw_data if no match
+def copy_object(bucket_name, source_key, dest_key, size=None):
+    """Copies an object to its destination and leaves the source in place,
+    in parts if it is large. Returns True if the copy succeeded."""
+    start = time.monotonic()
+    try:
+        # The copier looks up an unknown size, so the metrics and journal get the real one
+        size = copier.copy(bucket_name, source_key, dest_key, size)
+    except Exception as e:
+        metrics.inc("copy_failed")
+        if journal:
+            journal.record(source_key, FAILED, dest_key, size, time.monotonic() - start)
+        _log_move_error(source_key, e)
+        return False
+    latency = time.monotonic() - start
+    metrics.observe("copy", latency)
+    status.object_done(source_key, size)
+    if journal:
+        journal.record(source_key, COPIED, dest_key, size, latency)
+    metrics.inc("objects_copied")
+    if size:
+        metrics.inc("bytes_copied", size)
+    if metrics.sampled():
+        logger.info(f"✔ Moved: {source_key} -> {dest_key}")
+    return True
+
+def move_object(bucket_name, source_key, dest_key):
+    """Moves an object from the source to the destination in S3."""
+    if not copy_object(bucket_name, source_key, dest_key):
+        return
+    try:
+        with metrics.timer("delete"):
+            s3_request("delete_object", Bucket=bucket_name, Key=source_key)
+        metrics.inc("objects_deleted")
+        if journal:
+            journal.record(source_key, DELETED)
+        if metrics.sampled():
+            logger.info(f"🗑 Deleted: {source_key}")
+    except Exception as e:
+        metrics.inc("delete_failed")
+        _log_move_error(source_key, e)
+
+class DeleteBatcher:
+    """
+    Collects source keys whose copy succeeded and removes them with
+    multi-object DeleteObjects calls of up to DELETE_BATCH_SIZE keys.
+    Full batches are sent by `workers` background threads, so add() returns
+    straight away; it only waits when DELETE_BACKLOG batches are already
+    queued. Keys reported back in a response's Errors list with a throttling
+    or transient code are retried on their own; other errors, and keys that
+    still fail after DELETE_MAX_ATTEMPTS, are kept in `failed`. on_deleted,
+    if given, is called with each list of keys that was removed, from a
+    delete thread; keys it (or the journal) fails to record are kept in
+    `failed` as well.
+    """
+
+    def __init__(self, bucket_name, batch_size=DELETE_BATCH_SIZE, max_attempts=DELETE_MAX_ATTEMPTS, on_deleted=None,
+                 workers=DELETE_WORKERS):
+        self.bucket_name = bucket_name
+        self.on_deleted = on_deleted
+        self.batch_size = min(batch_size, DELETE_BATCH_SIZE)
+        self.max_attempts = max_attempts
+        self.pending = []
+        self.deleted = 0
+        self.failed = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="deleter")
+        self._backlog = threading.BoundedSemaphore(DELETE_BACKLOG)
+        self._futures = set()
+
+    def add(self, key):
+        """Queues a key for deletion, handing a batch to the delete threads once enough have gathered."""
+        with self._lock:
+            self.pending.append(key)
+            if len(self.pending) < self.batch_size:
+                return
+            batch, self.pending = self.pending, []
+        self._submit(batch)
+
+    def _submit(self, batch):
+        self._backlog.acquire()
+        future = self._executor.submit(self._delete_batch, batch)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._batch_done)
+
+    def _batch_done(self, future):
+        with self._lock:
+            self._futures.discard(future)
+        self._backlog.release()
+        if future.exception() is not None:
+            logger.error(f"❌ Exception in delete thread: {future.exception()}")
+
+    def flush(self):
+        """Deletes every key still waiting in the queue and waits until all batches have been sent."""
+        with self._lock:
+            batch, self.pending = self.pending, []
+        for chunk in batch_iterable(batch, self.batch_size):
+            self._submit(chunk)
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures)
 
-    agency, docket_id, remaining_path = match.groups()
+    def close(self):
+        """Flushes, then stops the delete threads."""
+        self.flush()
+        self._executor.shutdown()
 
-    extracted_text_match = re.search(r"([^/]*)extracted_text", remaining_path)
-    if extracted_text_match:
-        extracted_text_root = extracted_text_match.group(0)  # Capture the folder containing "extracted_text"
-        extracted_text_path = remaining_path.split(extracted_text_root + "/", 1)[1]  # Preserve subpath after extracted_text folder
-        derived_dest = f"{DERIVED_DATA_PREFIX}{agency}/{docket_id}/mirrulations/extracted_txt/{extracted_text_root}/{extracted_text_path}"
-        return derived_dest
+    def _delete_batch(self, keys):
+        gave_up = []
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                with metrics.timer("delete"):
+                    response = s3_request(
+                        "delete_objects",
+                        Bucket=self.bucket_name,
+                        Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+                    )
+                errors = response.get("Errors", [])
+                if any(error.get("Code") in THROTTLE_CODES for error in errors):
+                    concurrency.note_throttle()
+                retry = [error for error in errors if is_retryable_code(error.get("Code"))]
+            except Exception as e:
+                logger.error(f"❌ Error deleting batch of {len(keys)} objects (attempt {attempt}): {e}")
+                errors = [{"Key": key, "Message": str(e)} for key in keys]
+                retry = errors if is_retryable_error(e) else []
+            if attempt == self.max_attempts:
+                retry = []
 
-    # If not extracted_text, send to Raw_data
-    return f"{RAW_DATA_PREFIX}{agency}/{docket_id}/{remaining_path}"
+            retry_keys = [error["Key"] for error in retry]
+            retry_set = set(retry_keys)
+            error_keys = {error["Key"] for error in errors}
+            gave_up.extend(error for error in errors if error["Key"] not in retry_set)
+            deleted_keys = [key for key in keys if key not in error_keys]
+            if deleted_keys:
+                with self._lock:
+                    self.deleted += len(deleted_keys)
+                metrics.inc("objects_deleted", len(deleted_keys))
+                gave_up.extend(self._record_deleted(deleted_keys))
+            if not retry_keys:
+                break
+            keys = retry_keys
+            time.sleep(DELETE_RETRY_DELAY * 2 ** (attempt - 1))
 
-def process_file(bucket_name, file_key):
-    """Processes a single file and moves it to the appropriate location."""
+        if not gave_up:
+            return
+        metrics.inc("delete_failed", len(gave_up))
+        for error in gave_up:
+            logger.error(f"❌ Error deleting {error['Key']}: {error.get('Code', '')} {error.get('Message', '')}".rstrip())
+        with self._lock:
+            self.failed.extend(error["Key"] for error in gave_up)
+
+    def _record_deleted(self, keys):
+        """Journals removed keys and hands them to on_deleted. Returns error entries for keys that could not be recorded."""
+        try:
+            if journal:
+                for key in keys:
+                    journal.record(key, DELETED)
+            if self.on_deleted:
+                self.on_deleted(keys)
+        except Exception as e:
+            return [{"Key": key, "Message": f"deleted, but not recorded: {e}"} for key in keys]
+        return []
+
+def determine_destination(file_key):
+    """Determines the destination path based on the file's structure."""
+    return router.route_key(file_key)
+
+def process_file(bucket_name, file_key, dest_key=None, size=None):
+    """Copies a single file to the appropriate location, or to dest_key when a plan gives one.
+    size, when the listing has it, picks single or multipart copy without a HeadObject.
+    Returns the source key once it is safe to delete, otherwise None."""
     try:
         if not file_key.startswith(RAW_DATA_PREFIX) and not file_key.startswith(DERIVED_DATA_PREFIX):
-            dest_key = determine_destination(file_key)
-            move_object(bucket_name, file_key, dest_key)
+            if dest_key is None:
+                with metrics.timer("classify"):
+                    dest_key = determine_destination(file_key)
+            if copy_object(bucket_name, file_key, dest_key, size):
+                return file_key
     except Exception as e:
         logger.error(f"❌ Error processing file {file_key}: {e}")
+    return None
 
 
 
@@ -121,27 +443,422 @@ def batch_iterable(iterable, batch_size):
             break
         yield batch
 
-def process_files(bucket_name):
-    max_workers = 20
-    batch_size = 500
-    paginator = s3.get_paginator('list_objects_v2')
-    page_iterator = paginator.paginate(Bucket=bucket_name, Prefix=SOURCE_PREFIX)
+class KeyspaceLister:
+    """
+    Lists the bucket with several paginators running at once, all feeding
+    one bounded queue of listing pages.
+
+    The top level is discovered first with Delimiter='/', and every agency
+    prefix (except the raw-data/ and derived-data/ destinations) is listed on
+    its own worker. Agencies with more than dockets_per_range docket folders
+    are split further into key ranges: each range lists with StartAfter set
+    to its lower split point and stops once it passes the next one.
+
+    Iterating the lister yields the listed objects as returned by S3, with a
+    'Range' entry of (agency prefix, lower split point) added to objects that
+    came from a range listing. resume_point, if given, is called as
+    resume_point(prefix, start_after, end) to move a range's StartAfter past
+    keys an earlier run already handled (see MoveCheckpoint.resume_point).
+    """
+
+    def __init__(self, bucket_name, prefix=SOURCE_PREFIX, workers=LIST_WORKERS,
+                 dockets_per_range=DOCKETS_PER_RANGE, max_buffered_pages=LISTING_PREFETCH_PAGES,
+                 skip_prefixes=(RAW_DATA_PREFIX, DERIVED_DATA_PREFIX), resume_point=None):
+        self.bucket_name = bucket_name
+        self.resume_point = resume_point
+        self.prefix = prefix
+        self.workers = workers
+        self.dockets_per_range = dockets_per_range
+        self.skip_prefixes = tuple(skip_prefixes)
+        self._pages = queue.Queue(maxsize=max_buffered_pages)
+        self._finished = object()
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._errors = []
+        self._outstanding = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __iter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="lister")
+        self._submit(self._discover)
+        try:
+            while True:
+                page = self._pages.get()
+                if page is self._finished:
+                    break
+                yield from page
+        finally:
+            self._stop.set()
+            self._closed.set()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._errors:
+            raise self._errors[0]
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            self._outstanding += 1
+        self._executor.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.error(f"❌ Error listing {args or self.prefix}: {e}")
+            self._errors.append(e)
+            self._stop.set()
+            self._put(self._finished)
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+                last = self._outstanding == 0
+            if last:
+                self._put(self._finished)
+
+    def _list_delimited(self, prefix):
+        """Returns the sub-prefixes and the objects directly under prefix."""
+        prefixes, objects = [], []
+        for page in list_pages(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+            objects.extend(page.get('Contents', []))
+        return prefixes, objects
+
+    def _discover(self):
+        agencies, objects = self._list_delimited(self.prefix)
+        if objects:
+            self._put(objects)
+        for agency in agencies:
+            if not agency.startswith(self.skip_prefixes):
+                self._submit(self._split, agency)
+
+    def _split(self, agency):
+        dockets, _ = self._list_delimited(agency)
+        split_points = dockets[self.dockets_per_range::self.dockets_per_range]
+        bounds = [None] + split_points + [None]
+        for start_after, end in zip(bounds, bounds[1:]):
+            self._submit(self._list_range, agency, start_after, end)
+
+    def _list_range(self, prefix, start_after, end):
+        """Lists the keys under prefix that sort after start_after and up to end."""
+        range_id = (prefix, start_after)
+        if self.resume_point:
+            start_after = self.resume_point(prefix, start_after, end)
+            if end is not None and start_after is not None and start_after >= end:
+                return
+        kwargs = {'Bucket': self.bucket_name, 'Prefix': prefix}
+        if start_after is not None:
+            kwargs['StartAfter'] = start_after
+        page_start = time.monotonic()
+        for page in list_pages(**kwargs):
+            metrics.observe("list", time.monotonic() - page_start)
+            if self._stop.is_set():
+                return
+            contents = page.get('Contents', [])
+            metrics.inc("objects_listed", len(contents))
+            for obj in contents:
+                obj['Range'] = range_id
+            if end is not None and contents and contents[-1]['Key'] > end:
+                contents = [obj for obj in contents if obj['Key'] <= end]
+                if contents:
+                    self._put(contents)
+                return
+            if contents:
+                self._put(contents)
+            page_start = time.monotonic()
+
+def prefetch(iterable, max_buffered):
+    """
+    Consumes iterable on a background thread so it runs ahead of the caller.
+    At most max_buffered items are held at once; the producer blocks when the
+    buffer is full, which keeps memory flat however far ahead it gets.
+    """
+    buffer = queue.Queue(maxsize=max_buffered)
+    finished = object()
+    stop = threading.Event()
+    errors = []
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fill():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        put(finished)
+
+    threading.Thread(target=fill, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is finished:
+                break
+            yield item
+    finally:
+        stop.set()
+    if errors:
+        raise errors[0]
+
+def iter_source(objects, source_id, checkpoint=None, resume=False):
+    """
+    Prepares objects from a source other than the bucket listing, such as an
+    inventory report: already-moved destination keys are dropped, and each
+    object is tagged so the checkpoint can keep a cursor for the source.
+    Sources are read in the same order every time, so a resumed run skips
+    everything up to and including that cursor. Raises ValueError if the
+    cursor never turns up, since the source then changed since the
+    checkpoint was written and nothing in it could be trusted to be done.
+    """
+    cursor = checkpoint.resume_point(source_id, None) if checkpoint and resume else None
+    for obj in objects:
+        if cursor is not None:
+            if obj['Key'] == cursor:
+                cursor = None
+            continue
+        if obj['Key'].startswith((RAW_DATA_PREFIX, DERIVED_DATA_PREFIX)):
+            continue
+        obj['Range'] = (source_id, None)
+        metrics.inc("objects_listed")
+        yield obj
+    if cursor is not None:
+        logger.error(f"❌ Resume cursor {cursor} is not in {source_id}; every object was skipped")
+        raise ValueError(f"{source_id} no longer contains the checkpoint's cursor {cursor}; "
+                         "rerun without --resume (or with a new --checkpoint) for a full pass")
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for page in page_iterator:
-            if 'Contents' in page:
-                file_keys = [obj['Key'] for obj in page['Contents']]
+def _finish_previous_run(bucket_name, checkpoint, deleter, executor):
+    """
+    Deletes the sources an interrupted run copied but did not delete, and
+    retries the copies it recorded as failed. Returns the keys whose delete
+    still failed so the listing does not copy them again.
+    """
+    pending = checkpoint.pending_deletes()
+    failed = checkpoint.failed_objects()
+    logger.info(f"🔁 Resuming: {len(pending)} pending deletes, {len(failed)} failed copies to retry")
+    for key in pending:
+        deleter.add(key)
+    futures = {executor.submit(process_file, bucket_name, key, dest, size): size for key, dest, size in failed}
+    for future in as_completed(futures):
+        copied_key = future.result()
+        if copied_key:
+            checkpoint.record_copied(copied_key, futures[future])
+            deleter.add(copied_key)
+    deleter.flush()
+    return set(deleter.failed)
 
-                for batch in batch_iterable(file_keys, batch_size):
-                    futures = [executor.submit(process_file, bucket_name, key) for key in batch]
+def process_files(bucket_name, max_workers=MAX_WORKERS, max_in_flight=MAX_IN_FLIGHT, list_workers=LIST_WORKERS,
+                  checkpoint=None, resume=False, source=None, source_id=None,
+                  large_object_size=LARGE_OBJECT_SIZE, large_workers=LARGE_WORKERS, delete_batch_size=DELETE_BATCH_SIZE):
+    """
+    Moves every object in the bucket through a sliding window of tasks.
+    Listing runs ahead on its own threads (see KeyspaceLister), at most
+    max_in_flight copies are queued or running at once, and a free slot is
+    refilled as soon as any copy finishes, so one slow copy never holds up
+    the others.
 
-                    for future in as_completed(futures):
-                        try:
-                            future.result()
-                        except Exception as e:
-                            logger.error(f"❌ Exception in thread execution: {e}")
+    Objects of large_object_size bytes or more (by their listed size) go to
+    a separate lane of large_workers threads with its own concurrency limit.
+    Large objects waiting for that lane are set aside rather than blocking
+    the listing, so small objects keep flowing while large copies proceed
+    in the background. Both lanes share the request-rate limit.
 
-def main():
+    With a MoveCheckpoint, every copy, delete and failure is journaled along
+    with a cursor per listing range. resume=True picks up where the journal
+    left off instead of starting over.
+
+    source replaces the bucket listing with any iterable of objects carrying
+    at least a 'Key' (for example iter_inventory or iter_plan); source_id
+    names it in the checkpoint. Objects with a 'Dest' are copied there
+    instead of being routed again.
+
+    Copied sources are deleted delete_batch_size keys per DeleteObjects call.
+    """
+    deleter = DeleteBatcher(bucket_name, delete_batch_size,
+                            on_deleted=checkpoint.record_deleted if checkpoint else None)
+    tracker = RangeTracker()
+    in_flight = {}
+    small_in_flight = 0
+    large_in_flight = 0
+    waiting_large = deque()
+    skip_keys = set()
+    resume_point = None
+
+    def submit(executor, obj, entry, large):
+        future = executor.submit(process_file, bucket_name, obj['Key'], obj.get('Dest'), obj.get('Size'))
+        in_flight[future] = (obj, entry, large)
+
+    def start_large():
+        nonlocal large_in_flight
+        while waiting_large and large_in_flight < large_workers:
+            submit(large_executor, *waiting_large.popleft(), True)
+            large_in_flight += 1
+
+    def collect(futures):
+        nonlocal small_in_flight, large_in_flight
+        for future in as_completed(futures):
+            obj, entry, large = in_flight.pop(future)
+            if large:
+                large_in_flight -= 1
+            else:
+                small_in_flight -= 1
+            try:
+                copied_key = future.result()
+            except Exception as e:
+                logger.error(f"❌ Exception in thread execution: {e}")
+                copied_key = None
+            if copied_key:
+                if checkpoint:
+                    checkpoint.record_copied(copied_key, obj.get('Size'))
+                deleter.add(copied_key)
+            elif checkpoint:
+                checkpoint.record_failed(obj['Key'], obj.get('Dest'), obj.get('Size'))
+            if checkpoint and entry is not None:
+                cursor = tracker.done(obj['Range'], entry)
+                if cursor is not None:
+                    checkpoint.advance_cursor(*obj['Range'], cursor)
+
+    def report_lanes():
+        status.set_lanes(small=small_in_flight, large=large_in_flight, large_waiting=len(waiting_large))
+
+    def collect_any():
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        collect(done)
+        start_large()
+        report_lanes()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+         ThreadPoolExecutor(max_workers=large_workers, thread_name_prefix="large-lane",
+                            initializer=_enter_large_lane) as large_executor:
+        if checkpoint and resume:
+            skip_keys = _finish_previous_run(bucket_name, checkpoint, deleter, executor)
+            resume_point = checkpoint.resume_point
+        elif checkpoint:
+            checkpoint.reset()
+
+        if source is not None:
+            objects = prefetch(iter_source(source, source_id or "source", checkpoint, resume), LISTING_PREFETCH)
+        else:
+            objects = KeyspaceLister(bucket_name, workers=list_workers, resume_point=resume_point)
+
+        for obj in objects:
+            if obj['Key'] in skip_keys:
+                continue
+            entry = tracker.listed(obj['Range'], obj['Key']) if checkpoint and 'Range' in obj else None
+            if (obj.get('Size') or 0) >= large_object_size:
+                waiting_large.append((obj, entry))
+                start_large()
+                while len(waiting_large) > LARGE_BACKLOG:
+                    collect_any()
+            else:
+                while small_in_flight >= max_in_flight:
+                    collect_any()
+                submit(executor, obj, entry, False)
+                small_in_flight += 1
+            report_lanes()
+        while in_flight:
+            collect_any()
+
+    deleter.close()
+    if checkpoint:
+        checkpoint.commit()
+
+def inventory_client():
+    """A client for reading inventory reports, which keeps botocore's retries since it bypasses s3_request."""
+    return create_s3_client(LIST_WORKERS, max_attempts=REQUEST_MAX_ATTEMPTS)
+
+def write_plan(bucket_name, plan_path, shards=1, inventory=None, inventory_schema=DEFAULT_CSV_SCHEMA):
+    """
+    Plans the move without changing the bucket: routes every listed (or
+    inventoried) object, writes the plan and logs its summary.
+    """
+    if inventory:
+        objects = iter_inventory(inventory_client(), inventory, inventory_schema)
+    else:
+        objects = KeyspaceLister(bucket_name)
+    summary = plan_moves(objects, router, plan_path, shards, skip_prefixes=(RAW_DATA_PREFIX, DERIVED_DATA_PREFIX),
+                         operation_for=lambda obj: copier.operation(obj.get('Size')))
+
+    logger.info(f"🗺 Planned {summary['objects']} objects ({summary['bytes']} bytes) "
+                f"across {len(summary['agencies'])} agencies and {len(summary['dockets'])} dockets; "
+                f"{summary['skipped']} already in place")
+    logger.info(f"🗺 Routes: {dict(summary['routes'])}, operations: {dict(summary['operations'])}")
+    if summary['collisions']:
+        logger.warning(f"⚠ {summary['collisions']} objects share a destination with another object")
+    if summary['unknown_examples']:
+        logger.warning(f"⚠ {summary['routes']['unknown']} keys do not follow <agency>/<docket>/<path>, "
+                       f"e.g. {summary['unknown_examples'][0]}")
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Move files in the bucket into the raw-data/derived-data structure.")
+    parser.add_argument("--bucket", default=BUCKET_NAME, help="bucket to reorganize")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="worker threads, the ceiling for concurrent requests")
+    parser.add_argument("--initial-concurrency", type=int, default=INITIAL_CONCURRENCY, help="concurrent requests before the limiter adapts")
+    parser.add_argument("--max-rps", type=float, default=MAX_REQUESTS_PER_SECOND, help="requests per second across all workers (0 for no limit)")
+    parser.add_argument("--latency-target", type=float, default=LATENCY_TARGET, help="seconds of smoothed request latency above which concurrency is cut (0 to react to throttles only)")
+    parser.add_argument("--large-latency-target", type=float, default=LARGE_LATENCY_TARGET, help="--latency-target for the large-object lane")
+    parser.add_argument("--large-object-size", type=int, default=LARGE_OBJECT_SIZE // MiB, help="objects of at least this many MiB are moved in the large-object lane")
+    parser.add_argument("--large-workers", type=int, default=LARGE_WORKERS, help="large objects copied at once")
+    parser.add_argument("--large-concurrency", type=int, default=LARGE_CONCURRENCY, help="concurrent requests for the large-object lane, parts included")
+    parser.add_argument("--multipart-threshold", type=int, default=MULTIPART_THRESHOLD // MiB, help="objects of at least this many MiB are copied in parts")
+    parser.add_argument("--part-size", type=int, default=PART_SIZE // MiB, help="multipart copy part size in MiB (at least 5)")
+    parser.add_argument("--part-workers", type=int, default=PART_WORKERS, help="threads copying parts, shared by all large objects")
+    parser.add_argument("--delete-batch-size", type=int, default=DELETE_BATCH_SIZE, help="keys per DeleteObjects call (at most 1000)")
+    parser.add_argument("--inventory", help="S3 Inventory manifest.json, CSV.gz/Parquet file or directory (local or s3://) to read keys from instead of listing the bucket")
+    parser.add_argument("--inventory-schema", default=DEFAULT_CSV_SCHEMA, help="CSV field order when --inventory has no manifest")
+    parser.add_argument("--plan-out", help="write a move plan (.tsv.gz) and its summary for the listing or --inventory instead of moving anything")
+    parser.add_argument("--plan-shards", type=int, default=1, help="split the --plan-out plan into this many files by docket")
+    parser.add_argument("--from-plan", help="move the objects listed in a plan file (or one of its shards) instead of listing the bucket")
+    parser.add_argument("--metrics-interval", type=float, default=REPORT_INTERVAL, help="seconds between progress summary lines")
+    parser.add_argument("--metrics-textfile", help="Prometheus text file (for node_exporter's textfile collector) refreshed with every summary")
+    parser.add_argument("--log-sample", type=float, default=0.0, help="fraction of objects that also get a per-object log line (0 to 1)")
+    parser.add_argument("--journal", help="directory for the per-object JSONL audit journal (rotated and gzip'd)")
+    parser.add_argument("--journal-segment-mb", type=int, default=SEGMENT_BYTES // MiB, help="journal segment size before rotation, in MiB")
+    parser.add_argument("--status-port", type=int, help="serve live progress as JSON on http://127.0.0.1:PORT/status (and /metrics)")
+    parser.add_argument("--status-file", help="JSON file rewritten with live progress")
+    parser.add_argument("--status-interval", type=float, default=STATUS_INTERVAL, help="seconds between --status-file updates")
+    parser.add_argument("--total-objects", type=int, help="objects to move, for the ETA (read from the plan summary with --from-plan)")
+    parser.add_argument("--total-bytes", type=int, help="bytes to move, for the ETA (read from the plan summary with --from-plan)")
+    parser.add_argument("--checkpoint", help="SQLite journal recording progress so the run can be resumed")
+    parser.add_argument("--resume", action="store_true", help="continue from the --checkpoint journal instead of starting over")
+    args = parser.parse_args(argv)
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint")
+    if args.from_plan and (args.inventory or args.plan_out):
+        parser.error("--from-plan cannot be combined with --inventory or --plan-out")
+    if not 0 < args.multipart_threshold <= MAX_COPY_SIZE // MiB:
+        parser.error(f"--multipart-threshold must be between 1 and {MAX_COPY_SIZE // MiB} MiB (CopyObject's limit)")
+    if args.part_size < 5:
+        parser.error("--part-size must be at least 5 MiB")
+    if args.plan_shards < 1:
+        parser.error("--plan-shards must be at least 1")
+    if args.latency_target < 0 or args.large_latency_target < 0:
+        parser.error("--latency-target and --large-latency-target cannot be negative")
+    if args.large_workers < 1:
+        parser.error("--large-workers must be at least 1")
+    if not 1 <= args.delete_batch_size <= DELETE_BATCH_SIZE:
+        parser.error(f"--delete-batch-size must be between 1 and {DELETE_BATCH_SIZE}")
+    return args
+
+def main(argv=None):
+    global s3, journal, status
+    args = parse_args(argv)
     logger.info("🚀 Starting the script to move files and create folder structures.")
     
     start_time = time.time()  # Start timing
@@ -150,7 +867,53 @@ def main():
     # create_raw_data_folder(BUCKET_NAME)
     # create_derived_data_folder(BUCKET_NAME)
     
-    process_files(BUCKET_NAME)
+    pool_size = connection_pool_size(args.workers, args.large_workers, args.part_workers)
+    if pool_size != connection_pool_size():
+        s3 = create_s3_client(pool_size)
+    configure_limits(args.max_rps, min(args.initial_concurrency, args.workers), args.workers, args.large_concurrency,
+                     args.latency_target, args.large_latency_target)
+    configure_copier(args.multipart_threshold * MiB, args.part_size * MiB, args.part_workers)
+
+    if args.plan_out:
+        write_plan(args.bucket, args.plan_out, args.plan_shards, args.inventory, args.inventory_schema)
+        logger.info(f"✅ Plan written in {time.time() - start_time:.2f} seconds.")
+        return
+
+    metrics.sample_rate = args.log_sample
+    if args.journal:
+        journal = MoveJournal(args.journal, args.journal_segment_mb * MiB)
+    reporter = MetricsReporter(metrics, logger, args.metrics_interval, args.metrics_textfile).start()
+    total_objects, total_bytes = args.total_objects, args.total_bytes
+    if args.from_plan and (total_objects is None or total_bytes is None):
+        plan_objects, plan_bytes = plan_totals(args.from_plan)
+        total_objects = total_objects or plan_objects
+        total_bytes = total_bytes or plan_bytes
+    status = MoveStatus(total_objects, total_bytes)
+    server = StatusServer(args.status_port, current_status, metrics.prometheus_text).start() if args.status_port else None
+    status_writer = StatusFileWriter(args.status_file, current_status, logger, args.status_interval).start() if args.status_file else None
+    checkpoint = MoveCheckpoint(args.checkpoint) if args.checkpoint else None
+    try:
+        if args.from_plan:
+            source, source_id = iter_plan(args.from_plan), args.from_plan
+        elif args.inventory:
+            source, source_id = iter_inventory(inventory_client(), args.inventory, args.inventory_schema), args.inventory
+        else:
+            source, source_id = None, None
+        process_files(args.bucket, max_workers=args.workers, checkpoint=checkpoint, resume=args.resume,
+                      source=source, source_id=source_id, large_object_size=args.large_object_size * MiB,
+                      large_workers=args.large_workers, delete_batch_size=args.delete_batch_size)
+    finally:
+        reporter.stop()
+        if status_writer:
+            status_writer.stop()
+        if server:
+            server.stop()
+        if checkpoint:
+            checkpoint.close()
+        if journal:
+            # Raises JournalError if the audit trail stopped being written during the run
+            run_journal, journal = journal, None
+            run_journal.close()
     
     end_time = time.time()  # End timing
     duration = end_time - start_time  # Calculate duration
@@ -0,0 +1,140 @@
+"""
+Offline move planning for new_move.py.
+
+plan_moves routes every object of a listing or inventory without touching
+S3 and writes a plan: one gzip'd tab-separated row per object with its
+source, destination and size. It also returns (and writes next to the
+plan) a summary with byte totals, per-agency and per-docket counts, the
+copy operations the sizes call for, destination collisions and keys that
+did not follow the expected layout.
+Plans can be split into shards by docket so several machines can execute
+them, and iter_plan feeds a plan back into process_files.
+"""
+
+import csv
+import gzip
+import json
+import zlib
+from collections import Counter, defaultdict
+
+from copier import COPY
+from router import DERIVED, UNKNOWN
+
+# The copy operation is left out: the executor picks it from the size and its own --multipart-threshold
+PLAN_FIELDS = ("source", "destination", "size")
+# Unknown-route and collision examples kept in the summary
+MAX_EXAMPLES = 100
+
+
+def shard_paths(plan_path, shards):
+    """Returns the file name of every shard of a plan."""
+    if shards == 1:
+        return [plan_path]
+    stem = plan_path[:-len(".tsv.gz")] if plan_path.endswith(".tsv.gz") else plan_path
+    return [f"{stem}-{i:05d}-of-{shards:05d}.tsv.gz" for i in range(shards)]
+
+
+def _shard_for(key, shards):
+    """Keeps every file of a docket in the same shard."""
+    docket_prefix = "/".join(key.split("/", 2)[:2])
+    return zlib.crc32(docket_prefix.encode("utf-8")) % shards
+
+
+def plan_moves(objects, router, plan_path, shards=1, skip_prefixes=(), operation_for=None):
+    """
+    Writes the move plan for objects and returns its summary. operation_for,
+    if given, picks the operation counted in the summary for an object
+    (default: a single copy).
+    Objects under skip_prefixes are already in place and only counted.
+    """
+    paths = shard_paths(plan_path, shards)
+    files = [gzip.open(path, "wt", encoding="utf-8", newline="") for path in paths]
+    writers = [csv.writer(f, delimiter="\t", lineterminator="\n") for f in files]
+
+    summary = {
+        "objects": 0, "bytes": 0, "skipped": 0,
+        "operations": Counter(), "routes": Counter(),
+        "agencies": defaultdict(lambda: {"objects": 0, "bytes": 0}),
+        "dockets": Counter(),
+        "collisions": 0, "collision_examples": [],
+        "unknown_examples": [],
+    }
+    # Only extracted text drops part of its path, so only derived routes can collide
+    derived_sources = {}
+
+    try:
+        for obj in objects:
+            key = obj["Key"]
+            if skip_prefixes and key.startswith(tuple(skip_prefixes)):
+                summary["skipped"] += 1
+                continue
+            # None when the listing or inventory has no size; kept unknown so the copier looks it up
+            size = obj.get("Size")
+            route, destination = router.classify_key(key)
+            operation = operation_for(obj) if operation_for else COPY
+
+            summary["objects"] += 1
+            summary["bytes"] += size or 0
+            summary["operations"][operation] += 1
+            summary["routes"][route] += 1
+            if route == UNKNOWN:
+                if len(summary["unknown_examples"]) < MAX_EXAMPLES:
+                    summary["unknown_examples"].append(key)
+            else:
+                agency, docket, _ = key.split("/", 2)
+                summary["agencies"][agency]["objects"] += 1
+                summary["agencies"][agency]["bytes"] += size or 0
+                summary["dockets"][docket] += 1
+            if route == DERIVED:
+                first_source = derived_sources.setdefault(destination, key)
+                if first_source != key:
+                    summary["collisions"] += 1
+                    if len(summary["collision_examples"]) < MAX_EXAMPLES:
+                        summary["collision_examples"].append(
+                            {"destination": destination, "sources": [first_source, key]})
+
+            writers[_shard_for(key, shards)].writerow((key, destination, "" if size is None else size))
+    finally:
+        for f in files:
+            f.close()
+
+    summary["shards"] = paths
+    with open(summary_path(plan_path), "w") as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+    return summary
+
+
+def summary_path(plan_path):
+    return plan_path + ".summary.json"
+
+
+def plan_totals(plan_path):
+    """
+    Returns (objects, bytes) for a plan or one of its shards. A whole plan
+    has them in its summary; a shard is counted row by row, since the
+    summary next to the full plan covers every shard.
+    """
+    try:
+        with open(summary_path(plan_path)) as f:
+            summary = json.load(f)
+        return summary["objects"], summary["bytes"]
+    except FileNotFoundError:
+        pass
+    objects = total_bytes = 0
+    for obj in iter_plan(plan_path):
+        objects += 1
+        total_bytes += obj["Size"] or 0
+    return objects, total_bytes
+
+
+def iter_plan(plan_path):
+    """
+    Yields the rows of a plan (or one of its shards) as objects for
+    process_files. An empty size field is an unknown size and is yielded as
+    None, so the copier looks it up before choosing a single or multipart copy.
+    Fields past PLAN_FIELDS, such as the operation column of older plans,
+    are ignored.
+    """
+    with gzip.open(plan_path, "rt", encoding="utf-8", newline="") as f:
+        for source, destination, size, *_ in csv.reader(f, delimiter="\t"):
+            yield {"Key": source, "Dest": destination, "Size": int(size) if size else None}
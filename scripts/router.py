@@ -0,0 +1,155 @@
+"""
+One routing engine for every place that turns a name into an S3 path.
+
+- new_move.determine_destination routes existing bucket keys (route_key).
+- where.determine_raw_path and where.extract_agency_docket_folder route
+  local file names (route_file, agency_docket).
+- route_item hands regulations.gov items to PathGenerator.item_path, so
+  that layout is written down once, in mirrulations_pathgenerator.
+
+Patterns are compiled once at import, and each name is routed with a single
+match plus plain string operations. The results are the same as those of
+the per-call regex chains this module replaced.
+"""
+
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mirrulations_pathgenerator.path_generator import PathGenerator
+
+RAW_DATA_PREFIX = "raw-data/"
+DERIVED_DATA_PREFIX = "derived-data/"
+
+# Key routing: <agency>/<docket>/<remaining path>
+_KEY_HEAD = re.compile(r"([^/\n]+)/([^/\n]+)/(?=.)")
+# The first remaining segment containing "extracted_text" ends with it; everything after it is kept
+_EXTRACTED_TEXT = re.compile(
+    r"(?:(?:(?!extracted_text)[^/])*/)*?(?P<root>[^/]*extracted_text)/(?P<sub>.*)\Z", re.DOTALL
+)
+# Used only for keys whose shape the fast rules above do not cover
+_LEGACY_KEY = re.compile(r"([^/]+)/([^/]+)/(.+)")
+_LEGACY_EXTRACTED_TEXT = re.compile(r"([^/]*)extracted_text")
+
+# File routing: <comment id>_attachment_<n>.<extension>
+_ATTACHMENT_SUFFIX = re.compile(r"_attachment_\d+\.[^.]+$")
+
+# Folder under text-<docket> for each data type
+TEXT_FOLDERS = {
+    "docket": "dockets",
+    "document": "documents",
+    "comment": "comments",
+}
+
+# Builds PathGenerator's paths for regulations.gov items
+_ITEM_PATHS = PathGenerator()
+
+# Route classes reported by classify_key
+RAW = "raw"
+DERIVED = "derived"
+UNKNOWN = "unknown"
+
+
+class PathRouter:
+    """
+    Routes bucket keys and local file names to their place in the
+    raw-data/derived-data structure.
+    """
+
+    def __init__(self, raw_prefix=RAW_DATA_PREFIX, derived_prefix=DERIVED_DATA_PREFIX):
+        self.raw_prefix = raw_prefix
+        self.derived_prefix = derived_prefix
+
+    def classify_key(self, key):
+        """
+        Returns (route, destination) for a key already in the bucket. route is
+        RAW, DERIVED for extracted text, or UNKNOWN for keys that do not follow
+        <agency>/<docket>/<path> and are sent to raw-data/ as they are.
+        """
+        head = _KEY_HEAD.match(key)
+        if head is None or "\n" in key:
+            return self._classify_key_legacy(key)
+
+        remaining = key[head.end():]
+        if "extracted_text" not in remaining:
+            return RAW, self.raw_prefix + key
+
+        derived = _EXTRACTED_TEXT.match(remaining)
+        if derived is None:
+            return self._classify_key_legacy(key)
+        agency, docket_id = head.groups()
+        return DERIVED, (f"{self.derived_prefix}{agency}/{docket_id}/mirrulations/extracted_txt/"
+                         f"{derived.group('root')}/{derived.group('sub')}")
+
+    def route_key(self, key):
+        return self.classify_key(key)[1]
+
+    def classify_many(self, keys):
+        """Classifies a batch of keys, returning a list of (route, destination) pairs."""
+        classify = self.classify_key
+        return [classify(key) for key in keys]
+
+    def _classify_key_legacy(self, key):
+        """The original two-regex routing, kept for unusual keys (newlines, empty segments, odd folder names)."""
+        match = _LEGACY_KEY.match(key)
+        if not match:
+            return UNKNOWN, self.raw_prefix + key
+
+        agency, docket_id, remaining_path = match.groups()
+        extracted_text_match = _LEGACY_EXTRACTED_TEXT.search(remaining_path)
+        if extracted_text_match:
+            extracted_text_root = extracted_text_match.group(0)
+            extracted_text_path = remaining_path.split(extracted_text_root + "/", 1)[1]
+            return DERIVED, (f"{self.derived_prefix}{agency}/{docket_id}/mirrulations/extracted_txt/"
+                             f"{extracted_text_root}/{extracted_text_path}")
+        return RAW, f"{self.raw_prefix}{agency}/{docket_id}/{remaining_path}"
+
+    def _split_attachment(self, file_name):
+        """Returns the name without its attachment suffix and whether it is a comment attachment."""
+        suffix = _ATTACHMENT_SUFFIX.search(file_name)
+        if suffix is None:
+            return file_name, False
+        start = suffix.start()
+        is_comment_attachment = start > 0 and "\n" not in file_name[:start]
+        return file_name[:start] + file_name[suffix.end():], is_comment_attachment
+
+    def _agency_docket(self, stem, data_type):
+        stem = stem.replace('.json', '').replace('_content.htm', '')
+        parts = stem.split('-')
+        if len(parts) < 3:
+            return "UNKNOWN", "UNKNOWN"
+        if data_type == 'docket':
+            return parts[0], stem
+        # Documents, comments and everything else drop the item number
+        return parts[0], '-'.join(parts[:-1])
+
+    def agency_docket(self, file_name, data_type):
+        """Returns (agency, docket folder) for a local file name."""
+        stem, _ = self._split_attachment(file_name)
+        return self._agency_docket(stem, data_type)
+
+    def is_comment_attachment(self, file_name):
+        return self._split_attachment(file_name)[1]
+
+    def route_file(self, file_name, data_type, extension):
+        """Returns the raw-data path for a local file."""
+        stem, is_comment_attachment = self._split_attachment(file_name)
+        agency, docket_folder = self._agency_docket(stem, data_type)
+        base = f"{self.raw_prefix}{agency}/{docket_folder}/"
+
+        if is_comment_attachment:
+            return f"{base}binary-{docket_folder}/comments_attachments/{file_name}"
+        if 'attachment' in file_name:
+            return f"{base}binary-{docket_folder}/documents_attachments/{file_name}"
+
+        if extension == 'htm' and file_name.endswith('_content.htm'):
+            folder = 'documents'
+        else:
+            folder = TEXT_FOLDERS.get(data_type, 'unknown')
+        return f"{base}text-{docket_folder}/{folder}/{file_name}"
+
+    def route_item(self, item_type, agency, docket, item=None, file_name=""):
+        """Returns PathGenerator's path for an item of the given data.type (see PathGenerator.item_path)."""
+        return _ITEM_PATHS.item_path(item_type, agency, docket, item, file_name)
@@ -0,0 +1,280 @@
+"""
+Micro-benchmarks for the routing hot paths.
+
+Builds synthetic corpora shaped like the real bucket and scrape: agencies
+with single- and multi-segment docket ids (EPA-2025-0001,
+EPA-R08-OAR-2025-0625, FDA-2017-D-2335, VA-2025-VBA-0006), their
+documents, comments, attachments and extracted text. It then times:
+
+- new_move.determine_destination over bucket keys
+- where.determine_raw_path and where.extract_agency_docket_folder over
+  downloaded file names
+- PathGenerator.get_path (with and without its LRU cache),
+  get_attachment_json_paths, parse_docket_id and get_paths_batch (from
+  parsed dicts and from raw JSON)
+
+Each benchmark runs --repeat times over --count items, and the best and
+median runs are reported. --output writes the results as JSON; --compare
+checks them against an earlier file and exits with status 1 when any
+benchmark is slower by more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import deque
+from itertools import starmap
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import new_move
+import where
+from mirrulations_pathgenerator.path_generator import PathGenerator
+
+DEFAULT_COUNT = 1_000_000
+DEFAULT_REPEAT = 3
+# A benchmark more than this much slower than the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.10
+# Entries in PathGenerator's caches for the cached benchmarks
+CACHE_SIZE = 10000
+
+AGENCIES = ("EPA", "FDA", "USTR", "DHS", "VA", "FWS", "CMS", "DOT", "HHS", "SEC", "NOAA", "OSHA")
+# Docket id shapes seen on regulations.gov, from the agency, year and sequence number
+DOCKET_SHAPES = (
+    lambda rng, agency, year, n: f"{agency}-{year}-{n:04d}",
+    lambda rng, agency, year, n: f"{agency}-R{rng.randint(1, 10):02d}-OAR-{year}-{n:04d}",
+    lambda rng, agency, year, n: f"{agency}-{year}-D-{n:04d}",
+    lambda rng, agency, year, n: f"{agency}-R{rng.randint(1, 9)}-ES-{year}-{n:04d}",
+    lambda rng, agency, year, n: f"{agency}-{year}-{rng.choice(['VBA', 'OS', 'ICEB'])}-{n:04d}",
+)
+
+
+class Corpus:
+    """
+    Deterministic synthetic items. Dockets are drawn from a pool of
+    `dockets` and each carries many items, as in a real scrape, so caches
+    see realistic reuse.
+    """
+
+    def __init__(self, count, seed=0, dockets=None):
+        self.count = count
+        self.rng = random.Random(seed)
+        pool = dockets or max(count // 200, 1)
+        self.dockets = []
+        for n in range(pool):
+            agency = self.rng.choice(AGENCIES)
+            shape = self.rng.choice(DOCKET_SHAPES)
+            self.dockets.append((agency, shape(self.rng, agency, self.rng.randint(2005, 2025), n % 10000)))
+
+    def _items(self):
+        """Yields (agency, docket, item id, kind) with items of a docket arriving in runs."""
+        rng = self.rng
+        made = 0
+        while made < self.count:
+            agency, docket = rng.choice(self.dockets)
+            for _ in range(min(rng.randint(1, 400), self.count - made)):
+                kind = rng.choices(("comment", "document", "docket"), weights=(85, 14, 1))[0]
+                item_id = docket if kind == "docket" else f"{docket}-{rng.randint(1, 99999):04d}"
+                yield agency, docket, item_id, kind
+                made += 1
+
+    def keys(self):
+        """Bucket keys in the <agency>/<docket>/... layout new_move.py routes."""
+        rng = self.rng
+        keys = []
+        for agency, docket, item_id, kind in self._items():
+            roll = rng.random()
+            if kind == "docket":
+                keys.append(f"{agency}/{docket}/text-{docket}/docket/{docket}.json")
+            elif roll < 0.5:
+                keys.append(f"{agency}/{docket}/text-{docket}/{kind}s/{item_id}.json")
+            elif roll < 0.7:
+                keys.append(f"{agency}/{docket}/binary-{docket}/{kind}s_attachments/{item_id}_attachment_1.pdf")
+            elif roll < 0.95:
+                keys.append(f"{agency}/{docket}/text-{docket}/{kind}s_extracted_text/pdfminer/"
+                            f"{item_id}_attachment_1_extracted.txt")
+            elif roll < 0.99:
+                keys.append(f"{agency}/{docket}/text-{docket}/documents/{item_id}_content.htm")
+            else:
+                keys.append(f"{item_id}.json")
+        return keys
+
+    def files(self):
+        """(file name, data type, extension) for downloaded files, as where.py sees them."""
+        rng = self.rng
+        files = []
+        for _, _, item_id, kind in self._items():
+            roll = rng.random()
+            if kind == "docket" or roll < 0.6:
+                files.append((f"{item_id}.json", kind, "json"))
+            elif roll < 0.9:
+                extension = rng.choice(("pdf", "docx", "jpg"))
+                files.append((f"{item_id}_attachment_{rng.randint(1, 5)}.{extension}", "comment", extension))
+            else:
+                files.append((f"{item_id}_content.htm", "html", "htm"))
+        return files
+
+    def documents(self, attachments=0.3):
+        """regulations.gov JSON items; a share of comments include attachments."""
+        rng = self.rng
+        documents = []
+        for agency, docket, item_id, kind in self._items():
+            attributes = {"agencyId": agency}
+            if kind != "docket" and rng.random() < 0.8:
+                attributes["docketId"] = docket
+            document = {"data": {"id": item_id, "type": f"{kind}s", "attributes": attributes}}
+            if kind == "comment" and rng.random() < attachments:
+                document["included"] = [
+                    {"id": f"{item_id}-a{n}", "attributes": {"fileFormats": [
+                        {"fileUrl": f"https://downloads.regulations.gov/{item_id}/attachment_{n}.{extension}"}
+                        for extension in ("pdf", "docx")[:rng.randint(1, 2)]]}}
+                    for n in range(1, rng.randint(2, 6))]
+            documents.append(document)
+        return documents
+
+
+def _each(function):
+    """Calls function on every input without keeping the results."""
+    return lambda inputs: deque(map(function, inputs), maxlen=0)
+
+
+def _each_args(function):
+    return lambda inputs: deque(starmap(function, inputs), maxlen=0)
+
+
+def _benchmarks():
+    """Returns {name: (corpus method, make runner)}; runners are made fresh for every run."""
+    uncached = PathGenerator()
+    return {
+        "new_move.determine_destination": (Corpus.keys, lambda: _each(new_move.determine_destination)),
+        "where.determine_raw_path": (Corpus.files, lambda: _each_args(where.determine_raw_path)),
+        "where.extract_agency_docket_folder": (
+            lambda corpus: [file[:2] for file in corpus.files()],
+            lambda: _each_args(where.extract_agency_docket_folder)),
+        "PathGenerator.get_path": (Corpus.documents, lambda: _each(uncached.get_path)),
+        "PathGenerator.get_path[cached]": (Corpus.documents, lambda: _each(PathGenerator(CACHE_SIZE).get_path)),
+        "PathGenerator.get_attachment_json_paths": (
+            lambda corpus: [document for document in corpus.documents(attachments=1.0) if "included" in document],
+            lambda: _each(uncached.get_attachment_json_paths)),
+        "PathGenerator.parse_docket_id": (
+            lambda corpus: [document["data"]["id"] for document in corpus.documents(attachments=0)],
+            lambda: _each(uncached.parse_docket_id)),
+        "PathGenerator.get_paths_batch[dicts]": (Corpus.documents, lambda: lambda inputs: deque(
+            uncached.get_paths_batch(inputs), maxlen=0)),
+        "PathGenerator.get_paths_batch[json]": (
+            lambda corpus: [json.dumps(document).encode() for document in corpus.documents()],
+            lambda: lambda inputs: deque(uncached.get_paths_batch(inputs), maxlen=0)),
+    }
+
+
+def time_benchmark(inputs, make_runner, repeat):
+    """Returns the wall time of each of `repeat` runs over inputs."""
+    times = []
+    for _ in range(repeat):
+        run = make_runner()
+        start = time.perf_counter()
+        run(inputs)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(count=DEFAULT_COUNT, repeat=DEFAULT_REPEAT, seed=0, only=None, log=print):
+    """Runs every benchmark whose name contains one of `only` (all by default) and returns the results dict."""
+    results = {}
+    for name, (make_inputs, make_runner) in _benchmarks().items():
+        if only and not any(part in name for part in only):
+            continue
+        inputs = make_inputs(Corpus(count, seed))
+        times = time_benchmark(inputs, make_runner, repeat)
+        best = min(times)
+        results[name] = {
+            "items": len(inputs),
+            "best_seconds": round(best, 6),
+            "median_seconds": round(statistics.median(times), 6),
+            "items_per_second": round(len(inputs) / best) if best > 0 else None,
+            "ns_per_item": round(best / len(inputs) * 1e9, 1) if inputs else None,
+        }
+        log(f"⏱ {name:<45} {results[name]['ns_per_item']:>10,.1f} ns/item "
+            f"{results[name]['items_per_second'] or 0:>12,} items/s")
+        del inputs
+    return {"meta": _meta(count, repeat, seed), "results": results}
+
+
+def _meta(count, repeat, seed):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "count": count,
+        "repeat": repeat,
+        "seed": seed,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, log=print):
+    """
+    Compares ns/item with a baseline results dict. Returns the names of
+    the benchmarks that are slower than the baseline by more than
+    threshold (0.10 = 10%).
+    """
+    regressions = []
+    for name, current in results["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get("ns_per_item") or current["ns_per_item"] is None:
+            log(f"   {name:<45} (no baseline)")
+            continue
+        change = current["ns_per_item"] / before["ns_per_item"] - 1
+        slower = change > threshold
+        if slower:
+            regressions.append(name)
+        mark = "❌" if slower else ("✔" if change < -threshold else " ")
+        log(f"{mark}  {name:<45} {before['ns_per_item']:>10,.1f} → {current['ns_per_item']:>10,.1f} ns/item ({change:+.1%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time the routing hot paths over synthetic corpora.")
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT, help="items per benchmark")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per benchmark; the best is reported")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic corpora")
+    parser.add_argument("--only", action="append", help="run only benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown that counts as a regression with --compare (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args.count, args.repeat, args.seed, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} benchmark(s) slower than {args.compare} by more than {args.threshold:.0%}")
+            return 1
+        print(f"✔ No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
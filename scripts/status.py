@@ -0,0 +1,185 @@
+"""
+Live progress for a running move.
+
+MoveStatus tracks what the metrics counters do not: objects and bytes done
+per agency, the lanes' in-flight counts and the totals the run is working
+towards. snapshot() combines them with the counters into one JSON-ready
+dict with rates over the last RATE_WINDOW seconds and an ETA.
+
+The snapshot is served by StatusServer (GET /status, plus /metrics in the
+Prometheus format) on a local port, and/or rewritten to a file by
+StatusFileWriter, so a multi-day run can be watched without reading its
+logs.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Rates are measured over this many seconds
+RATE_WINDOW = 60.0
+STATUS_INTERVAL = 10.0
+
+
+class MoveStatus:
+    def __init__(self, total_objects=None, total_bytes=None, window=RATE_WINDOW, clock=time.monotonic):
+        self.total_objects = total_objects
+        self.total_bytes = total_bytes
+        self.window = window
+        self.lanes = {}
+        self.started = time.time()
+        self._agencies = {}
+        self._samples = deque()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def object_done(self, key, size=None):
+        agency = key.split("/", 1)[0] if "/" in key else ""
+        with self._lock:
+            done = self._agencies.get(agency)
+            if done is None:
+                done = self._agencies[agency] = [0, 0]
+            done[0] += 1
+            done[1] += size or 0
+
+    def set_lanes(self, **counts):
+        # Replaced as a whole so readers never see a half-updated dict
+        self.lanes = counts
+
+    def _rates(self, objects, size):
+        """Records a sample and returns (objects/s, bytes/s) since the oldest sample in the window."""
+        now = self._clock()
+        with self._lock:
+            self._samples.append((now, objects, size))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self.window:
+                self._samples.popleft()
+            first_time, first_objects, first_size = self._samples[0]
+        elapsed = now - first_time
+        if elapsed <= 0:
+            return None, None
+        return (objects - first_objects) / elapsed, (size - first_size) / elapsed
+
+    def snapshot(self, metrics):
+        counters, _ = metrics.snapshot()
+        objects = counters.get("objects_copied", 0)
+        size = counters.get("bytes_copied", 0)
+        objects_per_second, bytes_per_second = self._rates(objects, size)
+        with self._lock:
+            agencies = {agency: {"objects": done[0], "bytes": done[1]}
+                        for agency, done in sorted(self._agencies.items())}
+
+        return {
+            "time": time.time(),
+            "elapsed_seconds": round(time.time() - self.started, 1),
+            "objects_done": objects,
+            "bytes_done": size,
+            "objects_per_second": _round(objects_per_second),
+            "bytes_per_second": _round(bytes_per_second),
+            "total_objects": self.total_objects,
+            "total_bytes": self.total_bytes,
+            "eta_seconds": _eta(self.total_objects, objects, objects_per_second),
+            "eta_seconds_by_bytes": _eta(self.total_bytes, size, bytes_per_second),
+            "in_flight": self.lanes,
+            "errors": {name: counters.get(name, 0) for name in ("copy_failed", "delete_failed")},
+            "retries": counters.get("retries", 0),
+            "throttles": counters.get("throttles", 0),
+            "counters": counters,
+            "agencies": agencies,
+        }
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def _eta(total, done, rate):
+    if not total or not rate or rate <= 0:
+        return None
+    return round(max(total - done, 0) / rate)
+
+
+def write_status_file(path, status):
+    """Writes the snapshot atomically, so readers never see half a file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class StatusFileWriter:
+    """Rewrites the status file every `interval` seconds, and once more on stop()."""
+
+    def __init__(self, path, get_status, logger, interval=STATUS_INTERVAL):
+        self.path = path
+        self.get_status = get_status
+        self.logger = logger
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="status-file", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            write_status_file(self.path, self.get_status())
+        except OSError as e:
+            self.logger.error(f"❌ Error writing status to {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+
+class StatusServer(ThreadingHTTPServer):
+    """
+    Serves GET /status (JSON from get_status) and GET /metrics (text from
+    get_metrics) on its own thread. Binds to localhost unless told otherwise.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port, get_status, get_metrics=None, host="127.0.0.1"):
+        self.get_status = get_status
+        self.get_metrics = get_metrics
+        super().__init__((host, port), _StatusHandler)
+        self._thread = threading.Thread(target=self.serve_forever, name="status-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/status"):
+            self._send(json.dumps(self.server.get_status(), indent=2), "application/json")
+        elif path == "/metrics" and self.server.get_metrics:
+            self._send(self.server.get_metrics(), "text/plain; version=0.0.4")
+        else:
+            self.send_error(404)
+
+    def _send(self, body, content_type):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # polling clients would otherwise fill the console
@@ -0,0 +1,146 @@
+"""
+Request-rate and concurrency limits for the S3 mover.
+
+TokenBucket caps requests per second across all threads. AimdLimiter is a
+semaphore whose size follows additive-increase/multiplicative-decrease:
+it grows by one slot for every full window of healthy requests and is cut
+sharply whenever S3 answers with SlowDown or another throttling error, so
+concurrency settles near what the bucket can actually take.
+"""
+
+import threading
+import time
+
+from botocore.exceptions import ClientError, ConnectionError, ReadTimeoutError
+
+# Error codes S3 and STS use to ask clients to slow down
+THROTTLE_CODES = {
+    "SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded",
+    "TooManyRequests", "TooManyRequestsException", "RequestThrottled",
+}
+# Error codes worth retrying without treating them as throttling
+TRANSIENT_CODES = {"InternalError", "ServiceUnavailable", "RequestTimeout"}
+
+
+def _error_code(e):
+    if isinstance(e, ClientError):
+        return e.response.get("Error", {}).get("Code"), e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return None, None
+
+
+def is_throttle_error(e):
+    code, status = _error_code(e)
+    return code in THROTTLE_CODES or status in (429, 503)
+
+
+def is_retryable_error(e):
+    """True for throttling and for transient server or network errors."""
+    if isinstance(e, (ConnectionError, ReadTimeoutError)):
+        return True
+    code, status = _error_code(e)
+    return is_throttle_error(e) or code in TRANSIENT_CODES or (status is not None and status >= 500)
+
+
+def is_retryable_code(code):
+    """is_retryable_error for an error code reported without an exception, such as a DeleteObjects error entry."""
+    return code in THROTTLE_CODES or code in TRANSIENT_CODES
+
+
+class TokenBucket:
+    """
+    Allows at most `rate` acquisitions per second on average, with bursts of
+    up to `burst`. A caller that finds the bucket empty reserves its tokens
+    anyway and sleeps until they would have refilled, so waiting callers are
+    served in arrival order. A rate of None or 0 disables the limit.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or rate or 1
+        self._tokens = self.burst
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Takes tokens, sleeping off any shortfall outside the lock."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self._sleep(wait)
+
+
+class AimdLimiter:
+    """
+    A semaphore whose size adapts between `minimum` and `maximum` slots.
+
+    Every successful request adds 1/limit, so the limit grows by one slot per
+    window of `limit` successes, as long as the smoothed latency stays under
+    latency_target (when one is set). A throttling response, or smoothed
+    latency above latency_target, multiplies the limit by `decrease`; further
+    cuts within `cooldown` seconds belong to the same congestion event and are
+    skipped. Other errors only stop the limit from growing.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=None, decrease=0.5, latency_target=None,
+                 cooldown=1.0, clock=time.monotonic):
+        self.minimum = minimum
+        self.maximum = maximum or initial
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+        self.latency = None
+        self.throttles = 0
+        self.slow = 0
+        self.errors = 0
+        self._clock = clock
+        self._last_decrease = None
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency=None, throttled=False, error=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self._on_throttle()
+            elif error:
+                self.errors += 1
+            else:
+                if latency is not None:
+                    self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+                if self.latency_target is None or self.latency is None or self.latency <= self.latency_target:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                else:
+                    # Requests queueing at the server: back off before it starts throttling
+                    self.slow += 1
+                    self._decrease()
+            self._cond.notify_all()
+
+    def note_throttle(self):
+        """Records throttling reported inside a successful response, such as a DeleteObjects error entry."""
+        with self._cond:
+            self._on_throttle()
+
+    def _on_throttle(self):
+        self.throttles += 1
+        self._decrease()
+
+    def _decrease(self):
+        now = self._clock()
+        if self._last_decrease is None or now - self._last_decrease >= self.cooldown:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._last_decrease = now
@@ -0,0 +1,338 @@
+"""
+Bulk uploads for where.py.
+
+BulkUploader sends many local files through one S3 client and one shared
+transfer manager: a single connection pool and a fixed set of transfer
+threads serve every file. Multipart uploads follow a TransferConfig tuned
+for the mix of small JSON files and large attachments. Routing is left to
+the caller: route(file_path) returns the destination key, or None to skip
+the file.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from s3transfer.subscribers import BaseSubscriber
+
+MiB = 1024 * 1024
+# Files uploading at once (and connections in the client's pool)
+UPLOAD_WORKERS = 32
+MULTIPART_THRESHOLD = 64 * MiB
+MULTIPART_CHUNKSIZE = 16 * MiB
+# Seconds a prefix listing is trusted before RemoteIndex lists the prefix again
+LISTING_MAX_AGE = 600
+
+
+def create_upload_client(workers=UPLOAD_WORKERS):
+    """Creates an S3 client whose connection pool has room for every transfer thread."""
+    return boto3.client('s3', config=Config(max_pool_connections=workers,
+                                            retries={'mode': 'adaptive', 'max_attempts': 10}))
+
+
+def create_transfer_config(workers=UPLOAD_WORKERS, multipart_threshold=MULTIPART_THRESHOLD,
+                           multipart_chunksize=MULTIPART_CHUNKSIZE):
+    return TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunksize,
+                          max_concurrency=workers, use_threads=True)
+
+
+class UploadStats:
+    """Thread-safe totals for a bulk upload."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.failed = 0
+        self.skipped = 0
+        self.unchanged = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, field, amount=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return (f"📦 Uploaded {self.files:,} files ({self.bytes / MiB:,.1f} MiB) in {elapsed:.1f}s: "
+                f"{self.files / elapsed:,.1f} files/s, {self.bytes / MiB / elapsed:,.2f} MiB/s; "
+                f"{self.unchanged:,} unchanged, {self.skipped:,} skipped, {self.failed:,} failed")
+
+
+class _Done(BaseSubscriber):
+    def __init__(self, uploader, file_path, s3_path, size, callback):
+        self.uploader = uploader
+        self.file_path = file_path
+        self.s3_path = s3_path
+        self.size = size
+        self.callback = callback
+
+    def on_done(self, future, **kwargs):
+        self.uploader._finished(self.file_path, self.s3_path, self.size, future, self.callback)
+
+
+class BulkUploader:
+    """
+    Uploads files concurrently through one shared transfer manager.
+
+    - route(file_path) gives the destination key, or None to skip the file.
+    - ensure_prefix(bucket, folder), if given, runs before each upload
+      (where.py passes its cached folder-marker writer).
+    - skip(file_path, s3_path, size), if given, returns True for files that
+      do not need uploading (see RemoteIndex.unchanged). It can list a
+      prefix or hash the whole file, so it runs on `workers` check threads
+      rather than on the thread calling submit().
+    - on_uploaded(s3_path, size), if given, is called once a file is stored
+      in S3 (see RemoteIndex.uploaded).
+    - on_done(file_path, s3_path, error) is called from a transfer or check
+      thread once the file is stored in S3 or found unchanged (error None),
+      or has failed. submit() takes its own on_done to override it for one
+      file.
+    """
+
+    def __init__(self, s3_client, bucket, route, workers=UPLOAD_WORKERS, transfer_config=None,
+                 ensure_prefix=None, skip=None, on_uploaded=None, on_done=None, logger=None):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.route = route
+        self.ensure_prefix = ensure_prefix
+        self.skip = skip
+        self.on_uploaded = on_uploaded
+        self.on_done = on_done
+        self.logger = logger
+        self.stats = UploadStats()
+        self._manager = create_transfer_manager(s3_client, transfer_config or create_transfer_config(workers))
+        self._checks = None
+        if skip:
+            self._checks = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync-check")
+            # Files waiting for a check thread; submit() blocks beyond this, like the transfer manager
+            self._check_slots = threading.BoundedSemaphore(workers * 4)
+
+    def submit(self, file_path, on_done=None):
+        """Routes a file and queues its upload (or its skip check). Returns False if it could not be routed."""
+        on_done = on_done or self.on_done
+        try:
+            s3_path = self.route(file_path)
+            size = os.path.getsize(file_path) if s3_path is not None else 0
+        except OSError as e:
+            s3_path, error = None, e
+        else:
+            error = None
+        if s3_path is None:
+            self.stats.add("skipped")
+            if on_done:
+                on_done(file_path, None, error or ValueError("could not be routed"))
+            return False
+        if self._checks is None:
+            self._upload(file_path, s3_path, size, on_done)
+            return True
+        self._check_slots.acquire()
+        future = self._checks.submit(self._check_and_upload, file_path, s3_path, size, on_done)
+        future.add_done_callback(lambda _: self._check_slots.release())
+        return True
+
+    def _check_and_upload(self, file_path, s3_path, size, on_done):
+        try:
+            unchanged = self.skip(file_path, s3_path, size)
+        except OSError as e:
+            self.stats.add("failed")
+            if self.logger:
+                self.logger.error(f"Could not compare {file_path} with S3: {e}")
+            if on_done:
+                on_done(file_path, s3_path, e)
+            return
+        if unchanged:
+            self.stats.add("unchanged")
+            if on_done:
+                on_done(file_path, s3_path, None)
+            return
+        self._upload(file_path, s3_path, size, on_done)
+
+    def _upload(self, file_path, s3_path, size, on_done):
+        if self.ensure_prefix:
+            self.ensure_prefix(self.bucket, os.path.dirname(s3_path))
+        # Blocks once the manager's submission queue is full, which keeps memory flat on huge trees
+        self._manager.upload(file_path, self.bucket, s3_path,
+                             subscribers=[_Done(self, file_path, s3_path, size, on_done)])
+
+    def _finished(self, file_path, s3_path, size, future, on_done):
+        try:
+            future.result()
+        except Exception as e:
+            self.stats.add("failed")
+            if self.logger:
+                self.logger.error(f"S3 upload failed for {file_path}: {e}")
+            if on_done:
+                on_done(file_path, s3_path, e)
+            return
+        self.stats.add("files")
+        self.stats.add("bytes", size)
+        if self.on_uploaded:
+            self.on_uploaded(s3_path, size)
+        if on_done:
+            on_done(file_path, s3_path, None)
+
+    def upload_tree(self, root):
+        """Submits every file under root, in a stable order, and waits for all of them."""
+        for file_path in iter_files(root):
+            self.submit(file_path)
+        self.close()
+        return self.stats
+
+    def close(self):
+        """Waits for every queued check and upload to finish."""
+        if self._checks is not None:
+            self._checks.shutdown()
+        self._manager.shutdown()
+
+
+def iter_files(root):
+    """Yields the regular files under root, depth first, skipping hidden files and folders."""
+    stack = [root]
+    while stack:
+        folder = stack.pop()
+        with os.scandir(folder) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name, reverse=True)
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file():
+                yield entry.path
+
+
+class RemoteIndex:
+    """
+    Sizes and ETags of the objects already in the bucket, listed one prefix
+    at a time: the first file routed under a prefix (prefix_of(s3_path))
+    lists it in full, and every later file under it is checked against that
+    listing instead of with a HEAD request. Threads asking for a prefix that
+    is being listed wait for that listing. A prefix that cannot be listed is
+    treated as empty, so its files are uploaded.
+
+    Long-running uploaders (where_daemon.py, where_watch.py) keep the index
+    current: uploaded(s3_path, size) records each key this process stores,
+    whose ETag is then read with one HEAD the next time the key is checked,
+    and a listing older than max_age seconds is replaced by a new one, so
+    changes made by other writers are noticed too.
+    """
+
+    def __init__(self, s3_client, bucket, prefix_of, chunksize=MULTIPART_CHUNKSIZE, max_age=LISTING_MAX_AGE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix_of = prefix_of
+        self.chunksize = chunksize
+        self.max_age = max_age
+        self.listings = 0
+        # prefix -> {key: (size, ETag or None)}
+        self._objects = {}
+        # prefix -> (event set once listed, time the listing started)
+        self._listed = {}
+        self._lock = threading.Lock()
+
+    def _ensure_listed(self, prefix):
+        now = time.monotonic()
+        with self._lock:
+            listed = self._listed.get(prefix)
+            owner = listed is None or (listed[0].is_set() and now - listed[1] > self.max_age)
+            if owner:
+                listed = self._listed[prefix] = (threading.Event(), now)
+        if not owner:
+            listed[0].wait()
+            return
+        objects = {}
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    objects[obj['Key']] = (obj['Size'], obj['ETag'].strip('"'))
+        except (BotoCoreError, ClientError):
+            objects = {}
+        finally:
+            with self._lock:
+                self._objects[prefix] = objects
+                self.listings += 1
+            listed[0].set()
+
+    def uploaded(self, s3_path, size):
+        """Records a key stored by this process; its ETag is looked up if the key is checked again."""
+        with self._lock:
+            self._objects.setdefault(self.prefix_of(s3_path), {})[s3_path] = (size, None)
+
+    def unchanged(self, file_path, s3_path, size):
+        """Returns True if s3_path already holds a file of this size whose ETag matches the local bytes."""
+        prefix = self.prefix_of(s3_path)
+        self._ensure_listed(prefix)
+        with self._lock:
+            remote = self._objects.get(prefix, {}).get(s3_path)
+        if remote is None or remote[0] != size:
+            return False
+        etag = remote[1]
+        if etag is None:
+            try:
+                head = self.s3_client.head_object(Bucket=self.bucket, Key=s3_path)
+            except (BotoCoreError, ClientError):
+                return False
+            etag = head['ETag'].strip('"')
+            with self._lock:
+                self._objects.setdefault(prefix, {})[s3_path] = (head['ContentLength'], etag)
+            if head['ContentLength'] != size:
+                return False
+        return etag_matches(file_path, size, etag, self.chunksize)
+
+
+def etag_matches(file_path, size, etag, chunksize=MULTIPART_CHUNKSIZE):
+    """
+    Compares a local file with an S3 ETag: the MD5 of the bytes for a single
+    PUT, or "MD5 of the part MD5s-part count" for a multipart upload. The
+    part size of a multipart upload is not recorded, so the sizes it could
+    have been (ours, the size spread evenly over the parts rounded up to a
+    MiB, and the AWS CLI's 8 MiB) are tried in turn.
+    """
+    if '-' not in etag:
+        return _file_md5(file_path) == etag
+    digest, _, parts = etag.partition('-')
+    if not parts.isdigit():
+        return False
+    parts = int(parts)
+    candidates = [chunksize, math.ceil(size / parts / MiB) * MiB, 8 * MiB]
+    for part_size in dict.fromkeys(candidates):
+        if part_size and math.ceil(size / part_size) == parts:
+            part_digests = _part_digests(file_path, part_size)
+            if hashlib.md5(b''.join(part_digests)).hexdigest() == digest:
+                return True
+    return False
+
+
+def _part_digests(file_path, part_size):
+    """Returns the raw MD5 of each part_size piece of a file."""
+    digests = []
+    with open(file_path, 'rb') as f:
+        while True:
+            part = hashlib.md5()
+            remaining = part_size
+            while remaining:
+                block = f.read(min(remaining, MiB))
+                if not block:
+                    break
+                part.update(block)
+                remaining -= len(block)
+            if remaining == part_size:
+                return digests
+            digests.append(part.digest())
+
+
+def _file_md5(file_path):
+    digest = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(MiB), b''):
+            digest.update(block)
+    return digest.hexdigest()
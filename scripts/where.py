@@ -3,26 +3,92 @@ Updated S3 Path Generator for Mirrulations Project
 Handles complex S3 path structures based on raw data standards.
 """
 
+import argparse
 import boto3
 import json
 import logging
 import os
 import re
 import sys
+import threading
 from botocore.exceptions import BotoCoreError, ClientError
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from router import PathRouter
+from uploader import (MULTIPART_CHUNKSIZE, MULTIPART_THRESHOLD, UPLOAD_WORKERS, BulkUploader, RemoteIndex,
+                      create_transfer_config, create_upload_client)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 RAW_PREFIX = 'raw-data/'
+# Folder markers remembered per process; the cache starts over when it fills up
+PREFIX_CACHE_SIZE = 100000
+
+# Files routed by name alone, without being opened
+BINARY_EXTENSIONS = {'pdf', 'doc', 'docx', 'jpeg', 'jpg', 'png'}
+# data.type values in regulations.gov JSON, mapped to the routing data types
+JSON_DATA_TYPES = {'dockets': 'docket', 'documents': 'document', 'comments': 'comment'}
+# JSON is read in chunks until data.type turns up; past the limit the rest is parsed in full
+SNIFF_CHUNK_SIZE = 8192
+SNIFF_LIMIT = 65536
+
+router = PathRouter(raw_prefix=RAW_PREFIX)
+
+class PrefixCache:
+    """
+    Remembers the (bucket, prefix) folder markers already written by this
+    process, so each is PUT once rather than before every upload. Threads
+    asking for a prefix that another thread is creating wait for that PUT
+    instead of sending their own. Failed PUTs are not remembered.
+    """
+    def __init__(self, max_size=PREFIX_CACHE_SIZE):
+        self.max_size = max_size
+        self._ensured = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, key, create):
+        """Calls create() unless key is already ensured or being ensured; returns whether it exists."""
+        with self._lock:
+            if key in self._ensured:
+                return True
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            pending.wait()
+            return key in self._ensured
+
+        created = False
+        try:
+            created = create()
+        finally:
+            with self._lock:
+                if created:
+                    if len(self._ensured) >= self.max_size:
+                        self._ensured.clear()
+                    self._ensured[key] = True
+                del self._pending[key]
+            pending.set()
+        return created
+
+    def clear(self):
+        with self._lock:
+            self._ensured.clear()
+
+prefix_cache = PrefixCache()
 
 def is_comment_attachment(file_name):
     """
     Returns True if the file_name matches the comment attachment pattern.
     Example: VA-2025-VBA-0006-0011_attachment_1.pdf
     """
-    pattern = r'.+_attachment_\d+\.[^.]+$'
-    return re.match(pattern, file_name) is not None
+    return router.is_comment_attachment(file_name)
 
 """
 Extracts the agency name and docket folder from the filename.
@@ -32,122 +98,252 @@ Extracts the agency name and docket folder from the filename.
 - **HTM files ending in `_content.htm` go in "documents" folder**
 """
 def extract_agency_docket_folder(file_name, data_type):
-    file_name = re.sub(r'_attachment_\d+\.[^.]+$', '', file_name)  # Remove attachment suffix
-    file_name = file_name.replace('.json', '').replace('_content.htm', '') # Remove extensions
-    parts = file_name.split('-')
-
-    if len(parts) < 3:
-        return "UNKNOWN", "UNKNOWN"
-
-    agency = parts[0]
-
-    if data_type == 'docket':
-        docket_folder = '-'.join(parts)  # Keep full name
-    elif data_type == 'document' or file_name.endswith("_content"):
-        docket_folder = '-'.join(parts[:-1])  # Remove last part (document ID)
-    else:
-        docket_folder = '-'.join(parts[:-1])  # Remove last part for comments and other types
-
-    return agency, docket_folder
+    return router.agency_docket(file_name, data_type)
 
 """
 Determines the correct S3 path for the given file.
 """
 def determine_raw_path(file_name, data_type, extension):
-    agency, docket_folder = extract_agency_docket_folder(file_name, data_type)
-
-    # Handle attachments
-    if is_comment_attachment(file_name):
-        # This is a comment attachment: place in "comment_attachments" folder inside binary-docket_folder.
-        folder = 'comments_attachments'
-        return f"{RAW_PREFIX}{agency}/{docket_folder}/binary-{docket_folder}/{folder}/{file_name}"
-    elif 'attachment' in file_name:
-        # Otherwise, treat as a document attachment.
-        folder = 'documents_attachments'
-        return f"{RAW_PREFIX}{agency}/{docket_folder}/binary-{docket_folder}/{folder}/{file_name}"
-
-    # Handle HTM files ending in "_content.htm"
-    if extension == 'htm' and file_name.endswith('_content.htm'):
-        folder = 'documents'
-    else:
-        folder = {
-            'docket': 'dockets',
-            'document': 'documents',
-            'comment': 'comments'
-        }.get(data_type, 'unknown')
-
-    return f"{RAW_PREFIX}{agency}/{docket_folder}/text-{docket_folder}/{folder}/{file_name}"
+    return router.route_file(file_name, data_type, extension)
 
 """
-Ensures that the specified S3 path exists.
+Ensures that the specified S3 path exists. Returns True once the marker is written.
 """
 def ensure_s3_path_exists(s3_client, bucket, path):
     try:
         s3_client.put_object(Bucket=bucket, Key=(path if path.endswith('/') else path + '/'))
         logger.info(f"Ensured path exists: {path}")
+        return True
     except (BotoCoreError, ClientError) as e:
         logger.error(f"Failed to ensure path {path}: {e}")
+        return False
+
+"""
+Ensures the S3 path exists once per process, through prefix_cache.
+"""
+def ensure_s3_path_cached(s3_client, bucket, path):
+    return prefix_cache.ensure((bucket, path), lambda: ensure_s3_path_exists(s3_client, bucket, path))
 
 """
 Uploads a file to the specified S3 path.
+- create_markers=False skips the folder marker; S3 has no real folders, so
+  the upload alone makes the path visible.
 """
-def upload_file(s3_client, bucket, file_path, s3_path):
+def upload_file(s3_client, bucket, file_path, s3_path, create_markers=True):
     try:
-        ensure_s3_path_exists(s3_client, bucket, os.path.dirname(s3_path))
+        if create_markers:
+            ensure_s3_path_cached(s3_client, bucket, os.path.dirname(s3_path))
         s3_client.upload_file(file_path, bucket, s3_path)
         logger.info(f"Uploaded {file_path} to {s3_path}")
     except (BotoCoreError, ClientError) as e:
         logger.error(f"S3 upload failed: {e}")
 
+class _NeedMore(Exception):
+    """The JSON read so far ends before the answer."""
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_SCALAR = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null')
+
+def _skip_ws(text, pos):
+    pos = _WHITESPACE.match(text, pos).end()
+    if pos == len(text):
+        raise _NeedMore()
+    return pos
+
+def _scan_string(text, pos):
+    """Returns (string, end) for the string starting at text[pos]."""
+    try:
+        return json.decoder.scanstring(text, pos + 1)
+    except json.JSONDecodeError as e:
+        if e.msg.startswith('Unterminated string'):
+            raise _NeedMore()
+        raise
+
+def _skip_value(text, pos):
+    """Returns the position after the value at text[pos], stepping over nested values without building them."""
+    pos = _skip_ws(text, pos)
+    if text[pos] == '"':
+        return _scan_string(text, pos)[1]
+    if text[pos] not in '{[':
+        match = _SCALAR.match(text, pos)
+        if match is None or match.end() == len(text):
+            # A number could continue in the next chunk; anything else is not JSON
+            if match is None and len(text) - pos >= 5:
+                raise json.JSONDecodeError("Expecting value", text, pos)
+            raise _NeedMore()
+        return match.end()
+    depth = 0
+    while True:
+        char = text[pos]
+        if char == '"':
+            pos = _scan_string(text, pos)[1]
+            continue
+        if char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+        if pos == len(text):
+            raise _NeedMore()
+
+def _members(text, pos):
+    """Yields (key, position of its value) for the object starting at text[pos]."""
+    pos = _skip_ws(text, pos)
+    if text[pos] != '{':
+        raise json.JSONDecodeError("Expecting '{'", text, pos)
+    pos = _skip_ws(text, pos + 1)
+    if text[pos] == '}':
+        return
+    while True:
+        if text[pos] != '"':
+            raise json.JSONDecodeError("Expecting property name", text, pos)
+        key, pos = _scan_string(text, pos)
+        pos = _skip_ws(text, pos)
+        if text[pos] != ':':
+            raise json.JSONDecodeError("Expecting ':'", text, pos)
+        pos = yield key, pos + 1
+        pos = _skip_ws(text, pos)
+        if text[pos] == '}':
+            return
+        if text[pos] != ',':
+            raise json.JSONDecodeError("Expecting ',' or '}'", text, pos)
+        pos = _skip_ws(text, pos + 1)
+
+def _find_data_type(text):
+    """Returns data.type from the start of a JSON document, or None if the document has none."""
+    top = _members(text, 0)
+    try:
+        key, pos = next(top)
+        while True:
+            if key == 'data':
+                if text[_skip_ws(text, pos)] != '{':
+                    return None
+                data = _members(text, pos)
+                try:
+                    data_key, data_pos = next(data)
+                    while True:
+                        if data_key == 'type':
+                            value_pos = _skip_ws(text, data_pos)
+                            if text[value_pos] == '"':
+                                return _scan_string(text, value_pos)[0]
+                            # Non-string types are returned as parsed, like the full-parse fallback
+                            return json.loads(text[value_pos:_skip_value(text, data_pos)])
+                        data_key, data_pos = data.send(_skip_value(text, data_pos))
+                except StopIteration:
+                    return None
+            key, pos = top.send(_skip_value(text, pos))
+    except StopIteration:
+        return None
+
 """
-Processes a file to determine its type and uploads it to the appropriate S3 location.
+Reads only as much of a JSON file as it takes to find data.type. Files whose
+data.type sits past SNIFF_LIMIT characters are parsed in full. Returns None
+when the file has no data.type; raises json.JSONDecodeError for invalid JSON.
+"""
+def sniff_json_type(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = ''
+        while len(text) < SNIFF_LIMIT:
+            chunk = f.read(SNIFF_CHUNK_SIZE)
+            text += chunk
+            try:
+                return _find_data_type(text)
+            except _NeedMore:
+                if not chunk:
+                    raise json.JSONDecodeError("Unexpected end of file", text, len(text))
+        parsed = json.loads(text + f.read())
+    data = parsed.get('data') if isinstance(parsed, dict) else None
+    return data.get('type') if isinstance(data, dict) else None
+
 """
-def process_file(s3_client, bucket, file_path):
+Determines a file's data type, from its name when that is enough and
+otherwise from the first bytes of its JSON. Files whose content does not
+matter for routing are never opened. Returns None if the type cannot be
+determined.
+"""
+def detect_data_type(file_path):
     file_name = os.path.basename(file_path)
     extension = file_name.split('.')[-1].lower()
-    data_type = 'unknown'
-    
-    # Define binary file extensions
-    binary_extensions = ['pdf', 'doc', 'docx', 'jpeg', 'jpg', 'png']
-    
+
     if extension == 'json':
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            try:
-                parsed = json.loads(content)
-                doc_type = parsed['data']['type']
-                if doc_type == 'dockets':
-                    data_type = 'docket'
-                elif doc_type == 'documents':
-                    data_type = 'document'
-                elif doc_type == 'comments':
-                    data_type = 'comment'
-            except json.JSONDecodeError:
-                logger.error(f"Invalid JSON format in {file_path}")
-                return
-        except Exception as e:
-            logger.error(f"Error reading file {file_path}: {e}")
-            return
-    elif extension in binary_extensions:
-        # For binary files, do not attempt to read as text.
-        # Use the file name to determine the type if it's an attachment.
-        if is_comment_attachment(file_name):
-            data_type = 'comment'
-        else:
-            data_type = 'document'
-    else:
-        # For other text-based files, handle them as text.
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                _ = f.read()  # You may not need the content for non-json types.
-            data_type = 'text' if extension == 'txt' else 'html'
+            doc_type = sniff_json_type(file_path)
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON format in {file_path}")
+            return None
         except Exception as e:
             logger.error(f"Error reading file {file_path}: {e}")
-            return
+            return None
+        if doc_type is None:
+            logger.error(f"Error reading file {file_path}: no data.type")
+            return None
+        # Non-string types (lists, objects, numbers) are unknown rather than lookup errors
+        if not isinstance(doc_type, str):
+            return 'unknown'
+        return JSON_DATA_TYPES.get(doc_type, 'unknown')
+    if extension in BINARY_EXTENSIONS:
+        # Binary attachments are routed by the attachment pattern in their name
+        return 'comment' if is_comment_attachment(file_name) else 'document'
+    return 'text' if extension == 'txt' else 'html'
+
+"""
+Returns the S3 path a local file belongs at, or None if its type cannot be determined.
+"""
+def route_local_file(file_path):
+    file_name = os.path.basename(file_path)
+    extension = file_name.split('.')[-1].lower()
+    data_type = detect_data_type(file_path)
+    if data_type is None:
+        return None
+    return determine_raw_path(file_name, data_type, extension)
+
+"""
+Processes a file to determine its type and uploads it to the appropriate S3 location.
+"""
+def process_file(s3_client, bucket, file_path, create_markers=True):
+    s3_path = route_local_file(file_path)
+    if s3_path is None:
+        return
+    upload_file(s3_client, bucket, file_path, s3_path, create_markers)
+
+"""
+Returns the docket prefix of a raw-data S3 path: raw-data/AGENCY/DOCKET/.
+"""
+def docket_prefix(s3_path):
+    return '/'.join(s3_path.split('/')[:3]) + '/'
 
-    s3_path = determine_raw_path(file_name, data_type, extension)
-    upload_file(s3_client, bucket, file_path, s3_path)
+"""
+Builds a BulkUploader that routes files like process_file and writes each
+folder marker once, through prefix_cache.
+- sync=True skips files whose key already holds the same bytes, listing
+  each docket prefix once and recording every upload (see
+  uploader.RemoteIndex).
+"""
+def create_bulk_uploader(s3_client, bucket, workers=UPLOAD_WORKERS, transfer_config=None,
+                         create_markers=True, sync=False, **kwargs):
+    transfer_config = transfer_config or create_transfer_config(workers)
+    ensure_prefix = None
+    if create_markers:
+        ensure_prefix = lambda bucket, path: ensure_s3_path_cached(s3_client, bucket, path)
+    if sync:
+        index = RemoteIndex(s3_client, bucket, docket_prefix, transfer_config.multipart_chunksize)
+        kwargs["skip"] = index.unchanged
+        kwargs["on_uploaded"] = index.uploaded
+    return BulkUploader(s3_client, bucket, route_local_file, workers=workers, transfer_config=transfer_config,
+                        ensure_prefix=ensure_prefix, logger=logger, **kwargs)
+
+"""
+Uploads every file under a local directory to its raw-data location, with
+`workers` uploads in flight over one connection pool. Returns the UploadStats.
+"""
+def upload_directory(s3_client, bucket, root, workers=UPLOAD_WORKERS, transfer_config=None, create_markers=True,
+                     sync=False):
+    uploader = create_bulk_uploader(s3_client, bucket, workers, transfer_config, create_markers, sync)
+    stats = uploader.upload_tree(root)
+    logger.info(stats.summary())
+    return stats
 
 """
 Creates and returns an S3 client.
@@ -159,20 +355,36 @@ def get_s3_client():
         logger.error(f"Error creating S3 client: {e}")
         raise
 
+"""
+Parses the command line: the filename and S3 bucket name, plus options.
+"""
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload a file, or every file in a directory, to its raw-data location in S3.")
+    parser.add_argument("filename", help="local file or directory to upload")
+    parser.add_argument("bucket", help="S3 bucket")
+    parser.add_argument("--no-markers", action="store_true", help="do not write folder marker objects")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="concurrent uploads for a directory")
+    parser.add_argument("--multipart-threshold", type=int, default=MULTIPART_THRESHOLD,
+                        help="files at least this many bytes are uploaded in parts")
+    parser.add_argument("--multipart-chunksize", type=int, default=MULTIPART_CHUNKSIZE, help="bytes per part")
+    parser.add_argument("--sync", action="store_true", help="skip files whose S3 copy already has the same bytes")
+    return parser.parse_args(argv)
+
 """
 Main function to process a file and upload it to S3.
 - takes in the filename and S3 bucket name as arguments.
+- a directory is walked and uploaded in parallel.
 """
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python3 script.py <filename> <s3bucket>")
-        sys.exit(1)
-    
-    file_path = sys.argv[1]
-    bucket = sys.argv[2]
-    
+def main(argv=None):
+    args = parse_args(argv)
+    if os.path.isdir(args.filename):
+        s3_client = create_upload_client(args.workers)
+        transfer_config = create_transfer_config(args.workers, args.multipart_threshold, args.multipart_chunksize)
+        upload_directory(s3_client, args.bucket, args.filename, args.workers, transfer_config,
+                         create_markers=not args.no_markers, sync=args.sync)
+        return
     s3_client = get_s3_client()
-    process_file(s3_client, bucket, file_path)
+    process_file(s3_client, args.bucket, args.filename, create_markers=not args.no_markers)
 
 if __name__ == "__main__":
     main()
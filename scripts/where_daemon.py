@@ -0,0 +1,175 @@
+"""
+Resident upload server for where.py.
+
+Starting where.py once per downloaded file pays for the interpreter, the
+boto3 import and a new client every time. where_daemon.py starts once and
+then takes file paths, one per line, on stdin or over a local Unix socket.
+Each path is routed like where.process_file and uploaded concurrently
+through one warm client and transfer manager (see uploader.BulkUploader).
+
+Every path gets one JSON line back, written once S3 has acknowledged the
+upload (or once it has failed):
+    {"path": "/data/EPA-2024-12345-0001.json", "status": "ok", "key": "raw-data/EPA/..."}
+    {"path": "/data/notes.bin", "status": "error", "error": "could not be routed"}
+Acks arrive in completion order, not submission order. Relative paths are
+resolved against the server's working directory.
+"""
+
+import argparse
+import errno
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import where
+from uploader import MULTIPART_CHUNKSIZE, MULTIPART_THRESHOLD, UPLOAD_WORKERS, create_transfer_config, create_upload_client
+
+logger = logging.getLogger("where_daemon")
+
+
+class AckWriter:
+    """
+    Writes acks to one client's stream and tracks how many of its paths are
+    still uploading, so the connection is only closed once all are acked.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.pending = 0
+        self._lock = threading.Condition()
+
+    def submitted(self):
+        with self._lock:
+            self.pending += 1
+
+    def __call__(self, file_path, s3_path, error):
+        if error is None:
+            ack = {"path": file_path, "status": "ok", "key": s3_path}
+        else:
+            ack = {"path": file_path, "status": "error", "error": str(error)}
+        line = (json.dumps(ack) + "\n").encode("utf-8")
+        with self._lock:
+            try:
+                self.stream.write(line)
+                self.stream.flush()
+            except (OSError, ValueError) as e:
+                # The client went away; the upload itself still counts
+                logger.warning(f"⚠ Could not ack {file_path}: {e}")
+            self.pending -= 1
+            self._lock.notify_all()
+
+    def wait(self):
+        with self._lock:
+            self._lock.wait_for(lambda: self.pending == 0)
+
+
+def serve_lines(uploader, lines, acks):
+    """Submits every path read from lines, then waits until each one is acked."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        path = line.strip()
+        if not path:
+            continue
+        acks.submitted()
+        uploader.submit(os.path.abspath(path), on_done=acks)
+    acks.wait()
+
+
+class UploadServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Accepts any number of clients on a Unix socket; each connection is one stream of paths."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, uploader):
+        self.uploader = uploader
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _PathHandler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def _remove_stale_socket(socket_path):
+    """
+    Removes a socket left behind by a daemon that did not shut down cleanly.
+    Raises instead if the path is not a socket or another daemon still
+    accepts connections on it.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "Not a socket, refusing to replace it", socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            os.remove(socket_path)
+            return
+    raise OSError(errno.EADDRINUSE, "Another process is listening on this socket", socket_path)
+
+
+class _PathHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        serve_lines(self.server.uploader, self.rfile, AckWriter(self.wfile))
+
+
+def create_uploader(bucket, workers=UPLOAD_WORKERS, multipart_threshold=MULTIPART_THRESHOLD,
+                    multipart_chunksize=MULTIPART_CHUNKSIZE, create_markers=True, sync=False, s3_client=None):
+    """Creates the warm client and the uploader, and checks the bucket once up front."""
+    s3_client = s3_client or create_upload_client(workers)
+    # Opens the first pooled connection and fails fast on a wrong bucket or credentials
+    s3_client.head_bucket(Bucket=bucket)
+    transfer_config = create_transfer_config(workers, multipart_threshold, multipart_chunksize)
+    return where.create_bulk_uploader(s3_client, bucket, workers, transfer_config, create_markers, sync)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload file paths read from stdin or a Unix socket to their raw-data locations.")
+    parser.add_argument("bucket", help="S3 bucket")
+    parser.add_argument("--socket", help="listen on this Unix socket instead of reading stdin")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="concurrent uploads")
+    parser.add_argument("--multipart-threshold", type=int, default=MULTIPART_THRESHOLD,
+                        help="files at least this many bytes are uploaded in parts")
+    parser.add_argument("--multipart-chunksize", type=int, default=MULTIPART_CHUNKSIZE, help="bytes per part")
+    parser.add_argument("--no-markers", action="store_true", help="do not write folder marker objects")
+    parser.add_argument("--sync", action="store_true", help="skip files whose S3 copy already has the same bytes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    uploader = create_uploader(args.bucket, args.workers, args.multipart_threshold, args.multipart_chunksize,
+                               create_markers=not args.no_markers, sync=args.sync)
+    if args.socket is None:
+        logger.info(f"🚀 Reading paths from stdin for s3://{args.bucket}")
+        serve_lines(uploader, sys.stdin.buffer, AckWriter(sys.stdout.buffer))
+    else:
+        server = UploadServer(args.socket, uploader)
+        # SIGTERM stops accepting clients; uploads in flight still finish below
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        logger.info(f"🚀 Listening on {args.socket} for s3://{args.bucket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    uploader.close()
+    logger.info(uploader.stats.summary())
+
+
+if __name__ == "__main__":
+    main()
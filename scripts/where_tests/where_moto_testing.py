@@ -4,6 +4,7 @@ The tests are written using the pytest framework.
 """
 
 import boto3
+import json
 import os
 import pytest
 import logging
@@ -0,0 +1,343 @@
+"""
+moto tests for where.py's upload paths: the folder-marker cache, type
+sniffing, bulk directory uploads, where_daemon.py, where_watch.py and
+--sync.
+"""
+
+import io
+import json
+import os
+import socket
+import sys
+import threading
+from unittest.mock import patch
+
+import boto3
+import pytest
+from moto import mock_aws
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import scripts.where as where
+import scripts.where_daemon as where_daemon
+import scripts.where_watch as where_watch
+# where.py imports uploader as a top-level module; importing it the same way shares its classes
+from uploader import BulkUploader, RemoteIndex, etag_matches
+
+# Mock AWS Credentials
+@pytest.fixture(scope="function")
+def aws_credentials():
+    os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+    os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+    os.environ["AWS_SESSION_TOKEN"] = "testing"
+    os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Mock AWS Services
+@pytest.fixture(scope="function")
+def s3_mock(aws_credentials):
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="test-bucket")
+        where.prefix_cache.clear()
+        yield s3
+
+def test_upload_file_caches_folder_markers(s3_mock, tmp_path):
+    """Test that folder markers are written once per prefix, even under concurrent uploads."""
+    files = []
+    for i in range(20):
+        path = tmp_path / f"EPA-2024-12345-{i:04d}.json"
+        path.write_text("{}")
+        files.append(str(path))
+    folder = "raw-data/EPA/EPA-2024-12345/text-EPA-2024-12345/comments"
+
+    original_put_object = s3_mock.put_object
+    with patch.object(s3_mock, "put_object", side_effect=original_put_object) as put_object:
+        threads = [threading.Thread(target=where.upload_file,
+                                    args=(s3_mock, "test-bucket", path, f"{folder}/{os.path.basename(path)}"))
+                   for path in files]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        markers = lambda: [call for call in put_object.call_args_list if call.kwargs.get("Key", "").endswith("/")]
+        assert len(markers()) == 1
+
+        where.prefix_cache.clear()
+        where.upload_file(s3_mock, "test-bucket", files[0], f"{folder}/other.json", create_markers=False)
+        assert len(markers()) == 1
+
+    keys = [obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"]]
+    assert len(keys) == 22 and f"{folder}/" in keys
+
+def test_detect_data_type_reads_only_what_it_needs(tmp_path):
+    """Test that JSON types are found from the start of the file and other files are never opened."""
+    comment = tmp_path / "EPA-2024-12345-0001.json"
+    body = "x" * (where.SNIFF_LIMIT * 4)
+    comment.write_text(json.dumps({"data": {"id": "EPA-2024-12345-0001", "type": "comments",
+                                            "attributes": {"comment": body}}}))
+    late_type = tmp_path / "EPA-2024-12345.json"
+    late_type.write_text(json.dumps({"data": {"attributes": {"title": body}, "type": "dockets"}}))
+    invalid = tmp_path / "EPA-2024-12345-0002.json"
+    invalid.write_text("{\"data\": oops}")
+
+    real_open = open
+    reads = []
+    def counting_open(path, *args, **kwargs):
+        f = real_open(path, *args, **kwargs)
+        original_read = f.read
+        def read(size=-1):
+            data = original_read(size)
+            reads.append((os.path.basename(str(path)), len(data)))
+            return data
+        f.read = read
+        return f
+
+    with patch("builtins.open", side_effect=counting_open):
+        assert where.detect_data_type(str(comment)) == "comment"
+        assert sum(n for name, n in reads if name == comment.name) <= where.SNIFF_CHUNK_SIZE
+        assert where.detect_data_type(str(late_type)) == "docket"
+        assert where.detect_data_type(str(invalid)) is None
+        reads.clear()
+        assert where.detect_data_type(str(tmp_path / "EPA-2024-12345-0001_attachment_1.pdf")) == "comment"
+        assert where.detect_data_type(str(tmp_path / "EPA-2024-12345-0001_content.htm")) == "html"
+        assert reads == []
+
+def test_detect_data_type_unknown_types(tmp_path):
+    """Test that unrecognised and non-string data.type values are reported as unknown."""
+    for i, doc_type in enumerate(["public-submissions", ["comments"], {"name": "comments"}, 7, True]):
+        path = tmp_path / f"EPA-2024-12345-{i:04d}.json"
+        path.write_text(json.dumps({"data": {"type": doc_type}}))
+        assert where.detect_data_type(str(path)) == "unknown"
+    # Past SNIFF_LIMIT the type comes from the full parse
+    late = tmp_path / "EPA-2024-12345.json"
+    late.write_text(json.dumps({"data": {"attributes": {"title": "x" * where.SNIFF_LIMIT}, "type": ["dockets"]}}))
+    assert where.detect_data_type(str(late)) == "unknown"
+
+def test_upload_directory(s3_mock, tmp_path):
+    """Test that a directory tree is routed file by file and uploaded in parallel, with one marker per folder."""
+    nested = tmp_path / "EPA" / "EPA-2024-12345"
+    nested.mkdir(parents=True)
+    for i in range(10):
+        (nested / f"EPA-2024-12345-{i:04d}.json").write_text(json.dumps({"data": {"type": "comments"}}))
+    (tmp_path / "EPA-2024-12345.json").write_text(json.dumps({"data": {"type": "dockets"}}))
+    (nested / "EPA-2024-12345-0001_attachment_1.pdf").write_bytes(b"%PDF" + b"0" * (6 * 1024 * 1024))
+    (nested / "broken.json").write_text("{")
+    (tmp_path / ".hidden.json").write_text("{}")
+
+    config = where.create_transfer_config(workers=4, multipart_threshold=5 * 1024 * 1024,
+                                          multipart_chunksize=5 * 1024 * 1024)
+    stats = where.upload_directory(s3_mock, "test-bucket", str(tmp_path), workers=4, transfer_config=config)
+
+    assert (stats.files, stats.skipped, stats.failed) == (12, 1, 0)
+    assert stats.bytes > 6 * 1024 * 1024
+    keys = {obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"]}
+    base = "raw-data/EPA/EPA-2024-12345"
+    assert f"{base}/text-EPA-2024-12345/comments/EPA-2024-12345-0003.json" in keys
+    assert f"{base}/text-EPA-2024-12345/dockets/EPA-2024-12345.json" in keys
+    assert f"{base}/binary-EPA-2024-12345/comments_attachments/EPA-2024-12345-0001_attachment_1.pdf" in keys
+    assert len([key for key in keys if key.endswith("/")]) == 3
+
+def test_where_daemon_acks_uploads(s3_mock, tmp_path):
+    """Test that the daemon acks every path, over stdin-style streams and over a Unix socket."""
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"EPA-2024-12345-{i:04d}.json"
+        path.write_text(json.dumps({"data": {"type": "comments"}}))
+        paths.append(str(path))
+    (tmp_path / "broken.json").write_text("{")
+
+    uploader = where_daemon.create_uploader("test-bucket", workers=4, s3_client=s3_mock)
+    out = io.BytesIO()
+    lines = [f"{path}\n".encode() for path in paths[:3]] + [b"\n", f"{tmp_path / 'broken.json'}\n".encode()]
+    where_daemon.serve_lines(uploader, lines, where_daemon.AckWriter(out))
+    acks = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(ack["status"] for ack in acks) == ["error", "ok", "ok", "ok"]
+    for ack in acks:
+        if ack["status"] == "ok":
+            assert s3_mock.head_object(Bucket="test-bucket", Key=ack["key"])["ContentLength"] > 0
+
+    socket_path = str(tmp_path / "where.sock")
+    server = where_daemon.UploadServer(socket_path, uploader)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            client.sendall("".join(f"{path}\n" for path in paths[3:]).encode())
+            client.shutdown(socket.SHUT_WR)
+            received = b""
+            while chunk := client.recv(4096):
+                received += chunk
+        acks = [json.loads(line) for line in received.splitlines()]
+        assert sorted(ack["path"] for ack in acks) == paths[3:]
+        assert all(ack["status"] == "ok" for ack in acks)
+    finally:
+        server.shutdown()
+        server.server_close()
+        uploader.close()
+    assert not os.path.exists(socket_path)
+    assert (uploader.stats.files, uploader.stats.skipped) == (5, 1)
+
+def test_where_daemon_only_replaces_stale_sockets(s3_mock, tmp_path):
+    """Test that the daemon replaces a dead socket but refuses a regular file or a socket still in use."""
+    uploader = where_daemon.create_uploader("test-bucket", workers=1, s3_client=s3_mock)
+    socket_path = str(tmp_path / "where.sock")
+    try:
+        with open(socket_path, "w") as f:
+            f.write("not a socket")
+        with pytest.raises(FileExistsError):
+            where_daemon.UploadServer(socket_path, uploader)
+        assert open(socket_path).read() == "not a socket"
+        os.remove(socket_path)
+
+        # Bound and closed without unlinking, as after a crash
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+        server = where_daemon.UploadServer(socket_path, uploader)
+        try:
+            with pytest.raises(OSError, match="Another process is listening"):
+                where_daemon.UploadServer(socket_path, uploader)
+        finally:
+            server.server_close()
+    finally:
+        uploader.close()
+
+def test_where_watch_uploads_closed_files(s3_mock, tmp_path):
+    """Test that the watcher uploads closed files, including in new folders, skips partial ones and archives them."""
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    (inbox / "EPA-2024-12345.json").write_text(json.dumps({"data": {"type": "dockets"}}))
+    uploader = where.create_bulk_uploader(s3_mock, "test-bucket", workers=4)
+    uploaded = []
+    both_uploaded = threading.Event()
+    def on_done(file_path, s3_path, error):
+        uploaded.append((os.path.basename(file_path), error))
+        if len(uploaded) == 2:
+            both_uploaded.set()
+    watcher = where_watch.FolderWatcher(str(inbox), uploader, after=where_watch.ARCHIVE,
+                                        archive_dir=str(tmp_path / "archive"), debounce=0.2, on_done=on_done)
+    thread = threading.Thread(target=watcher.run, kwargs={"existing": True}, daemon=True)
+    thread.start()
+    try:
+        assert watcher.ready.wait(10)
+        nested = inbox / "EPA" / "later"
+        nested.mkdir(parents=True)
+        with open(nested / "EPA-2024-12345-0001.json", "w") as f:
+            f.write(json.dumps({"data": {"type": "comments"}}))
+        (nested / "EPA-2024-12345-0002.json.part").write_text("{")
+        assert both_uploaded.wait(10)
+    finally:
+        watcher.stop()
+        thread.join()
+        uploader.close()
+
+    assert sorted(uploaded) == [("EPA-2024-12345-0001.json", None), ("EPA-2024-12345.json", None)]
+    assert (uploader.stats.files, uploader.stats.failed) == (2, 0)
+    keys = {obj["Key"] for obj in s3_mock.list_objects_v2(Bucket="test-bucket")["Contents"]}
+    assert "raw-data/EPA/EPA-2024-12345/text-EPA-2024-12345/comments/EPA-2024-12345-0001.json" in keys
+    assert (tmp_path / "archive" / "EPA" / "later" / "EPA-2024-12345-0001.json").exists()
+    assert (tmp_path / "archive" / "EPA-2024-12345.json").exists()
+    assert not (nested / "EPA-2024-12345-0001.json").exists()
+    assert (nested / "EPA-2024-12345-0002.json.part").exists()
+
+def test_where_watch_keeps_files_rewritten_during_upload(s3_mock, tmp_path):
+    """Test that --after delete leaves a file rewritten after it was queued, and queues it again."""
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    path = inbox / "EPA-2024-12345-0001.json"
+    path.write_text(json.dumps({"data": {"type": "comments"}}))
+    uploader = where.create_bulk_uploader(s3_mock, "test-bucket", workers=1)
+    watcher = where_watch.FolderWatcher(str(inbox), uploader, after=where_watch.DELETE, debounce=0)
+    results = []
+    uploads = threading.Semaphore(0)
+    def on_done(file_path, s3_path, error):
+        results.append((file_path, error))
+        uploads.release()
+    watcher.on_done = on_done
+    # Rewritten (a different size) while the first upload is under way
+    rewrite = lambda file_path, s3_path: path.write_text(json.dumps({"data": {"type": "comments", "n": 2}}))
+    uploader.on_uploaded = rewrite
+
+    try:
+        watcher._schedule(str(path))
+        watcher._submit_due()
+        assert uploads.acquire(timeout=10)
+        assert path.exists(), "❌ A file rewritten during its upload was deleted."
+
+        uploader.on_uploaded = None
+        watcher._requeue_changed()
+        assert str(path) in watcher._due
+        watcher._submit_due()
+        assert uploads.acquire(timeout=10)
+    finally:
+        uploader.close()
+
+    assert not path.exists()
+    assert results == [(str(path), None)] * 2
+    key = "raw-data/EPA/EPA-2024-12345/text-EPA-2024-12345/comments/EPA-2024-12345-0001.json"
+    assert b'"n": 2' in s3_mock.get_object(Bucket="test-bucket", Key=key)["Body"].read()
+
+def test_upload_directory_sync_skips_unchanged(s3_mock, tmp_path):
+    """Test that sync mode lists each docket once and uploads only new or changed files, multipart ones included."""
+    for i in range(6):
+        (tmp_path / f"EPA-2024-12345-{i:04d}.json").write_text(json.dumps({"data": {"type": "comments", "n": i}}))
+    (tmp_path / "DHS-2023-67890-0001.json").write_text(json.dumps({"data": {"type": "comments"}}))
+    big = tmp_path / "EPA-2024-12345-0001_attachment_1.pdf"
+    big.write_bytes(os.urandom(11 * 1024 * 1024))
+    config = where.create_transfer_config(workers=4, multipart_threshold=5 * 1024 * 1024,
+                                          multipart_chunksize=5 * 1024 * 1024)
+
+    stats = where.upload_directory(s3_mock, "test-bucket", str(tmp_path), 4, config, sync=True)
+    assert (stats.files, stats.unchanged) == (8, 0)
+    pdf_key = "raw-data/EPA/EPA-2024-12345/binary-EPA-2024-12345/comments_attachments/" + big.name
+    assert s3_mock.head_object(Bucket="test-bucket", Key=pdf_key)["ETag"].endswith('-3"')
+
+    (tmp_path / "EPA-2024-12345-0002.json").write_text(json.dumps({"data": {"type": "comments", "n": 99}}))
+    (tmp_path / "EPA-2024-12345-0006.json").write_text(json.dumps({"data": {"type": "comments"}}))
+    with patch.object(RemoteIndex, "_ensure_listed", autospec=True,
+                      side_effect=RemoteIndex._ensure_listed) as listed:
+        stats = where.upload_directory(s3_mock, "test-bucket", str(tmp_path), 4, config, sync=True)
+        prefixes = {call.args[1] for call in listed.call_args_list}
+    assert prefixes == {"raw-data/EPA/EPA-2024-12345/", "raw-data/DHS/DHS-2023-67890/"}
+    assert (stats.files, stats.unchanged) == (2, 7)
+
+    assert not etag_matches(str(big), big.stat().st_size, "0" * 32 + "-3")
+
+def test_sync_uploader_checks_on_workers_and_tracks_uploads(s3_mock, tmp_path):
+    """Test that sync checks run off the submitting thread and that a long-running uploader sees its own uploads."""
+    path = tmp_path / "EPA-2024-12345-0001.json"
+    path.write_text(json.dumps({"data": {"type": "comments", "n": 1}}))
+    index = RemoteIndex(s3_mock, "test-bucket", where.docket_prefix)
+    check_threads = []
+    def unchanged(*args):
+        check_threads.append(threading.current_thread().name)
+        return index.unchanged(*args)
+    uploader = BulkUploader(s3_mock, "test-bucket", where.route_local_file, workers=4,
+                            skip=unchanged, on_uploaded=index.uploaded)
+
+    def upload_once():
+        done = threading.Event()
+        results = []
+        uploader.submit(str(path), on_done=lambda *result: (results.append(result), done.set()))
+        assert done.wait(10)
+        return results[0]
+
+    try:
+        assert upload_once()[2] is None
+        assert (uploader.stats.files, uploader.stats.unchanged) == (1, 0)
+        # Checked against the recorded upload, without listing the docket again
+        upload_once()
+        assert (uploader.stats.files, uploader.stats.unchanged) == (1, 1)
+        path.write_text(json.dumps({"data": {"type": "comments", "n": 2}}))
+        upload_once()
+        assert (uploader.stats.files, uploader.stats.unchanged) == (2, 1)
+        assert index.listings == 1
+
+        # A listing older than max_age is replaced
+        index.max_age = 0
+        upload_once()
+        assert index.listings == 2 and uploader.stats.unchanged == 2
+    finally:
+        uploader.close()
+    assert check_threads and all(name.startswith("sync-check") for name in check_threads)
@@ -0,0 +1,291 @@
+"""
+Watch-folder ingestion for where.py (Linux).
+
+Watches a download directory, and every folder under it, with inotify
+(through ctypes, no extra packages). A file is picked up when the process
+writing it closes it (IN_CLOSE_WRITE) or when it is moved in whole
+(IN_MOVED_TO). It is uploaded once it has been quiet for the debounce
+interval, so a file that is written again in quick succession is uploaded
+once. Files are routed like where.process_file and uploaded concurrently
+through a BulkUploader. After a successful upload the local copy can be
+kept, deleted or moved to an archive directory; a file whose size or mtime
+changed while it was being uploaded is left in place and queued again.
+
+The tree is only scanned at startup (with --existing) and after the kernel
+reports a queue overflow; otherwise only inotify events are read.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import functools
+import logging
+import os
+import queue
+import select
+import shutil
+import signal
+import struct
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import where
+from uploader import MULTIPART_CHUNKSIZE, MULTIPART_THRESHOLD, UPLOAD_WORKERS, create_transfer_config, create_upload_client
+
+logger = logging.getLogger("where_watch")
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Seconds a file must go without another write before it is uploaded
+DEBOUNCE = 1.0
+# Names that browsers and download tools use for files still being written
+PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload', '.download')
+
+KEEP = "keep"
+DELETE = "delete"
+ARCHIVE = "archive"
+
+
+class Inotify:
+    """A minimal ctypes binding to inotify: add watches and read (wd, mask, name) events."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def read(self, timeout):
+        """Returns the events available within timeout seconds, as (wd, mask, name) tuples."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _version(path):
+    """The (size, mtime) of a file, to tell whether it was rewritten."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def is_partial(file_name):
+    return file_name.startswith('.') or file_name.lower().endswith(PARTIAL_SUFFIXES)
+
+
+class FolderWatcher:
+    """
+    Uploads the files written under `root`. after is KEEP, DELETE or ARCHIVE
+    (which moves uploaded files to archive_dir, keeping their paths relative
+    to root). on_done(file_path, s3_path, error), if given, is called once
+    each upload and its after-action are finished. `ready` is set once the
+    tree is watched.
+    """
+
+    def __init__(self, root, uploader, after=KEEP, archive_dir=None, debounce=DEBOUNCE, on_done=None):
+        if after == ARCHIVE and not archive_dir:
+            raise ValueError("archive_dir is required to archive uploaded files")
+        self.root = os.path.abspath(root)
+        self.uploader = uploader
+        self.after = after
+        self.archive_dir = archive_dir and os.path.abspath(archive_dir)
+        self.debounce = debounce
+        self.on_done = on_done
+        self.ready = threading.Event()
+        self._inotify = Inotify()
+        self._folders = {}
+        self._due = {}
+        # Files rewritten during their upload, handed back to the watch thread by upload threads
+        self._changed = queue.SimpleQueue()
+        self._stop = threading.Event()
+
+    def _watch_tree(self, folder):
+        """Watches folder and every folder under it; returns the files already in them."""
+        found = []
+        for current, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if not d.startswith('.')
+                       and os.path.join(current, d) != self.archive_dir]
+            try:
+                self._folders[self._inotify.add_watch(current)] = current
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    logger.error(f"❌ Out of inotify watches at {current}; raise fs.inotify.max_user_watches")
+                elif e.errno != errno.ENOENT:
+                    raise
+                continue
+            found.extend(os.path.join(current, name) for name in files)
+        return found
+
+    def _schedule(self, path):
+        if not is_partial(os.path.basename(path)):
+            self._due[path] = time.monotonic() + self.debounce
+
+    def _handle(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("⚠ inotify queue overflowed; rescanning the watched tree")
+            for path in self._watch_tree(self.root):
+                self._schedule(path)
+            return
+        folder = self._folders.get(wd)
+        if folder is None:
+            return
+        if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+            self._folders.pop(wd, None)
+            return
+        path = os.path.join(folder, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO) and not name.startswith('.') and path != self.archive_dir:
+                # Files may land in a new folder before its watch exists
+                for found in self._watch_tree(path):
+                    self._schedule(found)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            self._schedule(path)
+
+    def _submit_due(self):
+        now = time.monotonic()
+        for path in [path for path, due in self._due.items() if due <= now]:
+            del self._due[path]
+            if not os.path.isfile(path):
+                continue
+            try:
+                version = _version(path)
+            except FileNotFoundError:
+                continue
+            self.uploader.submit(path, on_done=functools.partial(self._uploaded, version=version))
+
+    def _requeue_changed(self):
+        while True:
+            try:
+                self._schedule(self._changed.get_nowait())
+            except queue.Empty:
+                return
+
+    def _uploaded(self, file_path, s3_path, error, version=None):
+        self._after_upload(file_path, s3_path, error, version)
+        if self.on_done:
+            self.on_done(file_path, s3_path, error)
+
+    def _after_upload(self, file_path, s3_path, error, version=None):
+        """
+        Deletes or archives an uploaded file, unless it was rewritten since it
+        was submitted (version is its (size, mtime) then); such a file is
+        queued again so its new contents get uploaded too.
+        """
+        if error is not None or s3_path is None or self.after == KEEP:
+            return
+        try:
+            if version is not None and _version(file_path) != version:
+                logger.info(f"🔁 {file_path} changed while it was uploaded; queued again")
+                self._changed.put(file_path)
+                return
+            if self.after == DELETE:
+                os.remove(file_path)
+            else:
+                target = os.path.join(self.archive_dir, os.path.relpath(file_path, self.root))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.move(file_path, target)
+        except OSError as e:
+            logger.error(f"❌ Could not {self.after} {file_path} after upload: {e}")
+
+    def run(self, existing=False):
+        """Watches until stop() is called. existing=True also uploads the files already in the tree."""
+        found = self._watch_tree(self.root)
+        if existing:
+            for path in found:
+                self._schedule(path)
+        logger.info(f"👀 Watching {self.root} ({len(self._folders):,} folders)")
+        self.ready.set()
+        try:
+            while not self._stop.is_set():
+                timeout = 1.0
+                if self._due:
+                    timeout = min(timeout, max(min(self._due.values()) - time.monotonic(), 0))
+                for event in self._inotify.read(timeout):
+                    self._handle(*event)
+                self._requeue_changed()
+                self._submit_due()
+        finally:
+            self._inotify.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload files to their raw-data locations as soon as they are written to a folder.")
+    parser.add_argument("directory", help="folder to watch, with every folder under it")
+    parser.add_argument("bucket", help="S3 bucket")
+    parser.add_argument("--after", choices=(KEEP, DELETE, ARCHIVE), default=KEEP,
+                        help="what to do with a local file once it is uploaded")
+    parser.add_argument("--archive-dir", help="where --after archive moves uploaded files")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE, help="seconds a file must be quiet before upload")
+    parser.add_argument("--existing", action="store_true", help="also upload the files already in the folder")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="concurrent uploads")
+    parser.add_argument("--multipart-threshold", type=int, default=MULTIPART_THRESHOLD,
+                        help="files at least this many bytes are uploaded in parts")
+    parser.add_argument("--multipart-chunksize", type=int, default=MULTIPART_CHUNKSIZE, help="bytes per part")
+    parser.add_argument("--no-markers", action="store_true", help="do not write folder marker objects")
+    parser.add_argument("--sync", action="store_true", help="skip files whose S3 copy already has the same bytes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    s3_client = create_upload_client(args.workers)
+    transfer_config = create_transfer_config(args.workers, args.multipart_threshold, args.multipart_chunksize)
+    uploader = where.create_bulk_uploader(s3_client, args.bucket, args.workers, transfer_config,
+                                          create_markers=not args.no_markers, sync=args.sync)
+    watcher = FolderWatcher(args.directory, uploader, args.after, args.archive_dir, args.debounce)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    try:
+        watcher.run(existing=args.existing)
+    except KeyboardInterrupt:
+        pass
+    uploader.close()
+    logger.info(uploader.stats.summary())
+
+
+if __name__ == "__main__":
+    main()